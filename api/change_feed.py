@@ -0,0 +1,178 @@
+import os
+import json
+import base64
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from scraper.history import HISTORY_DB, CHANGE_COLUMNS, PriceHistoryStore
+from scraper.parsing import commune_of, strip_accents
+
+logger = logging.getLogger(__name__)
+
+def _commune_key(location: str) -> str:
+    return strip_accents(commune_of(location or "") or "").lower()
+
+def encode_cursor(change: Dict) -> str:
+    """Cursor opaco con la posición (fecha, id) del último cambio entregado."""
+    raw = json.dumps([change["timestamp"], change["change_id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        timestamp, change_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(timestamp), int(change_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+
+def _newest_first(changes: List[Dict]) -> List[Dict]:
+    """Del más reciente al más antiguo; a igual fecha, por id (el orden que recorren los cursores)."""
+    changes = sorted(changes, key=lambda c: c["change_id"])
+    changes.sort(key=lambda c: c["timestamp"], reverse=True)
+    return changes
+
+class ChangeFeed:
+    """Índice en memoria de los cambios de precio del historial, para servir /changes sin ir a SQLite.
+
+    Antes de cada consulta compara el mtime y tamaño de la base (y de su WAL); solo si cambiaron lee los
+    cambios nuevos (id mayor al último cargado) o, si la base fue reemplazada, la recarga completa. Los
+    cambios quedan ordenados del más reciente al más antiguo, que es el orden que recorren los cursores.
+    `version` sale solo de la base (inode, último snapshot y último cambio) y sirve para construir el ETag:
+    todos los workers de la API, y el mismo worker tras reiniciarse, emiten el mismo ETag para los mismos datos.
+    """
+    def __init__(self, db_path: str = HISTORY_DB):
+        self.db_path = db_path
+        self.changes: List[Dict] = []
+        self.by_listing: Dict[str, List[Dict]] = {}
+        self.latest: Optional[Dict] = None
+        self.version = "empty"
+        self._signature = None
+        self._last_id = 0
+        self._lock = threading.Lock()  # una recarga a la vez
+        self._state_lock = threading.Lock()  # publicar / leer (changes, by_listing, latest, version) juntos
+
+    def _stat(self):
+        signature = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _inode(self) -> int:
+        """Identidad del archivo: distingue una base reemplazada que repite ids de snapshot y de cambio."""
+        try:
+            return os.stat(self.db_path).st_ino
+        except FileNotFoundError:
+            return 0
+
+    def refresh(self) -> bool:
+        """Recarga desde SQLite si la base cambió en disco; devuelve True si hubo cambios nuevos.
+
+        Las listas nuevas se arman aparte y se publican con un solo cambio de referencias: una consulta
+        concurrente ve el estado anterior o el nuevo, nunca una lista a medio ordenar.
+        """
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        with self._lock:
+            if signature == self._signature:
+                return False
+            if signature[0] is None:
+                self._publish([], {}, None, "empty", 0)
+                self._signature = signature
+                return False
+            changes, by_listing, current_latest, _ = self._snapshot()
+            last_id, reset = self._last_id, False
+            store = PriceHistoryStore(self.db_path)
+            try:
+                latest = store.latest_snapshot()
+                max_id = store.conn.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()[0]
+                if max_id < last_id:
+                    # La base se reemplazó (ids reiniciados): se descarta lo cargado
+                    changes, by_listing, current_latest, last_id, reset = [], {}, None, 0, True
+                rows = store.conn.execute(
+                    CHANGE_COLUMNS.replace("SELECT ", "SELECT c.id AS change_id, c.new_snapshot_id, ", 1)
+                    + " WHERE c.id > ?", (last_id,)
+                ).fetchall()
+            finally:
+                store.close()
+            self._signature = signature
+            if not rows and latest == current_latest and not reset:
+                return False
+            new_by_listing: Dict[str, List[Dict]] = {}
+            for row in rows:
+                change = PriceHistoryStore._change_dict(row)
+                change["change_id"] = row["change_id"]
+                change["snapshot_id"] = row["new_snapshot_id"]
+                change["commune_key"] = _commune_key(change["location"])
+                new_by_listing.setdefault(change["id"], []).append(change)
+            changes = _newest_first(changes + [c for listing in new_by_listing.values() for c in listing])
+            by_listing = dict(by_listing)
+            for listing_id, listing_changes in new_by_listing.items():
+                by_listing[listing_id] = _newest_first(by_listing.get(listing_id, []) + listing_changes)
+            version = f"{self._inode()}-{latest['id'] if latest else 0}-{max(last_id, max_id)}"
+            self._publish(changes, by_listing, latest, version, max(last_id, max_id))
+            logger.info(f"Change feed: {len(rows)} cambios nuevos, {len(changes)} en memoria (versión {version})")
+            return True
+
+    def _publish(self, changes: List[Dict], by_listing: Dict[str, List[Dict]], latest: Optional[Dict],
+                 version: str, last_id: int):
+        with self._state_lock:
+            self.changes, self.by_listing, self.latest, self.version = changes, by_listing, latest, version
+        self._last_id = last_id
+
+    def _snapshot(self) -> Tuple[List[Dict], Dict[str, List[Dict]], Optional[Dict], str]:
+        with self._state_lock:
+            return self.changes, self.by_listing, self.latest, self.version
+
+    def etag(self, params: Dict) -> str:
+        """ETag de una consulta: versión del índice más los parámetros (la respuesta depende solo de ambos)."""
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:12]
+        return f'"{self.version}-{digest}"'
+
+    def query(self, listing_id: str = None, commune: str = None, since: str = None, until: str = None,
+              min_delta: float = None, latest_only: bool = False, cursor: str = None,
+              limit: int = 100) -> Dict:
+        """Filtra los cambios y devuelve una página: {'changes', 'total', 'next_cursor'}.
+
+        `since`/`until` van en formato `YYYY-MM-DD HH:MM:SS` (o un prefijo, p. ej. solo la fecha);
+        `min_delta` es la variación porcentual mínima en valor absoluto; `latest_only` restringe al
+        último snapshot ingerido.
+        """
+        all_changes, by_listing, latest, _ = self._snapshot()
+        changes = by_listing.get(listing_id, []) if listing_id else all_changes
+        commune_key = strip_accents(commune).lower().strip() if commune else None
+        snapshot_id = latest["id"] if latest_only and latest else None
+        after = decode_cursor(cursor) if cursor else None
+
+        selected = []
+        for change in changes:
+            if latest_only and change["snapshot_id"] != snapshot_id:
+                continue
+            if commune_key and change["commune_key"] != commune_key:
+                continue
+            if since and change["timestamp"] < since:
+                continue
+            if until and change["timestamp"][:len(until)] > until:
+                continue
+            if min_delta is not None and (change["delta_pct"] is None or abs(change["delta_pct"]) < min_delta):
+                continue
+            selected.append(change)
+
+        start = 0
+        if after:
+            timestamp, change_id = after
+            start = next((i for i, c in enumerate(selected)
+                          if c["timestamp"] < timestamp or (c["timestamp"] == timestamp and c["change_id"] > change_id)),
+                         len(selected))
+        page = selected[start:start + limit]
+        more = start + limit < len(selected)
+        return {
+            "changes": [{k: v for k, v in c.items() if k not in ("snapshot_id", "commune_key")} for c in page],
+            "total": len(selected),
+            "next_cursor": encode_cursor(page[-1]) if more and page else None,
+        }
@@ -1,51 +1,230 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from llm.rag_agent import RAGAgent
-from contextlib import asynccontextmanager
+import time
+IMPORT_STARTED = time.perf_counter()
+
 import os
 import json
-from glob import glob
-import re
-from datetime import datetime
+import logging
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from api.startup import Warmup, IndexRefresher
+from api.change_feed import ChangeFeed
+from monitoring.metrics import REGISTRY, CONTENT_TYPE, Counter, Gauge
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# El agente (sentence_transformers, langchain, ChromaDB, el snapshot) se construye en segundo plano
+# después de que uvicorn escucha; hasta entonces /health responde y /ready devuelve 503.
+agent = None
+
+def build_agent(phase):
+    global agent
+    with phase("imports"):
+        from llm.rag_agent import RAGAgent
+    with phase("agent"):
+        rag = RAGAgent()
+    with phase("model"):
+        rag.embedder.encode_query("warmup")
+        rag._detect_language("warmup")
+    if rag.service is None:
+        with phase("sync"):
+            # Solo re-indexa lo que cambió desde el último arranque (con RAG_SERVICE_SOCKET lo hace el servicio)
+            report = rag.sync_properties()
+            logger.info(f"ChromaDB synced at startup: {report}")
+    with phase("llm_client"):
+        rag.llm
+    agent = rag
+    return rag
+
+# Si la carga falla (p. ej. aún no hay snapshot en data/) se reintenta cada WARMUP_RETRY_INTERVAL segundos, con backoff
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))
+warmup = Warmup(build_agent, started_at=IMPORT_STARTED, retry_interval=WARMUP_RETRY_INTERVAL)
+
+# Re-index en caliente: cada INDEX_REFRESH_INTERVAL segundos se busca un snapshot más nuevo en data/ y, si
+# lo hay, se indexa en una colección nueva y se activa sin reiniciar (0 lo desactiva). En modo cliente
+# (RAG_SERVICE_SOCKET) solo se adopta la versión que ya activó el servicio.
+INDEX_REFRESH_INTERVAL = float(os.getenv("INDEX_REFRESH_INTERVAL", "60"))
+
+def refresh_if_new_snapshot():
+    return agent.refresh_if_newer() if agent is not None else None
+
+refresher = IndexRefresher(refresh_if_new_snapshot, interval=INDEX_REFRESH_INTERVAL)
+
+# Cambios de precio en memoria; se recargan solo cuando el historial cambia en disco
+CHANGES_PAGE_SIZE = int(os.getenv("CHANGES_PAGE_SIZE", "100"))
+change_feed = ChangeFeed()
+
+# Métricas que ya lleva el agente (caches, tokens, tamaño del índice), leídas en cada scrape de /metrics
+SCRAPER_METRICS_FILE = os.getenv("SCRAPER_METRICS_FILE", "data/scraper_metrics.prom")
+
+def agent_metrics():
+    if agent is None:
+        return []
+    answers = Counter("rag_answer_cache_events_total", "Aciertos, fallos y coalescencias del cache de respuestas", ["event"])
+    for event, value in agent.answer_cache.stats.items():
+        answers.inc(value, event=event)
+    embeddings = Counter("rag_embedding_cache_total", "Consultas al cache de embeddings", ["kind", "result"])
+    for key, value in agent.embedder.stats.items():
+        kind, result = key.split("_")
+        embeddings.inc(value, kind=kind, result="hit" if result == "hits" else "miss")
+    tokens = Counter("rag_llm_tokens_total", "Tokens enviados y recibidos del LLM", ["kind"])
+    tokens.inc(agent.token_stats["prompt_tokens"], kind="prompt")
+    tokens.inc(agent.token_stats["completion_tokens"], kind="completion")
+    calls = Counter("rag_llm_requests_total", "Prompts construidos para el LLM")
+    calls.inc(agent.token_stats["requests"])
+    size = Gauge("rag_index_documents", "Chunks en el índice", ["index"])
+    size.set(agent.vector_store.count(), index=agent.vector_store.name)
+    if agent.service is None:
+        size.set(len(agent.lexical), index="bm25")
+    return [answers, embeddings, tokens, calls, size]
+
+REGISTRY.add_collector(agent_metrics)
+
+async def get_agent():
+    """El agente listo; antes de terminar la carga la petición espera, y si la carga falló responde 503."""
+    try:
+        return await warmup.wait()
+    except Exception:
+        raise HTTPException(status_code=503, detail=f"El agente no está disponible: {warmup.error}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Carga las propiedades en ChromaDB al iniciar la aplicación si la base de datos está vacía."""
-    if agent.vector_store.count() == 0:
-        agent.load_properties()
-        print("Properties loaded into ChromaDB at startup")
+    """Lanza la carga del agente sin bloquear el bind del servidor, y el refresher del índice."""
+    warmup.start()
+    refresher.start()
     yield
+    refresher.stop()
+    warmup.stop()
 
 app = FastAPI(title="Assetplan Agent API", lifespan=lifespan)
-agent = RAGAgent()
 
 # Modelo de datos para la consulta POST al endpoint /ask
 class QueryRequest(BaseModel):
     query: str
 
+# Lote de consultas para /ask/batch (jobs nocturnos de búsquedas guardadas)
+ASK_BATCH_MAX_QUERIES = int(os.getenv("ASK_BATCH_MAX_QUERIES", "10000"))
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    stream: bool = False
+    concurrency: Optional[int] = Field(None, ge=1, le=64)  # llamadas simultáneas al LLM (default ASK_BATCH_CONCURRENCY)
+
 # Endpoint de prueba para verificar si el servidor está funcionando
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+# Readiness: 200 solo cuando el modelo y el índice están cargados (para el balanceador / orquestador)
+@app.get("/ready")
+async def readiness_check():
+    status = warmup.status()
+    if warmup.ready:
+        status["index"] = {"version": agent.index_version, "collection": agent.index.collection,
+                           "snapshot": os.path.basename(agent.json_file), **refresher.status()}
+    return JSONResponse(status, status_code=200 if warmup.ready else 503)
+
+# Métricas en formato de texto de Prometheus: etapas de /ask, indexación, caches, tokens y la última corrida del scraper
+@app.get("/metrics")
+def metrics():
+    text = REGISTRY.render()
+    if os.path.exists(SCRAPER_METRICS_FILE):
+        with open(SCRAPER_METRICS_FILE, encoding="utf-8") as f:
+            text += f.read()
+    return PlainTextResponse(text, media_type=CONTENT_TYPE)
+
 # Endpoint principal: recibe una pregunta y retorna la respuesta generada por el agente
 @app.post("/ask")
 async def ask_question(request: QueryRequest):
     """Procesa una consulta y devuelve la respuesta generada por el agente."""
-    response = agent.search_and_generate(request.query)
+    rag = await get_agent()
+    response = await rag.asearch_and_generate(request.query)
     return response
 
-# Endpoint que devuelve los últimos cambios detectados en los precios de propiedades
+# Variante en streaming (Server-Sent Events): fuentes y confianza primero, luego los tokens de la respuesta
+@app.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest):
+    """Emite eventos SSE `sources`, `token` (uno por fragmento) y `done` (respuesta completa)."""
+    rag = await get_agent()
+    async def events():
+        async for event in rag.astream_search_and_generate(request.query):
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Agregados de mercado sobre el snapshot cargado (group-bys de pandas, sin pasar por el LLM)
+@app.get("/market/price-per-m2")
+async def market_price_per_m2(group_by: str = "commune,bedrooms", currency: str = "CLP",
+                              commune: Optional[str] = None, bedrooms: Optional[int] = None):
+    """Mediana y percentiles 25/75 del precio por m² agrupados por `group_by` (commune, bedrooms, bathrooms, currency)."""
+    index = (await get_agent()).index
+    try:
+        groups = index.market.price_per_m2([c.strip() for c in group_by.split(",") if c.strip()],
+                                         currency=currency, commune=commune, bedrooms=bedrooms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"groups": groups, "currency": currency.upper(), "snapshot": os.path.basename(index.json_file)}
+
+@app.get("/market/price-distribution")
+async def market_price_distribution(currency: str = "CLP", commune: Optional[str] = None,
+                                    bedrooms: Optional[int] = None, bins: int = Query(10, ge=1, le=100)):
+    """Histograma y percentiles del precio de las tipologías que cumplen el filtro."""
+    index = (await get_agent()).index
+    distribution = index.market.price_distribution(currency=currency, commune=commune, bedrooms=bedrooms, bins=bins)
+    if distribution is None:
+        raise HTTPException(status_code=404, detail="No hay tipologías con precio para ese filtro")
+    return {**distribution, "snapshot": os.path.basename(index.json_file)}
+
+# Muchas consultas en una petición: embeddings y ChromaDB en lote, LLM en paralelo con límite
+@app.post("/ask/batch")
+async def ask_batch(request: BatchQueryRequest):
+    """Devuelve `{"results": [...]}` en el orden de `queries`, o con `stream: true` una línea NDJSON
+    `{"index": i, ...respuesta}` por consulta a medida que terminan."""
+    if len(request.queries) > ASK_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"Máximo {ASK_BATCH_MAX_QUERIES} consultas por lote")
+    rag = await get_agent()
+    options = {"concurrency": request.concurrency} if request.concurrency else {}
+    if not request.stream:
+        return {"results": await rag.asearch_and_generate_many(request.queries, **options)}
+    async def lines():
+        async for i, result in rag.aiter_search_and_generate_many(request.queries, **options):
+            yield json.dumps({"index": i, **result}, ensure_ascii=False) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Endpoint que devuelve los cambios de precio registrados en el historial (servidos desde memoria)
 @app.get("/changes")
-async def get_changes():
-    """Devuelve los cambios detectados en los precios de las propiedades."""
-    change_files = glob("data/changes_*.json")
-    if not change_files:
-        return {"changes": [], "message": "No se han detectado cambios"}
-    def extract_dt(f: str):
-        m = re.search(r'(\d{8}_\d{6})', f)
-        return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S") if m else datetime.min
-    latest_changes = max(change_files, key=extract_dt)
-    with open(latest_changes, 'r', encoding='utf-8') as f:
-        changes = json.load(f)
-    return {"changes": changes, "message": f"{len(changes)} cambios detectados", "file": latest_changes}
\ No newline at end of file
+def get_changes(request: Request, listing_id: Optional[str] = None, commune: Optional[str] = None,
+                days: Optional[float] = Query(None, ge=0), since: Optional[str] = None, until: Optional[str] = None,
+                min_delta: Optional[float] = None, cursor: Optional[str] = None,
+                limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=1000)):
+    """Cambios del último snapshot o, si se filtra por listing o fechas, de todo el historial.
+
+    Filtros: `commune`, `listing_id`, `days` / `since` / `until` (`YYYY-MM-DD[ HH:MM:SS]`) y `min_delta`
+    (variación % mínima en valor absoluto). Pagina con `cursor` (el `next_cursor` de la página anterior)
+    y responde 304 si el `If-None-Match` coincide con el ETag.
+    """
+    change_feed.refresh()
+    # El ETag usa `days` tal cual y no el `since` que resulta (cambiaría cada segundo): mientras la versión del
+    # feed no cambie, un dashboard que pide ?days=7 recibe 304
+    params = {"listing_id": listing_id, "commune": commune, "days": days, "since": since, "until": until,
+              "min_delta": min_delta, "cursor": cursor, "limit": limit}
+    if days is not None:
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    etag = change_feed.etag(params)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    try:
+        page = change_feed.query(listing_id=listing_id, commune=commune, since=since, until=until,
+                                 min_delta=min_delta, latest_only=not (listing_id or since or until),
+                                 cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page["total"]:
+        page["message"] = "No se han detectado cambios"
+    else:
+        page["message"] = f"{page['total']} cambios detectados"
+        page["snapshot"] = change_feed.latest["source"]
+    return JSONResponse(page, headers=headers)
@@ -0,0 +1,144 @@
+"""Servicio local de embeddings y recuperación compartido por los workers de la API.
+
+Con `uvicorn api.main:app --workers N` cada proceso carga su propio modelo y abre ChromaDB sobre el mismo
+directorio. Este servicio los carga una sola vez (un `RAGAgent` completo: sync al arrancar y refresh en
+caliente de snapshots) y atiende a los workers por un Unix socket; los workers corren con
+`RAG_SERVICE_SOCKET` apuntando al socket y solo conservan el LLM, los caches de respuestas y /market.
+
+Las consultas que llegan de todos los workers dentro de `--window-ms` se embeben en un solo `encode` y se
+recuperan con un solo `_search_many` (una consulta al índice por filtro).
+
+    python -m api.sidecar --socket /tmp/assetplan_rag.sock
+    RAG_SERVICE_SOCKET=/tmp/assetplan_rag.sock uvicorn api.main:app --workers 4
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from api.startup import IndexRefresher
+from llm.batching import QueryBatcher
+from llm.rag_agent import RAGAgent
+from llm.remote import HEADER, MAX_MESSAGE_BYTES, encode_message, decode_body, encode_array, decode_array
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/assetplan_rag.sock"
+
+class RetrievalService:
+    """Atiende `info`, `encode` y `search` sobre el agente; cada conexión puede tener varias peticiones en curso."""
+    def __init__(self, agent: RAGAgent, window: float = 0.002, max_batch: int = 64):
+        self.agent = agent
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = 0
+        self.encoder = None
+        self.searcher = None
+
+    def _search_batch(self, items: List[Tuple[str, List[float], int]]) -> List[Tuple[List[Dict], str]]:
+        """Un lote de consultas de varios workers contra una misma generación del índice (agrupadas por `n`)."""
+        results: List[Any] = [None] * len(items)
+        with self.agent._lease() as index:
+            by_n: Dict[int, List[int]] = {}
+            for i, (_, _, n) in enumerate(items):
+                by_n.setdefault(n, []).append(i)
+            for n, indices in by_n.items():
+                hits = self.agent._search_many([items[i][0] for i in indices], [items[i][1] for i in indices], n, index)
+                for i, query_hits in zip(indices, hits):
+                    results[i] = (query_hits, index.version)
+        return results
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "info":
+            index = self.agent.index
+            return {"version": index.version, "json_file": os.path.abspath(index.json_file),
+                    "collection": index.collection, "count": index.vector_store.count(),
+                    "backend": index.vector_store.name, "requests": self.requests,
+                    "encode_batches": self.encoder.batches, "search_batches": self.searcher.batches}
+        if op == "encode":
+            vectors = await asyncio.gather(*(self.encoder.encode(t) for t in request["texts"]))
+            return {"vectors": encode_array(np.stack(vectors) if vectors else np.zeros((0, 0)))}
+        if op == "search":
+            queries, n = request["queries"], int(request.get("n", 5))
+            if "embeddings" in request:
+                embeddings = decode_array(request["embeddings"]).tolist()
+            else:
+                embeddings = [v.tolist() for v in await asyncio.gather(*(self.encoder.encode(q) for q in queries))]
+            results = await asyncio.gather(*(self.searcher.submit((q, e, n)) for q, e in zip(queries, embeddings)))
+            return {"hits": [hits for hits, _ in results], "versions": [version for _, version in results]}
+        raise ValueError(f"Operación desconocida: {op!r}")
+
+    async def _respond(self, request: Dict[str, Any], writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        self.requests += 1
+        try:
+            response = {"id": request.get("id"), **(await self.handle(request))}
+        except Exception as e:
+            logger.exception(f"Falló la petición {request.get('op')}")
+            response = {"id": request.get("id"), "error": f"{type(e).__name__}: {e}"}
+        async with lock:
+            writer.write(encode_message(response))
+            await writer.drain()
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if size > MAX_MESSAGE_BYTES:
+                    raise ValueError(f"Mensaje de {size} bytes")
+                task = asyncio.create_task(self._respond(decode_body(await reader.readexactly(size)), writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # el worker cerró la conexión
+        except ValueError as e:
+            logger.warning(f"Conexión descartada: {e}")
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def serve(self, path: str):
+        # Los batchers viven en el event loop del servicio y usan el pool de CPU del agente
+        self.encoder = QueryBatcher(self.agent.embedder.encode_queries, self.agent.executor, self.window, self.max_batch)
+        self.searcher = QueryBatcher(self._search_batch, self.agent.executor, self.window, self.max_batch)
+        if os.path.exists(path):
+            os.remove(path)  # socket de una corrida anterior
+        server = await asyncio.start_unix_server(self._connection, path=path)
+        logger.info(f"Servicio de recuperación escuchando en {path} (índice {self.agent.index_version})")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de embeddings y recuperación para los workers de la API")
+    parser.add_argument('--socket', default=os.getenv("RAG_SERVICE_SOCKET") or DEFAULT_SOCKET)
+    parser.add_argument('--window-ms', type=float, default=float(os.getenv("SERVICE_BATCH_WINDOW_MS", "2")),
+                        help='Ventana para juntar consultas de distintos workers en un lote')
+    parser.add_argument('--max-batch', type=int, default=int(os.getenv("SERVICE_BATCH_SIZE", "64")))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    agent = RAGAgent(service_socket="")
+    agent.embedder.encode_query("warmup")
+    logger.info(f"Sync al arrancar: {agent.sync_properties()}")
+    refresher = IndexRefresher(agent.refresh_if_newer, interval=float(os.getenv("INDEX_REFRESH_INTERVAL", "60")))
+    refresher.start()
+    logger.info(f"Servicio listo en {time.perf_counter() - start:.1f}s")
+    service = RetrievalService(agent, window=args.window_ms / 1000, max_batch=args.max_batch)
+    try:
+        asyncio.run(service.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        refresher.stop()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == '__main__':
+    main()
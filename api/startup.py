@@ -0,0 +1,156 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    """Carga pesada de la API (imports, modelo, índice) en segundo plano, después de que uvicorn escucha.
+
+    `start()` lanza `build(phase)` en un hilo; `build` marca cada etapa con `with phase("nombre"):` y
+    devuelve el objeto listo (el agente). Las peticiones que lo necesitan esperan con `wait()` (desde
+    cualquier event loop); `/ready` consulta `status()` sin bloquear ni lanzar nada. Si la carga falla, el
+    mismo hilo la reintenta tras `retry_interval` segundos (duplicando la espera hasta `max_retry_interval`;
+    `0` desactiva los reintentos); mientras tanto `wait()` falla con el error del último intento.
+    """
+    def __init__(self, build: Callable[[Callable], Any], started_at: float = None,
+                 retry_interval: float = 5, max_retry_interval: float = 60):
+        self.build = build
+        self.started_at = started_at or time.perf_counter()
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.timings: Dict[str, float] = {}
+        self.phase_name = "pending"
+        self.attempts = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.result is not None
+
+    @contextmanager
+    def phase(self, name: str):
+        self.phase_name = name
+        start = time.perf_counter()
+        yield
+        self.timings[name] = round(time.perf_counter() - start, 3)
+        logger.info(f"Startup phase '{name}': {self.timings[name]}s")
+
+    def _attempt(self, future: Future) -> bool:
+        self.attempts += 1
+        try:
+            result = self.build(self.phase)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.phase_name = "failed"
+            logger.exception(f"Startup failed (attempt {self.attempts})")
+            future.set_exception(e)
+            return False
+        self.result = result
+        self.error = None
+        self.phase_name = "ready"
+        self.timings["total_since_import"] = round(time.perf_counter() - self.started_at, 3)
+        logger.info(f"Startup breakdown: {self.timings}")
+        future.set_result(result)
+        return True
+
+    def _run(self):
+        delay = self.retry_interval
+        while not self._attempt(self._future):
+            if self.retry_interval <= 0 or self._stop.wait(delay):
+                return
+            delay = min(delay * 2, self.max_retry_interval)
+            with self._lock:
+                self._future = Future()
+
+    def start(self) -> Future:
+        """Lanza la carga la primera vez; después solo devuelve el intento en curso (o el último)."""
+        with self._lock:
+            if self._future is None:
+                self._future = Future()
+                threading.Thread(target=self._run, name="warmup", daemon=True).start()
+            return self._future
+
+    def stop(self):
+        """Cancela los reintentos pendientes (al apagar la API)."""
+        self._stop.set()
+
+    async def wait(self) -> Any:
+        if self.ready:
+            return self.result
+        return await asyncio.shield(asyncio.wrap_future(self.start()))
+
+    def status(self) -> Dict:
+        return {"status": "ready" if self.ready else self.phase_name, "timings": self.timings,
+                "attempts": self.attempts, "error": self.error}
+
+class IndexRefresher:
+    """Llama `check()` cada `interval` segundos en un hilo propio, fuera del camino de las peticiones.
+
+    `check` decide si hay algo que re-indexar y lo hace (devuelve un reporte, o None si no había nada). El
+    hilo baja su prioridad (nice) para que los embeddings del re-index cedan la CPU a /ask; un error
+    queda en `status()` y se reintenta en la vuelta siguiente. Un `ValueError` (snapshot rechazado por
+    validación) se registra como warning, sin traceback.
+    """
+    def __init__(self, check: Callable[[], Optional[Dict]], interval: float = 60, niceness: int = 10):
+        self.check = check
+        self.interval = interval
+        self.niceness = niceness
+        self.running = False
+        self.last_report: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="index-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> Optional[Dict]:
+        self.running = True
+        try:
+            report = self.check()
+            self.error = None
+        except ValueError as e:
+            # Snapshot rechazado por validación: no es un bug, basta el motivo (una vez, no en cada vuelta)
+            error = f"{type(e).__name__}: {e}"
+            if error != self.error:
+                logger.warning(f"Index refresh rejected: {e}")
+            self.error = error
+            return None
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Index refresh failed")
+            return None
+        finally:
+            self.running = False
+        if report is not None:
+            self.last_report = report
+        return report
+
+    def _loop(self):
+        try:
+            # En Linux la prioridad es por hilo: solo este hilo (y los que cree) queda con menor prioridad
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.niceness)
+        except (AttributeError, OSError):
+            pass
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def status(self) -> Dict:
+        return {"refreshing": self.running, "last_refresh": self.last_report, "error": self.error}
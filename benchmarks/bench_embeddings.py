@@ -0,0 +1,95 @@
+"""Benchmark del backend de embeddings en CPU sobre el corpus scrapeado.
+
+Mide documentos/segundo de cada configuración y la deriva de recall frente a la línea base fp32
+(batch 32, sin ordenar, un proceso): para cada consulta se compara el top-k recuperado con los
+vectores de la variante contra el top-k de la línea base.
+
+    python benchmarks/bench_embeddings.py --workers 4 --json bench_embeddings.json
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from llm.embeddings import SentenceTransformerBackend, EMBEDDING_MODEL
+from llm.rag_agent import RAGAgent
+from scraper.scrape import get_latest_json_file
+
+QUERIES = [
+    "departamento de 2 dormitorios en Santiago",
+    "arriendo bajo $500.000 en Ñuñoa",
+    "estudio cerca del metro en Providencia",
+    "3 dormitorios y 2 baños en Las Condes",
+    "departamentos con promoción primer mes gratis",
+    "What 2-bedroom apartments are available in Santiago?",
+]
+
+def load_corpus(json_file: str, repeat: int):
+    with open(json_file, 'r', encoding='utf-8') as f:
+        props = json.load(f)
+    return [RAGAgent._create_document(p) for p in props] * repeat
+
+def normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+def top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = normalize(query_vectors) @ normalize(doc_vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def run(name, backend, corpus, queries, encode_kwargs=None):
+    backend.encode(corpus[:8])  # calentamiento (carga de pesos, pool de procesos)
+    start = time.perf_counter()
+    docs = np.asarray(backend.encode(corpus, **(encode_kwargs or {})), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    q = np.asarray(backend.encode(queries), dtype=np.float32)
+    backend.close()
+    return name, docs, q, len(corpus) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de embeddings en CPU")
+    parser.add_argument('--json-file', default="", help='Snapshot a usar (por defecto el más reciente en data/)')
+    parser.add_argument('--repeat', type=int, default=4, help='Veces que se replica el corpus para medir throughput')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Procesos del pool multi-proceso')
+    parser.add_argument('--k', type=int, default=5, help='k para recall@k')
+    parser.add_argument('--skip-onnx', action='store_true', help='Omitir la variante ONNX int8')
+    parser.add_argument('--json', default="", help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    json_file = args.json_file or get_latest_json_file()
+    corpus = load_corpus(json_file, args.repeat)
+    unique = len(corpus) // args.repeat
+    print(f"Corpus: {len(corpus)} documentos ({unique} únicos) desde {json_file}")
+
+    # Línea base: lo que hacía RAGAgent antes (batch por defecto, sin orden por largo, fp32)
+    baseline = SentenceTransformerBackend(EMBEDDING_MODEL)
+    start = time.perf_counter()
+    base_docs = baseline.model.encode(corpus, batch_size=32)
+    base_rate = len(corpus) / (time.perf_counter() - start)
+    base_q = baseline.encode(QUERIES)
+    variants = [("fp32 batch=32 (línea base)", base_docs, base_q, base_rate)]
+
+    variants.append(run("fp32 batch=64 ordenado", SentenceTransformerBackend(batch_size=64), corpus, QUERIES))
+    variants.append(run(f"fp32 {args.workers} procesos", SentenceTransformerBackend(batch_size=64, workers=args.workers, pool_min_texts=1),
+                        corpus, QUERIES))
+    variants.append(run("int8 dinámico (torch)", SentenceTransformerBackend(batch_size=64, quantize="int8"), corpus, QUERIES))
+    if not args.skip_onnx:
+        variants.append(run("int8 ONNX", SentenceTransformerBackend(batch_size=64, quantize="onnx"), corpus, QUERIES))
+
+    base_top = top_k(base_docs[:unique], base_q, args.k)
+    rows = []
+    print(f"{'variante':<28}{'docs/s':>10}{'speedup':>10}{'recall@' + str(args.k):>12}{'cos vs fp32':>14}")
+    for name, docs, q, rate in variants:
+        top = top_k(docs[:unique], q, args.k)
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(top, base_top)])
+        cosine = float(np.mean(np.sum(normalize(docs[:unique]) * normalize(base_docs[:unique]), axis=1)))
+        rows.append({"variant": name, "docs_per_sec": rate, "speedup": rate / base_rate,
+                     "recall_at_k": float(recall), "mean_cosine_vs_fp32": cosine})
+        print(f"{name:<28}{rate:>10.1f}{rate / base_rate:>10.2f}{recall:>12.3f}{cosine:>14.4f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"corpus": len(corpus), "k": args.k, "results": rows}, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Micro-benchmark: extracción selector a selector vs. un solo `page.evaluate` por página.
+
+Carga cada ficha del sitio de fixtures una vez y repite ambas extracciones sobre la página ya
+renderizada, contando las llamadas al navegador (round trips) y el tiempo por página.
+
+    python benchmarks/bench_extraction.py --repeat 20
+"""
+import json
+import time
+import argparse
+from statistics import median
+from playwright.sync_api import sync_playwright
+
+from scraper.extract import extract_cards, extract_detail
+from tests.fixture_site import serve_fixture_site
+
+DETAIL_SLUGS = [
+    "edificio-plaza-nunoa", "edificio-santa-isabel", "edificio-los-leones",
+    "edificio-parque-forestal", "edificio-manquehue", "edificio-irarrazaval",
+]
+BROWSER_CALLS = {"query_selector", "query_selector_all", "inner_text", "get_attribute", "evaluate"}
+
+class CountingHandle:
+    """Envuelve un Page/ElementHandle y cuenta cada llamada que cruza al navegador."""
+    def __init__(self, target, counter: dict):
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in BROWSER_CALLS:
+            return attr
+        def call(*args, **kwargs):
+            self._counter["calls"] += 1
+            result = attr(*args, **kwargs)
+            if isinstance(result, list):
+                return [CountingHandle(r, self._counter) for r in result]
+            if result is not None and hasattr(result, "query_selector"):
+                return CountingHandle(result, self._counter)
+            return result
+        return call
+
+# --- Implementación anterior, selector a selector (línea base) ---
+def get_text(element, selector: str) -> str:
+    el = element.query_selector(selector)
+    return el.inner_text().strip() if el else ""
+
+def get_attr(element, selector: str, attr: str) -> str:
+    el = element.query_selector(selector)
+    return el.get_attribute(attr) or "" if el else ""
+
+def legacy_cards(page):
+    return [{
+        'title': get_text(card, 'a.text-neutral-800.text-lg'),
+        'location': get_text(card, 'span.text-neutral-500.text-sm'),
+        'href': get_attr(card, 'a.text-neutral-800.text-lg', 'href'),
+        'summary': card.inner_text().strip(),
+    } for card in page.query_selector_all('article.building-card')]
+
+def legacy_detail(page):
+    title = get_text(page, 'a.block.overflow-hidden.text-lg.font-bold') or get_text(page, 'nav.breadcrumbs li:last-child a')
+    location = get_text(page, 'span.text-neutral-500')
+    images = [img.get_attribute('src') for img in page.query_selector_all('img.gallery__img') if img.get_attribute('src')]
+    typologies = []
+    for block in page.query_selector_all('div.flex.w-full.lg\\:w-\\[174px\\] + div.flex.flex-col'):
+        cells = block.query_selector_all('div.inline-flex.items-center')
+        bd = " ".join(p.inner_text().strip() for p in cells[0].query_selector_all('p')) if len(cells) > 0 else ""
+        ba = " ".join(p.inner_text().strip() for p in cells[1].query_selector_all('p')) if len(cells) > 1 else ""
+        typologies.append({
+            'bedrooms': bd,
+            'bathrooms': ba,
+            'size_range': get_text(block, 'p:has-text("m² útiles")'),
+            'price_range': get_text(block, 'div.mt-2 p.text-lg.font-semibold'),
+            'available': get_text(block, 'a:has-text("Ver")').replace('Ver', '').replace('disponibles', '').strip(),
+            'promotions': [span.inner_text().strip() for span in block.query_selector_all('div.badge_promos span')],
+        })
+    return {'title': title, 'location': location, 'images': images, 'typologies': typologies}
+
+def measure(page, fn, repeat: int) -> dict:
+    counter = {"calls": 0}
+    handle = CountingHandle(page, counter)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(handle)
+        timings.append(time.perf_counter() - start)
+    return {"round_trips": counter["calls"] // repeat, "median_ms": median(timings) * 1000, "result": result}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extracción DOM")
+    parser.add_argument('--repeat', type=int, default=20, help='Repeticiones por página')
+    parser.add_argument('--json', default="", help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+    rows = []
+    with serve_fixture_site() as base_url, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        targets = [("list", f"{base_url}/arriendo/departamento?page=1", legacy_cards, extract_cards)]
+        targets += [(slug, f"{base_url}/arriendo/departamento/{slug}", legacy_detail, extract_detail) for slug in DETAIL_SLUGS]
+        for name, url, legacy_fn, engine_fn in targets:
+            page.goto(url, wait_until="domcontentloaded")
+            legacy = measure(page, legacy_fn, args.repeat)
+            engine = measure(page, engine_fn, args.repeat)
+            if legacy.pop("result") != engine.pop("result"):
+                print(f"AVISO: resultados distintos en {name}")
+            rows.append({"page": name, "legacy": legacy, "evaluate": engine})
+        browser.close()
+    print(f"{'página':<28}{'RT antes':>10}{'RT ahora':>10}{'ms antes':>10}{'ms ahora':>10}")
+    for r in rows:
+        print(f"{r['page']:<28}{r['legacy']['round_trips']:>10}{r['evaluate']['round_trips']:>10}"
+              f"{r['legacy']['median_ms']:>10.2f}{r['evaluate']['median_ms']:>10.2f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
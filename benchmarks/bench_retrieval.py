@@ -0,0 +1,95 @@
+"""Benchmark offline de relevancia: vectorial (ChromaDB) vs BM25 vs híbrido (RRF).
+
+Arma consultas etiquetadas desde el snapshot (sin anotar a mano):
+- por nombre de edificio ("Edificio Plaza Ñuñoa") -> relevante: ese edificio (hit@k y MRR);
+- por comuna ("departamentos en Ñuñoa") -> relevantes: los edificios de esa comuna (precision@k).
+Con `--labels` se suman consultas propias: [{"query": "...", "relevant": ["id", ...]}].
+
+    python benchmarks/bench_retrieval.py --k 1 3 5 --json bench_retrieval.json
+"""
+import json
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+
+from llm.rag_agent import RAGAgent, CHUNKS_PER_BUILDING
+from scraper.parsing import commune_of
+from scraper.scrape import get_latest_json_file
+
+def labeled_queries(properties, extra_file: str = ""):
+    by_id = [(str(p["id"]), p) for p in properties]
+    titles = [{"query": p["title"], "relevant": [pid], "kind": "title"} for pid, p in by_id if p.get("title")]
+    communes = defaultdict(list)
+    for pid, p in by_id:
+        communes[commune_of(p.get("location", ""))].append(pid)
+    by_commune = [{"query": f"departamentos en {c}", "relevant": ids, "kind": "commune"} for c, ids in communes.items() if c]
+    extra = []
+    if extra_file:
+        with open(extra_file, 'r', encoding='utf-8') as f:
+            extra = [dict(q, kind="labels") for q in json.load(f)]
+    return titles + by_commune + extra
+
+def retrieve(agent: RAGAgent, mode: str, query: str, n: int):
+    k = n * CHUNKS_PER_BUILDING
+    if mode == "bm25":
+        hits = agent.lexical.search(query, k=k)
+        ids = [doc_id for doc_id, _ in hits]
+        results = ([agent.lexical.documents[i] for i in ids], [agent.lexical.metadatas[i] for i in ids], [None] * len(ids), ids)
+    else:
+        emb = agent.embedder.encode_query(query).tolist()
+        results = agent.retriever.query(query, emb, n_results=k) if mode == "hybrid" else agent.vector_store.query(emb, n_results=k)
+    return [hit["id"] for hit in agent._group_hits(*results)[:n]]
+
+def evaluate(agent: RAGAgent, queries, ks):
+    rows = []
+    for mode in ("vector", "bm25", "hybrid"):
+        metrics = defaultdict(list)
+        for q in queries:
+            ranked = retrieve(agent, mode, q["query"], max(ks))
+            relevant = set(q["relevant"])
+            if q["kind"] == "commune":
+                for k in ks:
+                    metrics[f"commune_precision@{k}"].append(len(relevant & set(ranked[:k])) / min(k, len(relevant)))
+            else:
+                for k in ks:
+                    metrics[f"hit@{k}"].append(float(bool(relevant & set(ranked[:k]))))
+                rank = next((i for i, doc_id in enumerate(ranked, 1) if doc_id in relevant), None)
+                metrics["mrr"].append(1 / rank if rank else 0.0)
+        rows.append({"mode": mode, **{name: round(float(np.mean(v)), 3) for name, v in metrics.items()}})
+    return rows
+
+def lexical_latency(agent: RAGAgent, queries, repeat: int = 200) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            agent.lexical.search(q["query"], k=20)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de relevancia del retriever")
+    parser.add_argument('--json-file', default="", help='Snapshot a usar (por defecto el más reciente en data/)')
+    parser.add_argument('--labels', default="", help='JSON con consultas etiquetadas adicionales')
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--json', default="", help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    json_file = args.json_file or get_latest_json_file()
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = RAGAgent(db_path=tmp, json_file=json_file)
+        agent.load_properties()
+        queries = labeled_queries(agent.properties, args.labels)
+        print(f"{len(agent.properties)} edificios, {agent.vector_store.count()} chunks, {len(queries)} consultas")
+        rows = evaluate(agent, queries, args.k)
+        micros = lexical_latency(agent, queries)
+    for row in rows:
+        print("  ".join(f"{k}={v}" for k, v in row.items()))
+    print(f"BM25: {micros:.1f} µs por consulta")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"queries": len(queries), "results": rows, "bm25_us_per_query": micros}, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
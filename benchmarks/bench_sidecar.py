@@ -0,0 +1,163 @@
+"""Benchmark: N workers con modelo e índice propios vs. N workers livianos contra el servicio compartido (api/sidecar.py).
+
+Cada worker es un proceso como los de `uvicorn --workers N`: arranca un `RAGAgent` (en proceso hace el
+sync de ChromaDB, igual que la API; en modo cliente solo se conecta) y luego `--threads` hilos hacen
+embedding + recuperación (`encode_query` + `_search`) de consultas distintas durante `--seconds`. Se
+reporta por modo y cantidad de workers:
+
+- arranque de los workers (el más lento), consultas/s totales y p50/p99 por consulta,
+- memoria total (PSS de los workers más la del servicio, así las páginas compartidas no se cuentan dos veces),
+- lotes del servicio: cuántas consultas de distintos workers se resolvieron juntas.
+
+Todo corre en un directorio temporal con una copia del snapshot (ChromaDB y cache de embeddings nuevos).
+
+    python benchmarks/bench_sidecar.py --workers 1,2,4 --threads 8 --seconds 5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import threading
+import multiprocessing
+
+from benchmarks.load_test_ask import QUERIES, percentiles
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def memory_mb(pid: int) -> float:
+    """PSS del proceso (RSS si el kernel no expone smaps_rollup), en MB."""
+    for path, field in ((f"/proc/{pid}/smaps_rollup", "Pss:"), (f"/proc/{pid}/status", "VmRSS:")):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            continue
+    return 0.0
+
+def worker(worker_id: int, socket_path: str, threads: int, seconds: float, n: int, ready, go, out):
+    from llm.rag_agent import RAGAgent
+
+    start = time.perf_counter()
+    try:
+        agent = RAGAgent(service_socket=socket_path)
+        if not socket_path:
+            agent.sync_properties()
+        agent.embedder.encode_query("calentamiento")
+    except Exception as e:
+        # Varios workers en proceso escriben el mismo chroma_db/ y embedding_cache/: se reporta, no se cuelga
+        ready.put({"error": f"{type(e).__name__}: {e}"})
+        return
+    ready.put({"startup": time.perf_counter() - start})
+    go.wait()
+
+    latencies = []
+    def run(thread_id: int):
+        end, i = time.perf_counter() + seconds, 0
+        while time.perf_counter() < end:
+            query = f"{QUERIES[(thread_id + i) % len(QUERIES)]} #{worker_id}-{thread_id}-{i}"  # sin cache de consultas
+            t = time.perf_counter()
+            agent._search(query, agent.embedder.encode_query(query).tolist(), n)
+            latencies.append(time.perf_counter() - t)
+            i += 1
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    out.put({"pid": os.getpid(), "latencies": latencies, "memory_mb": memory_mb(os.getpid())})
+
+def start_sidecar(socket_path: str, window_ms: float) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.getenv("PYTHONPATH")])))
+    proc = subprocess.Popen([sys.executable, "-m", "api.sidecar", "--socket", socket_path, "--window-ms", str(window_ms)],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while not os.path.exists(socket_path):
+        if proc.poll() is not None:
+            raise RuntimeError("El servicio terminó al arrancar")
+        time.sleep(0.05)
+    return proc
+
+def run_mode(mode: str, workers: int, args) -> dict:
+    socket_path = os.path.abspath("rag.sock") if mode == "sidecar" else ""
+    sidecar = start_sidecar(socket_path, args.window_ms) if socket_path else None
+    ctx = multiprocessing.get_context("spawn")
+    ready, out, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=worker, args=(w, socket_path, args.threads, args.seconds, args.n, ready, go, out))
+             for w in range(workers)]
+    try:
+        for p in procs:
+            p.start()
+        started = [ready.get(timeout=600) for _ in procs]
+        errors = [s["error"] for s in started if "error" in s]
+        go.set()
+        results = [out.get(timeout=args.seconds + 600) for _ in range(len(procs) - len(errors))]
+        for p in procs:
+            p.join()
+        latencies = [lat for r in results for lat in r["latencies"]]
+        memory = sum(r["memory_mb"] for r in results)
+        result = {"mode": mode, "workers": workers, "failed_workers": errors,
+                  "startup_s": round(max([s["startup"] for s in started if "startup" in s], default=0), 2),
+                  "queries": len(latencies), "qps": round(len(latencies) / args.seconds, 1),
+                  "latency_ms": percentiles(latencies), "workers_memory_mb": round(memory, 1)}
+        if sidecar is not None:
+            from llm.remote import ServiceClient
+            info = ServiceClient(socket_path).info()
+            sidecar_memory = memory_mb(sidecar.pid)
+            result.update({"sidecar_memory_mb": round(sidecar_memory, 1), "search_batches": info["search_batches"],
+                           "queries_per_batch": round(len(latencies) / max(1, info["search_batches"]), 2)})
+            memory += sidecar_memory
+        result["total_memory_mb"] = round(memory, 1)
+        return result
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        if sidecar is not None:
+            sidecar.terminate()
+            sidecar.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers en proceso vs. servicio de recuperación compartido")
+    parser.add_argument('--snapshot', default="", help='JSON de propiedades (default: el más reciente en data/)')
+    parser.add_argument('--workers', default="1,2,4", help='Cantidades de workers separadas por coma')
+    parser.add_argument('--threads', type=int, default=8, help='Hilos con consultas por worker')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--n', type=int, default=5, help='Edificios por consulta')
+    parser.add_argument('--window-ms', type=float, default=2, help='Ventana de batching del servicio')
+    parser.add_argument('--json', default="", help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    from llm.rag_agent import latest_snapshot
+    snapshot = os.path.abspath(args.snapshot or latest_snapshot(os.path.join(REPO_DIR, "data")))
+    if not os.path.exists(snapshot):
+        raise SystemExit("No hay snapshot: corre el scraper o pasa --snapshot")
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    results = []
+    for workers in [int(w) for w in args.workers.split(",")]:
+        for mode in ("in_process", "sidecar"):
+            # Directorio nuevo por corrida: el primer sync indexa desde cero en ambos modos
+            workdir = tempfile.mkdtemp(prefix="assetplan_sidecar_")
+            os.makedirs(os.path.join(workdir, "data"))
+            shutil.copy(snapshot, os.path.join(workdir, "data", os.path.basename(snapshot)))
+            os.chdir(workdir)
+            try:
+                result = run_mode(mode, workers, args)
+            finally:
+                os.chdir(REPO_DIR)
+                shutil.rmtree(workdir, ignore_errors=True)
+            results.append(result)
+            print(json.dumps(result, ensure_ascii=False))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"snapshot": os.path.basename(snapshot), "threads": args.threads, "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
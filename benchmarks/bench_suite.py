@@ -0,0 +1,206 @@
+"""Benchmark de punta a punta sin red: sitio de fixtures, fake LLM y tiempos por etapa.
+
+Etapas (cada una deja sus métricas en el JSON de resultados):
+
+1. scraper:   `scrape_assetplan` contra `tests/fixture_site` (páginas/s, listings/s).
+2. indexing:  `RAGAgent.load_properties` sobre el snapshot replicado `--scale` veces (docs/s),
+              más un `sync_properties` sin cambios (lo que cuesta cada arranque).
+3. retrieval: `ChromaDBStore.query` y la búsqueda completa del agente (`_search`), p50/p99 en ms.
+4. ask:       /ask con el fake LLM a varias concurrencias (`--concurrency 1,8,32`), req/s y p50/p99.
+
+Todo corre en un directorio temporal (data/, chroma_db/ y embedding_cache/ nuevos), así que los
+números no dependen del estado local. Los resultados se guardan en `benchmarks/results/` con el
+commit actual en el nombre; `--compare` muestra la variación contra una corrida anterior.
+
+    python benchmarks/bench_suite.py --scale 50 --concurrency 1,8,32
+    python benchmarks/bench_suite.py --compare benchmarks/results/bench_<commit>_<fecha>.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import shutil
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.fake_llm import serve_fake_llm
+from benchmarks.load_test_ask import QUERIES, free_port, percentiles, run_load, start_api
+from tests.fixture_site import serve_fixture_site
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def timed(samples):
+    """Percentiles en ms de una lista de duraciones en segundos (mismo formato que el load test)."""
+    result = percentiles(samples)
+    result["mean"] = round(float(np.mean(samples)) * 1000, 2) if samples else None
+    return result
+
+# --- Etapas ---
+def bench_scraper(min_props: int, max_pages: int):
+    from scraper.scrape import scrape_assetplan
+
+    hits = []
+    with serve_fixture_site(hits=hits) as base_url:
+        start = time.perf_counter()
+        listings = scrape_assetplan(min_props=min_props, max_pages=max_pages, base_url=base_url)
+        seconds = time.perf_counter() - start
+    result = {"pages": len(hits), "listings": len(listings), "seconds": round(seconds, 3),
+              "pages_per_s": round(len(hits) / seconds, 2), "listings_per_s": round(len(listings) / seconds, 2)}
+    return result, [l.model_dump(mode="json") for l in listings]
+
+def replicate(listings, scale: int):
+    """Copias del snapshot con ids y URLs distintos, para medir la indexación con más de un puñado de docs."""
+    copies = []
+    for k in range(scale):
+        for listing in listings:
+            copy = dict(listing)
+            if k:
+                copy["id"] = f"{listing['id']}-r{k}"
+                copy["url"] = f"{listing['url']}?r={k}"
+                copy["title"] = f"{listing['title']} {k}"
+            copies.append(copy)
+    return copies
+
+def bench_indexing(snapshot: str):
+    from llm.rag_agent import RAGAgent
+
+    agent = RAGAgent(json_file=snapshot)
+    agent.embedder.encode_query("calentamiento")  # la carga del modelo no cuenta como indexación
+    start = time.perf_counter()
+    agent.load_properties()
+    seconds = time.perf_counter() - start
+    docs = agent.vector_store.count()
+    noop = agent.sync_properties()
+    return {"listings": len(agent.properties), "docs": docs, "seconds": round(seconds, 3),
+            "docs_per_s": round(docs / seconds, 1), "noop_sync_s": noop["seconds"]}, agent
+
+def bench_retrieval(agent, repeat: int, n: int = 5):
+    from llm.rag_agent import CHUNKS_PER_BUILDING
+
+    queries = [f"{q} {i}" for i in range(repeat) for q in QUERIES][:repeat]
+    embeddings = [agent.embedder.encode_query(q) for q in queries]
+    vector, search = [], []
+    for query, emb in zip(queries, embeddings):
+        start = time.perf_counter()
+        agent.vector_store.query(emb, n_results=n * CHUNKS_PER_BUILDING)
+        vector.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        agent._search(query, emb, n)
+        search.append(time.perf_counter() - start)
+    return {"queries": len(queries), "chroma_query_ms": timed(vector), "search_ms": timed(search)}
+
+def bench_ask(levels, requests: int, latency: float):
+    os.environ.setdefault("ANSWER_CACHE_SIMILARITY", "2")  # cada consulta llega al LLM
+    results = {}
+    with serve_fake_llm(latency=latency) as llm_url:
+        os.environ["OPENAI_API_BASE"] = llm_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        port = free_port()
+        server, _ = start_api(port, use_sync=False)
+        try:
+            for clients in levels:
+                per_client = max(1, requests // clients)
+                results[f"c{clients}"] = asyncio.run(run_load(f"http://127.0.0.1:{port}", "/ask", clients,
+                                                              per_client, True, f"c{clients}"))
+                print(f"  /ask c={clients}: {json.dumps(results[f'c{clients}'], ensure_ascii=False)}")
+        finally:
+            server.should_exit = True
+    return results
+
+# --- Comparación entre corridas ---
+def flatten(data, prefix=""):
+    out = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+def compare(old: dict, new: dict):
+    before, after = flatten(old["stages"]), flatten(new["stages"])
+    print(f"\n{'métrica':<45} {old['commit']:>12} {new['commit']:>12} {'Δ%':>8}")
+    for name in sorted(before.keys() & after.keys()):
+        a, b = before[name], after[name]
+        delta = f"{(b - a) * 100 / a:+.1f}" if a else "-"
+        print(f"{name:<45} {a:>12} {b:>12} {delta:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de scraper, indexación, retrieval y /ask")
+    parser.add_argument('--scale', type=int, default=50, help='Copias del snapshot de fixtures para indexar')
+    parser.add_argument('--snapshot', default="", help='Usar este JSON en vez de scrapear el sitio de fixtures')
+    parser.add_argument('--retrieval-queries', type=int, default=200)
+    parser.add_argument('--concurrency', default="1,8,32", help='Concurrencias de /ask, separadas por coma')
+    parser.add_argument('--ask-requests', type=int, default=64, help='Peticiones a /ask por nivel de concurrencia')
+    parser.add_argument('--latency', type=float, default=0.3, help='Latencia simulada del LLM (s)')
+    parser.add_argument('--skip-ask', action='store_true')
+    parser.add_argument('--out', default="", help='Archivo de resultados (por defecto benchmarks/results/bench_<commit>_<fecha>.json)')
+    parser.add_argument('--compare', default="", help='Resultados anteriores contra los que comparar')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    out = os.path.abspath(args.out or os.path.join(
+        RESULTS_DIR, f"bench_{commit}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"))
+    snapshot_src = os.path.abspath(args.snapshot) if args.snapshot else ""
+    compare_src = os.path.abspath(args.compare) if args.compare else ""
+    stages = {}
+
+    workdir = tempfile.mkdtemp(prefix="assetplan_bench_")
+    os.chdir(workdir)
+    os.makedirs("data")
+    if snapshot_src:
+        with open(snapshot_src, encoding="utf-8") as f:
+            listings = json.load(f)
+    else:
+        print("scraper...")
+        stages["scraper"], listings = bench_scraper(min_props=6, max_pages=2)
+        print(f"  {stages['scraper']}")
+    snapshot = f"data/assetplan_properties_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(snapshot, "w", encoding="utf-8") as f:
+        json.dump(replicate(listings, args.scale), f, ensure_ascii=False)
+
+    print("indexing...")
+    stages["indexing"], agent = bench_indexing(snapshot)
+    print(f"  {stages['indexing']}")
+    print("retrieval...")
+    stages["retrieval"] = bench_retrieval(agent, args.retrieval_queries)
+    print(f"  {stages['retrieval']}")
+    del agent
+    if not args.skip_ask:
+        print("ask...")
+        stages["ask"] = bench_ask([int(c) for c in args.concurrency.split(",")], args.ask_requests, args.latency)
+
+    result = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": vars(args),
+        "stages": stages,
+    }
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Resultados: {out}")
+    os.chdir(REPO_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+    if compare_src:
+        with open(compare_src, encoding="utf-8") as f:
+            compare(json.load(f), result)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Benchmark: ChromaDB (HNSW) vs. índice NumPy exacto (float32 e int8) con el mismo contrato de vector store.
+
+Genera `--docs` vectores sintéticos agrupados en clusters (parecido a chunks de un mismo edificio o
+comuna) con metadata de comuna y dormitorios, y mide por backend:
+
+- tiempo de indexación y de apertura en frío (lo que cuesta un arranque de la API),
+- latencia de `query` (p50/p99), de `query` con filtro `where` y de `query_many` por consulta,
+- memoria residente agregada por el índice (cada backend corre en un proceso aparte),
+- recall@k contra el top-k exacto en float32.
+
+    python benchmarks/bench_vector_store.py --docs 5000 --dim 384 --queries 200 --k 20
+"""
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+COMMUNES = ["santiago", "nunoa", "providencia", "las condes", "macul", "la florida"]
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def make_corpus(docs: int, dim: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, docs // 20), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=docs)
+    vectors = centers[labels] + 0.35 * rng.normal(size=(docs, dim)).astype(np.float32)
+    query_vectors = centers[rng.integers(0, len(centers), size=queries)] + 0.35 * rng.normal(size=(queries, dim)).astype(np.float32)
+    metas = [{"id": f"doc-{i}", "commune_key": COMMUNES[i % len(COMMUNES)], "bedrooms_min": int(i % 4)} for i in range(docs)]
+    return vectors, query_vectors, metas
+
+def exact_top_k(vectors, query_vectors, k, mask=None):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    scores = queries @ unit.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+def percentiles(samples):
+    a = np.asarray(samples) * 1000
+    return {"p50": round(float(np.percentile(a, 50)), 3), "p99": round(float(np.percentile(a, 99)), 3)}
+
+def open_store(backend: str, path: str):
+    if backend == "chroma":
+        from vectorStorage.chromadb import ChromaDBStore
+        return ChromaDBStore("bench", db_path=path)
+    from vectorStorage.numpy_store import NumpyVectorStore
+    return NumpyVectorStore("bench", db_path=path, quantize=backend == "numpy-int8")
+
+def run_backend(backend: str, vectors, query_vectors, metas, k: int, truth, truth_filtered, where, out):
+    path = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        before = rss_mb()
+        store = open_store(backend, path)
+        ids = [m["id"] for m in metas]
+        start = time.perf_counter()
+        for i in range(0, len(ids), 1000):  # Chroma limita el tamaño de cada upsert
+            store.upsert([""] * len(ids[i:i + 1000]), vectors[i:i + 1000].tolist(), metas[i:i + 1000], ids[i:i + 1000])
+        store.flush()
+        build = time.perf_counter() - start
+        memory = rss_mb() - before
+        del store
+
+        start = time.perf_counter()
+        store = open_store(backend, path)
+        store.query(query_vectors[0].tolist(), n_results=k)
+        cold_open = time.perf_counter() - start
+
+        single, filtered, found, found_filtered = [], [], [], []
+        for q in query_vectors:
+            t = time.perf_counter()
+            result = store.query(q.tolist(), n_results=k)
+            single.append(time.perf_counter() - t)
+            found.append({int(i.split("-")[1]) for i in result[3]})
+            t = time.perf_counter()
+            result = store.query(q.tolist(), n_results=k, where=where)
+            filtered.append(time.perf_counter() - t)
+            found_filtered.append({int(i.split("-")[1]) for i in result[3]})
+        start = time.perf_counter()
+        store.query_many(query_vectors.tolist(), n_results=k)
+        batch = (time.perf_counter() - start) / len(query_vectors)
+
+        out.put({
+            "backend": backend,
+            "build_s": round(build, 3),
+            "cold_open_ms": round(cold_open * 1000, 1),
+            "rss_mb": round(memory, 1),
+            "query_ms": percentiles(single),
+            "filtered_query_ms": percentiles(filtered),
+            "batch_query_ms_per_query": round(batch * 1000, 3),
+            f"recall@{k}": round(float(np.mean([len(f & t) / k for f, t in zip(found, truth)])), 4),
+            f"filtered_recall@{k}": round(float(np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found_filtered, truth_filtered)])), 4),
+        })
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="ChromaDB vs índice NumPy")
+    parser.add_argument('--docs', type=int, default=5000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--backends', default="chroma,numpy,numpy-int8")
+    parser.add_argument('--json', default="", help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    vectors, query_vectors, metas = make_corpus(args.docs, args.dim, args.queries)
+    where = {"$and": [{"commune_key": {"$eq": "nunoa"}}, {"bedrooms_min": {"$lte": 1}}]}
+    mask = np.array([m["commune_key"] == "nunoa" and m["bedrooms_min"] <= 1 for m in metas])
+    truth = exact_top_k(vectors, query_vectors, args.k)
+    truth_filtered = exact_top_k(vectors, query_vectors, args.k, mask)
+    truth_filtered = [{i for i in t if mask[i]} for t in truth_filtered]
+    print(f"{args.docs} docs x {args.dim} dim, {args.queries} consultas, k={args.k}, filtro: {int(mask.sum())} docs")
+
+    # Cada backend en su propio proceso para que la memoria medida sea solo la suya
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for backend in args.backends.split(","):
+        out = ctx.Queue()
+        proc = ctx.Process(target=run_backend, args=(backend, vectors, query_vectors, metas, args.k, truth, truth_filtered, where, out))
+        proc.start()
+        result = out.get()
+        proc.join()
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"docs": args.docs, "dim": args.dim, "k": args.k, "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Servidor local compatible con la API de chat completions de OpenAI, para benchmarks sin red.
+
+Responde a POST /v1/chat/completions tras una latencia configurable (simula el tiempo del modelo),
+con o sin `stream`; en streaming espera además `token_delay` entre fragmentos. Se usa apuntando OPENAI_API_BASE a la URL que devuelve `serve_fake_llm`:
+
+    python benchmarks/fake_llm.py --port 8100 --latency 0.3
+"""
+import json
+import time
+import uuid
+import argparse
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ANSWER = ("Estas son las propiedades que mejor calzan con tu búsqueda. "
+          "Revisa cada link para ver la disponibilidad actualizada.")
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # el default (5) descarta conexiones con decenas de clientes simultáneos
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.3
+    token_delay = 0.02
+    calls = None
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.calls is not None:
+            self.calls.append(request)
+        time.sleep(self.latency)
+        model = request.get("model", "gpt-4o")
+        if request.get("stream"):
+            self._stream(model)
+            return
+        body = json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(ANSWER.split()), "total_tokens": len(ANSWER.split())},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, model: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = ANSWER.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            delta = {"content": word if i == 0 else " " + word}
+            self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _event(self, payload: dict):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+@contextmanager
+def serve_fake_llm(latency: float = 0.3, port: int = 0, calls: list = None, token_delay: float = 0.02):
+    """Levanta el servidor en un hilo y entrega la base URL (`http://127.0.0.1:<port>/v1`)."""
+    handler = type("Handler", (FakeLLMHandler,), {"latency": latency, "calls": calls, "token_delay": token_delay})
+    server = FakeLLMServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency', type=float, default=0.3, help='Segundos de espera por respuesta')
+    args = parser.parse_args()
+    with serve_fake_llm(args.latency, args.port) as base_url:
+        print(f"Fake LLM en {base_url} (latencia {args.latency}s)")
+        threading.Event().wait()
@@ -0,0 +1,135 @@
+"""Prueba de carga de /ask con un LLM falso local (sin red ni costo).
+
+Levanta el fake LLM y la API en este proceso, lanza `--clients` clientes concurrentes y reporta
+p50/p99 de /ask y la latencia de /health medida en paralelo (si el event loop se bloquea, /health
+lo delata). Con `--llm-url` se usa un fake LLM levantado aparte (`python benchmarks/fake_llm.py`),
+así no comparte el GIL con la API. `--sync` usa el camino síncrono anterior dentro del handler async, como referencia.
+
+    python benchmarks/load_test_ask.py --clients 50 --requests 4 --latency 0.3
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from contextlib import nullcontext
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_llm import serve_fake_llm
+
+QUERIES = [
+    "departamento de 2 dormitorios en Santiago",
+    "arriendo en Ñuñoa con estacionamiento",
+    "estudio cerca del metro en Providencia",
+    "3 dormitorios y 2 baños en Las Condes",
+    "departamentos con promoción primer mes gratis",
+    "What 2-bedroom apartments are available in Santiago?",
+]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p99": None, "max": None}
+    a = np.asarray(samples) * 1000
+    return {"p50": round(float(np.percentile(a, 50)), 1), "p99": round(float(np.percentile(a, 99)), 1),
+            "max": round(float(a.max()), 1)}
+
+def start_api(port: int, use_sync: bool):
+    import uvicorn
+    from api.main import app, warmup
+
+    if use_sync:
+        from api.main import QueryRequest, get_agent
+
+        @app.post("/ask_sync")
+        async def ask_sync(request: QueryRequest):
+            return (await get_agent()).search_and_generate(request.query)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    # El agente se carga en segundo plano después del bind
+    agent = warmup.start().result()
+    print(f"Arranque: {warmup.timings}")
+    return server, agent
+
+async def run_load(base_url: str, path: str, clients: int, requests: int, unique: bool, tag: str):
+    latencies, errors, health = [], 0, []
+    done = asyncio.Event()
+
+    async def client(worker: int, http: httpx.AsyncClient):
+        nonlocal errors
+        for i in range(requests):
+            query = QUERIES[(worker + i) % len(QUERIES)]
+            if unique:
+                query = f"{query} #{tag}-{worker}-{i}"  # evita el cache de respuestas
+            start = time.perf_counter()
+            r = await http.post(path, json={"query": query})
+            latencies.append(time.perf_counter() - start)
+            errors += r.status_code != 200
+
+    async def probe(http: httpx.AsyncClient):
+        while not done.is_set():
+            start = time.perf_counter()
+            await http.get("/health")
+            health.append(time.perf_counter() - start)
+            await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as http:
+        await http.post(path, json={"query": f"calentamiento {tag}"})  # carga el cliente LLM y el modelo
+        prober = asyncio.create_task(probe(http))
+        start = time.perf_counter()
+        await asyncio.gather(*(client(w, http) for w in range(clients)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+    return {"requests": len(latencies), "errors": errors, "seconds": round(elapsed, 2),
+            "rps": round(len(latencies) / elapsed, 1), "ask_ms": percentiles(latencies),
+            "health_ms": percentiles(health)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test de /ask")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=4, help='Peticiones por cliente')
+    parser.add_argument('--latency', type=float, default=0.3, help='Latencia simulada del LLM (s)')
+    parser.add_argument('--sync', action='store_true', help='Medir también el camino síncrono anterior')
+    parser.add_argument('--cached', action='store_true', help='Repetir consultas (deja actuar al cache de respuestas)')
+    parser.add_argument('--llm-url', default="", help='Base URL de un fake LLM externo (por defecto se levanta uno en este proceso)')
+    parser.add_argument('--json', default="", help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    # Sin --cached, el cache semántico tampoco debe responder por el LLM
+    if not args.cached:
+        os.environ.setdefault("ANSWER_CACHE_SIMILARITY", "2")
+    with (nullcontext(args.llm_url) if args.llm_url else serve_fake_llm(latency=args.latency)) as llm_url:
+        os.environ["OPENAI_API_BASE"] = llm_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+        port = free_port()
+        server, agent = start_api(port, args.sync)
+        base_url = f"http://127.0.0.1:{port}"
+        results = {}
+        paths = [("async", "/ask")] + ([("sync", "/ask_sync")] if args.sync else [])
+        for name, path in paths:
+            results[name] = asyncio.run(run_load(base_url, path, args.clients, args.requests, not args.cached, name))
+            print(f"{name:>6}: {json.dumps(results[name], ensure_ascii=False)}")
+        if agent._batcher is not None:
+            print(f"Lotes de embeddings de consultas: {agent._batcher.batches}")
+        server.should_exit = True
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"clients": args.clients, "llm_latency": args.latency, "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
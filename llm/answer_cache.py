@@ -0,0 +1,163 @@
+import re
+import time
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+def normalize_query(query: str) -> str:
+    """Minúsculas, sin signos de puntuación y con espacios colapsados: '¿2 Dormitorios  en Santiago?' -> '2 dormitorios en santiago'."""
+    text = unicodedata.normalize("NFC", query).lower()
+    text = re.sub(r"[¿?¡!.,;:\"']", " ", text)
+    return " ".join(text.split())
+
+class AnswerCache:
+    """Cache de respuestas de /ask en dos niveles; cada entrada lleva la versión del índice que la produjo.
+
+    1. Exacto: consulta normalizada (+ n) -> respuesta, antes de embeber.
+    2. Semántico: embedding casi idéntico (coseno >= `similarity`) y mismos `source_ids` recuperados.
+
+    Durante un cambio de índice conviven la versión nueva y la que terminan las consultas en curso, cada
+    una con sus entradas; al aparecer más de `max_versions` se descartan las de la más antigua.
+    Ambos niveles tienen TTL y desalojo LRU. `get_or_compute` agrupa peticiones idénticas simultáneas
+    para que haya una sola llamada al LLM en curso por clave.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, similarity: float = 0.97, max_versions: int = 2):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_versions = max_versions
+        self.versions: "OrderedDict[str, None]" = OrderedDict()  # versiones con entradas, de la más antigua a la más nueva
+        self._retired: set = set()
+        self.exact: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        self.semantic: "OrderedDict[Tuple, Tuple[float, np.ndarray, Dict]]" = OrderedDict()
+        self._by_sources: Dict[Tuple, set] = {}
+        self._inflight: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def _add_version(self, version: str) -> bool:
+        """Registra `version` al guardar; False si ya fue descartada (una consulta rezagada sobre un índice viejo)."""
+        if version in self.versions:
+            return True
+        if version in self._retired:
+            return False
+        self.versions[version] = None
+        while len(self.versions) > self.max_versions:
+            stale, _ = self.versions.popitem(last=False)
+            self._retired.add(stale)
+            self.stats["invalidations"] += 1
+            for key in [k for k in self.exact if k[0] == stale]:
+                del self.exact[key]
+            for key in [k for k in self.semantic if k[0] == stale]:
+                self._evict_semantic(key)
+        return True
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def get_exact(self, query: str, n: int, version: str) -> Optional[Dict]:
+        key = (version, normalize_query(query), n)
+        with self._lock:
+            entry = self.exact.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.exact.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry[1]
+            if entry:
+                del self.exact[key]
+        return None
+
+    def get_semantic(self, embedding, source_ids: List[str], version: str) -> Optional[Dict]:
+        sources = (version, tuple(source_ids))
+        query = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            for key in list(self._by_sources.get(sources, ())):
+                expires, cached_emb, response = self.semantic[key]
+                if expires <= now:
+                    self._evict_semantic(key)
+                elif float(query @ cached_emb) >= self.similarity:
+                    self.semantic.move_to_end(key)
+                    self.stats["semantic_hits"] += 1
+                    return response
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, query: str, n: int, embedding, source_ids: List[str], response: Dict, version: str):
+        expires = time.monotonic() + self.ttl
+        normalized = normalize_query(query)
+        sources = tuple(source_ids)
+        with self._lock:
+            if not self._add_version(version):
+                return
+            self.exact[(version, normalized, n)] = (expires, response)
+            self.exact.move_to_end((version, normalized, n))
+            key = (version, normalized, sources)
+            self.semantic[key] = (expires, self._unit(embedding), response)
+            self.semantic.move_to_end(key)
+            self._by_sources.setdefault((version, sources), set()).add(key)
+            while len(self.exact) > self.max_entries:
+                self.exact.popitem(last=False)
+            while len(self.semantic) > self.max_entries:
+                self._evict_semantic(next(iter(self.semantic)))
+
+    def _evict_semantic(self, key: Tuple):
+        self.semantic.pop(key, None)
+        sources = (key[0], key[2])
+        bucket = self._by_sources.get(sources)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._by_sources[sources]
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], Any]) -> Any:
+        """Ejecuta `compute` una sola vez por clave; las peticiones concurrentes esperan ese resultado."""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return future.result()
+        try:
+            result = compute()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_compute(self, key: Tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Versión async de `get_or_compute`; comparte las llamadas en curso con el camino síncrono."""
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await compute()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
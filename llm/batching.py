@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class QueryBatcher:
+    """Micro-batching de consultas: las que llegan dentro de `window` segundos se embeben en un solo `encode`.
+
+    El encode corre en el executor acotado, así que el event loop nunca queda bloqueado por CPU.
+    """
+    def __init__(self, encode_many: Callable[[List[str]], np.ndarray], executor: Executor,
+                 window: float = 0.005, max_batch: int = 32):
+        self.encode_many = encode_many
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer = None
+        self.loop = None
+        self.batches = 0
+
+    async def encode(self, text: str) -> np.ndarray:
+        return await self.submit(text)
+
+    async def submit(self, item):
+        """Encola `item` (no solo textos: `encode_many` recibe la lista del lote y devuelve un resultado por item)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        self.batches += 1
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.encode_many, [text for text, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Batch encode failed for {len(batch)} queries: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
@@ -0,0 +1,51 @@
+import os
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Presupuesto de tokens para las propiedades que se envían al LLM (sin contar las instrucciones)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")  # tokenizer de gpt-4o
+except Exception:  # tiktoken es opcional; sin él se estima
+    _ENCODING = None
+
+def count_tokens(text: str) -> int:
+    """Tokens de `text` según el tokenizer de gpt-4o, o una estimación (~4 caracteres por token) sin tiktoken."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+def build_context(hits: List[Dict], budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, List[Dict]]:
+    """Arma el contexto del prompt con los edificios recuperados sin pasarse de `budget` tokens.
+
+    Cada edificio aparece una sola vez (título, ubicación y URL no se repiten por tipología) seguido solo
+    de las tipologías que calzaron con la búsqueda, en orden de relevancia. Devuelve el texto y los
+    edificios que alcanzaron a entrar; el primero entra siempre, aunque sea con una sola tipología.
+    """
+    blocks, included, used = [], [], 0
+    for hit in hits:
+        header = f"[{len(included) + 1}] {hit['title']} - {hit['location']}\nURL: {hit['url']}\n"
+        block, cost = header, count_tokens(header)
+        lines = 0
+        for segment in hit["segments"]:
+            line = f"- {segment}\n"
+            line_cost = count_tokens(line)
+            if used + cost + line_cost > budget and (included or lines):
+                break
+            block += line
+            cost += line_cost
+            lines += 1
+        if not lines:
+            break
+        blocks.append(block)
+        included.append(hit)
+        used += cost
+        if lines < len(hit["segments"]):
+            break
+    if len(included) < len(hits):
+        logger.info(f"Contexto recortado a {len(included)}/{len(hits)} edificios ({used} tokens, presupuesto {budget})")
+    return "\n".join(blocks), included
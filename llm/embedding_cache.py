@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Cache persistente de embeddings direccionado por contenido: (modelo, sha256 del texto) -> vector.
+
+    Los vectores viven en un `.npy` float32 abierto con memory-map (se carga sin copiar al iniciar) y
+    un índice JSON mapea cada sha a su fila. El archivo crece duplicando su capacidad.
+
+    Varios procesos (p. ej. `uvicorn --workers N`) pueden compartir el directorio: cada escritura toma un
+    lock exclusivo (`flock`) y recarga el índice antes de elegir filas, así nadie pisa las de otro.
+    """
+    def __init__(self, cache_dir: str, model_name: str):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        safe_name = re.sub(r"[^\w.-]", "_", model_name)
+        self.vectors_file = os.path.join(cache_dir, f"{safe_name}.npy")
+        self.index_file = os.path.join(cache_dir, f"{safe_name}.index.json")
+        self.lock_file = os.path.join(cache_dir, f"{safe_name}.lock")
+        self.rows: Dict[str, int] = {}
+        self.vectors = None
+        self._signature = None
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._exclusive():
+            self._load()
+        logger.info(f"Cache de embeddings: {len(self.rows)} vectores en {self.vectors_file}")
+
+    @contextmanager
+    def _exclusive(self):
+        """Lock exclusivo entre procesos sobre el cache de este modelo."""
+        with open(self.lock_file, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _index_signature(self):
+        try:
+            st = os.stat(self.index_file)
+            return st.st_ino, st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        """(Re)lee el índice y el memory-map si otro proceso los cambió desde la última lectura (con el lock tomado)."""
+        signature = self._index_signature()
+        if signature == self._signature:
+            return
+        self._signature = signature
+        if signature is None or not os.path.exists(self.vectors_file):
+            return
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("model") != self.model_name:
+            logger.warning(f"Cache de embeddings de otro modelo en {self.index_file}, se ignora")
+            return
+        self.rows = index["rows"]
+        self.vectors = np.load(self.vectors_file, mmap_mode="r+")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, key: str):
+        row = self.rows.get(key)
+        return None if row is None else self.vectors[row]
+
+    def _ensure_capacity(self, needed: int, dim: int):
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        tmp = f"{self.vectors_file}.tmp"
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(new_capacity, dim))
+        if capacity:
+            grown[:len(self.rows)] = self.vectors[:len(self.rows)]
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp, self.vectors_file)
+        self.vectors = np.load(self.vectors_file, mmap_mode="r+")
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Agrega vectores nuevos y persiste el índice (primero los datos, luego el índice).
+
+        Recarga, agrega y persiste bajo el lock: las filas nuevas se eligen sobre lo que escribieron los
+        demás procesos, no sobre la copia en memoria de este.
+        """
+        with self._exclusive():
+            self._load()
+            new = [(k, v) for k, v in zip(keys, vectors) if k not in self.rows]
+            if not new:
+                return
+            rows = dict(self.rows)
+            start = len(rows)
+            self._ensure_capacity(start + len(new), vectors.shape[1])
+            self.vectors[start:start + len(new)] = np.stack([v for _, v in new])
+            self.vectors.flush()
+            for offset, (key, _) in enumerate(new):
+                rows[key] = start + offset
+            tmp = f"{self.index_file}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"model": self.model_name, "dim": int(vectors.shape[1]), "rows": rows}, f)
+            os.replace(tmp, self.index_file)
+            self.rows = rows
+            self._signature = self._index_signature()
+
+class CachedEmbedder:
+    """Antepone caches al modelo de embeddings: persistente para documentos y LRU en memoria para consultas."""
+    def __init__(self, model, model_name: str, cache_dir: str, query_cache_size: int = 2048):
+        self.model = model
+        self.model_name = model_name
+        self.documents = EmbeddingCache(cache_dir, model_name)
+        self.queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.query_cache_size = query_cache_size
+        self.stats = {"doc_hits": 0, "doc_misses": 0, "query_hits": 0, "query_misses": 0}
+        self._lock = threading.Lock()
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        """Embebe solo los documentos cuyo texto no está en el cache persistente."""
+        keys = [text_key(t) for t in texts]
+        with self._lock:
+            missing = {k: t for k, t in zip(keys, texts) if self.documents.get(k) is None}
+            self.stats["doc_hits"] += len(texts) - len(missing)
+            self.stats["doc_misses"] += len(missing)
+        if missing:
+            vectors = np.asarray(self.model.encode(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                self.documents.put_many(list(missing), vectors)
+        with self._lock:
+            return np.stack([np.array(self.documents.get(k)) for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def encode_query(self, text: str) -> np.ndarray:
+        key = text_key(text)
+        with self._lock:
+            vector = self.queries.get(key)
+            if vector is not None:
+                self.queries.move_to_end(key)
+                self.stats["query_hits"] += 1
+                return vector
+            self.stats["query_misses"] += 1
+        vector = np.asarray(self.model.encode(text), dtype=np.float32)
+        with self._lock:
+            self.queries[key] = vector
+            if len(self.queries) > self.query_cache_size:
+                self.queries.popitem(last=False)
+        return vector
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Varias consultas en una sola llamada al modelo (solo las que no están en el LRU)."""
+        keys = [text_key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self.queries.get(key)
+                if vector is not None:
+                    self.queries.move_to_end(key)
+                    found[key] = vector
+            self.stats["query_hits"] += sum(1 for k in keys if k in found)
+            self.stats["query_misses"] += sum(1 for k in keys if k not in found)
+        missing = {k: t for k, t in zip(keys, texts) if k not in found}
+        if missing:
+            vectors = np.asarray(self.model.encode(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    found[key] = self.queries[key] = vector
+                while len(self.queries) > self.query_cache_size:
+                    self.queries.popitem(last=False)
+        return np.stack([found[k] for k in keys])
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """Compatible con `SentenceTransformer.encode`: un string es una consulta, una lista son documentos."""
+        if isinstance(texts, str):
+            return self.encode_query(texts)
+        return self.encode_documents(texts)
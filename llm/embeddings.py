@@ -0,0 +1,114 @@
+import os
+import logging
+import threading
+from typing import List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+# Archivo ONNX cuantizado a int8 publicado junto al modelo en el Hub
+ONNX_INT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+class SentenceTransformerBackend:
+    """Backend de embeddings en CPU sobre SentenceTransformer.
+
+    - `batch_size`: tamaño de lote ajustable (el default de la librería es 32).
+    - Ordena los textos por largo antes de embeber para que cada lote tenga poco padding.
+    - `workers > 1`: reparte la indexación masiva en un pool de procesos (uno por núcleo).
+    - `quantize`: `"int8"` aplica cuantización dinámica de PyTorch a las capas lineales;
+      `"onnx"` usa el modelo ONNX int8 con onnxruntime.
+
+    El modelo (y sentence_transformers/torch) se carga recién en el primer uso de `model`, para que
+    crear el backend no demore el arranque de la API.
+    """
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = 64, workers: int = 0,
+                 quantize: str = "", pool_min_texts: int = 256):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.quantize = quantize
+        self.pool_min_texts = pool_min_texts
+        self._pool = None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _load(self):
+        if self.quantize == "onnx":
+            self._require_onnx()
+        from sentence_transformers import SentenceTransformer
+        if self.quantize == "onnx":
+            model = SentenceTransformer(self.model_name, device="cpu", backend="onnx",
+                                        model_kwargs={"file_name": ONNX_INT8_FILE})
+        else:
+            model = SentenceTransformer(self.model_name, device="cpu")
+            if self.quantize == "int8":
+                import torch
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info(f"Embeddings: {self.name} (batch={self.batch_size}, workers={self.workers})")
+        return model
+
+    @staticmethod
+    def _require_onnx():
+        """El backend ONNX necesita optimum y onnxruntime, que vienen en el extra `onnx` del proyecto."""
+        try:
+            import onnxruntime  # noqa: F401
+            import optimum.onnxruntime  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                f"EMBEDDING_QUANTIZE=onnx requiere el extra 'onnx' ({e.name} no está instalado): "
+                "uv pip install -r pyproject.toml --extra onnx"
+            ) from e
+
+    @property
+    def name(self) -> str:
+        """Identifica el modelo y su variante; los vectores cuantizados no se mezclan en el cache con los fp32."""
+        return f"{self.model_name}-{self.quantize}" if self.quantize else self.model_name
+
+    def encode(self, texts: Union[str, List[str]], **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.model.encode(texts, batch_size=self.batch_size, **kwargs)
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        ordered = [texts[i] for i in order]
+        if self.workers > 1 and len(ordered) >= self.pool_min_texts:
+            vectors = self.model.encode_multi_process(ordered, self._get_pool(), batch_size=self.batch_size)
+        else:
+            vectors = self.model.encode(ordered, batch_size=self.batch_size, **kwargs)
+        result = np.empty_like(vectors)
+        result[order] = vectors
+        return result
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = self.model.start_multi_process_pool(["cpu"] * self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+def create_embedding_backend() -> SentenceTransformerBackend:
+    """Crea el backend según EMBEDDING_BATCH_SIZE, EMBEDDING_WORKERS y EMBEDDING_QUANTIZE (""/int8/onnx)."""
+    return SentenceTransformerBackend(
+        model_name=os.getenv("EMBEDDING_MODEL", EMBEDDING_MODEL),
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+        workers=int(os.getenv("EMBEDDING_WORKERS", "0")),
+        quantize=os.getenv("EMBEDDING_QUANTIZE", "")
+    )
@@ -0,0 +1,45 @@
+import threading
+from typing import Any, Dict, List
+
+from llm.lexical import BM25Index, HybridRetriever
+from llm.market import MarketTable
+from llm.query_parser import QueryParser
+from scraper.parsing import commune_of
+
+class IndexGeneration:
+    """Todo lo que se deriva de un snapshot: propiedades, colección vectorial, BM25, parser y tabla de mercado.
+
+    El agente sirve una sola generación activa y la reemplaza entera al llegar un snapshot nuevo, así una
+    consulta nunca mezcla el filtro de un snapshot con los chunks de otro. Cada consulta la reserva
+    (`acquire`/`release`) mientras la usa; `wait_idle()` espera a que terminen las que siguen en curso antes de
+    borrar la colección.
+    """
+    def __init__(self, json_file: str, properties: List[Dict[str, Any]], collection: str, vector_store,
+                 lexical: BM25Index = None, hybrid: bool = True):
+        self.json_file = json_file
+        self.properties = properties
+        self.collection = collection
+        self.vector_store = vector_store
+        self.lexical = lexical if lexical is not None else BM25Index()
+        self.retriever = HybridRetriever(vector_store, self.lexical) if hybrid else None
+        self.query_parser = QueryParser(communes=[commune_of(p.get("location", "")) for p in properties])
+        # Tipologías en columnas con precios y m² numéricos, para los agregados de /market
+        self.market = MarketTable.from_properties(properties)
+        self.version = ""
+        self.in_flight = 0
+        self._idle = threading.Condition()
+
+    def acquire(self):
+        with self._idle:
+            self.in_flight += 1
+
+    def release(self):
+        with self._idle:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """True si no quedan consultas en curso (o terminaron antes de `timeout` segundos)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self.in_flight, timeout=timeout)
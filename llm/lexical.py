@@ -0,0 +1,144 @@
+import re
+import math
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from scraper.parsing import strip_accents
+from vectorStorage.filters import matches_where
+
+TOKEN_RE = re.compile(r"\w+")
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "hay", "la", "las", "lo", "los", "me", "mi", "o", "para",
+    "por", "que", "se", "su", "sus", "un", "una", "y", "cual", "cuales", "donde",
+    "an", "and", "are", "for", "in", "is", "of", "the", "what", "which", "with", "where",
+}
+
+def _stem(token: str) -> str:
+    # Plurales en español/inglés: 'dormitorios' -> 'dormitorio', 'leones' -> 'leon'
+    if len(token) > 5 and token.endswith("es"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas, sin tildes, sin stopwords y con plurales recortados: 'Edificio Plaza Ñuñoa' -> ['edificio', 'plaza', 'nunoa']."""
+    return [_stem(t) for t in TOKEN_RE.findall(strip_accents(text).lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """Índice invertido BM25 en memoria sobre los mismos documentos que se indexan en ChromaDB.
+
+    Se actualiza por documento (`upsert`/`delete`), guarda documento y metadata para devolver hits
+    completos y filtra con los mismos `where` que Chroma. Una búsqueda solo recorre las listas de
+    postings de los términos de la consulta.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.documents: Dict[str, str] = {}
+        self.metadatas: Dict[str, Dict] = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.lengths
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        with self._lock:
+            for doc_id, doc, meta in zip(ids, documents, metadatas):
+                self._remove(doc_id)
+                terms = Counter(tokenize(doc))
+                for term, tf in terms.items():
+                    self.postings.setdefault(term, {})[doc_id] = tf
+                length = sum(terms.values())
+                self.lengths[doc_id] = length
+                self.total_length += length
+                self.documents[doc_id] = doc
+                self.metadatas[doc_id] = meta
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        if doc_id not in self.lengths:
+            return
+        for term in set(tokenize(self.documents[doc_id])):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+        del self.documents[doc_id]
+        del self.metadatas[doc_id]
+
+    def search(self, query: str, k: int = 10, where: Optional[Dict] = None) -> List[Tuple[str, float]]:
+        """Top-k (id, score BM25) de los documentos que cumplen `where`."""
+        with self._lock:
+            n_docs = len(self.lengths)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+            if where:
+                scores = {d: s for d, s in scores.items() if matches_where(self.metadatas[d], where)}
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+class HybridRetriever:
+    """Fusiona el ranking vectorial (ChromaDB) con el léxico (BM25) por Reciprocal Rank Fusion.
+
+    RRF solo usa posiciones, así que no hay que calibrar distancias coseno contra scores BM25:
+    score(d) = sum(1 / (k + rank)) sobre las listas donde aparece d.
+    """
+    def __init__(self, vector_store, lexical: BM25Index, k: int = 60):
+        self.vector_store = vector_store
+        self.lexical = lexical
+        self.k = k
+
+    def query(self, query: str, query_embedding: List[float], n_results: int = 5, where: Optional[Dict] = None):
+        """Misma forma de resultado que `ChromaDBStore.query`; los hits solo léxicos no tienen distancia (None)."""
+        vector = self.vector_store.query(query_embedding, n_results=n_results, where=where)
+        return self._fuse(query, vector, n_results, where)
+
+    def query_many(self, queries: List[str], query_embeddings: List[List[float]], n_results: int = 5,
+                   where: Optional[Dict] = None):
+        """Varias consultas con el mismo filtro: una sola llamada a ChromaDB y BM25 por consulta."""
+        vectors = self.vector_store.query_many(query_embeddings, n_results=n_results, where=where)
+        return [self._fuse(query, vector, n_results, where) for query, vector in zip(queries, vectors)]
+
+    def _fuse(self, query: str, vector, n_results: int, where: Optional[Dict]):
+        docs, metas, distances, ids = vector
+        lexical = self.lexical.search(query, k=n_results, where=where)
+        if not lexical:
+            return docs, metas, distances, ids
+        fused: Dict[str, float] = {}
+        for rank, doc_id in enumerate(ids):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (self.k + rank + 1)
+        for rank, (doc_id, _) in enumerate(lexical):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (self.k + rank + 1)
+        vector_hits = {doc_id: (doc, meta, dist) for doc, meta, dist, doc_id in zip(docs, metas, distances, ids)}
+        order = sorted(fused, key=fused.get, reverse=True)[:n_results]
+        result = ([], [], [], [])
+        for doc_id in order:
+            doc, meta, dist = vector_hits.get(doc_id) or (self.lexical.documents[doc_id], self.lexical.metadatas[doc_id], None)
+            for column, value in zip(result, (doc, meta, dist, doc_id)):
+                column.append(value)
+        return result
@@ -0,0 +1,108 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from llm.query_parser import UF_CLP
+from scraper.history import typology_keys
+from scraper.parsing import commune_of, parse_typology, strip_accents
+
+logger = logging.getLogger(__name__)
+
+# Columnas por las que se puede agrupar en los agregados
+GROUP_COLUMNS = ("commune", "bedrooms", "bathrooms", "currency")
+
+class MarketTable:
+    """Tabla columnar con una fila por tipología del snapshot, con precios y superficies ya numéricos.
+
+    Se arma una vez al cargar el snapshot; los agregados (mediana de precio por m², distribución de
+    precios) son group-bys vectorizados de pandas, sin pasar por el LLM. Los precios se llevan a CLP y
+    a UF con `uf_clp`; precio y superficie de una tipología son el punto medio de su rango.
+    """
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    @classmethod
+    def from_properties(cls, properties: List[Dict[str, Any]], uf_clp: float = UF_CLP) -> "MarketTable":
+        rows = []
+        for prop in properties:
+            typologies = prop.get("typologies", [])
+            commune = commune_of(prop.get("location", ""))
+            for key, typ in zip(typology_keys(typologies), typologies):
+                row = parse_typology(typ)
+                row.update(id=prop.get("id"), title=prop.get("title"), url=prop.get("url"),
+                           commune=commune, typology_key=key)
+                rows.append(row)
+        columns = ["id", "title", "url", "commune", "typology_key", "bedrooms", "bathrooms",
+                   "area_min", "area_max", "price_min", "price_max", "currency"]
+        frame = pd.DataFrame(rows, columns=columns)
+        for col in ("bedrooms", "bathrooms"):
+            frame[col] = frame[col].astype("Int64")
+        for col in ("area_min", "area_max", "price_min", "price_max"):
+            frame[col] = frame[col].astype("float64")
+        frame["commune_key"] = frame["commune"].map(lambda c: strip_accents(c).lower())
+        frame["area"] = frame[["area_min", "area_max"]].mean(axis=1)
+        price = frame[["price_min", "price_max"]].mean(axis=1)
+        in_uf = frame["currency"] == "UF"
+        frame["price_clp"] = np.where(in_uf, price * uf_clp, price)
+        frame["price_uf"] = frame["price_clp"] / uf_clp
+        area = frame["area"].where(frame["area"] > 0)
+        frame["price_m2_clp"] = frame["price_clp"] / area
+        frame["price_m2_uf"] = frame["price_uf"] / area
+        logger.info(f"Tabla de mercado: {len(frame)} tipologías de {frame['id'].nunique()} propiedades")
+        return cls(frame)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def _filter(self, commune: str = None, bedrooms: int = None) -> pd.DataFrame:
+        mask = pd.Series(True, index=self.frame.index)
+        if commune:
+            mask &= self.frame["commune_key"] == strip_accents(commune).lower().strip()
+        if bedrooms is not None:
+            mask &= self.frame["bedrooms"] == bedrooms
+        return self.frame[mask.fillna(False)]
+
+    @staticmethod
+    def _records(frame: pd.DataFrame) -> List[Dict]:
+        """DataFrame -> lista de dicts serializable a JSON (NaN/NA -> None, enteros de numpy -> int)."""
+        frame = frame.astype(object).where(frame.notna(), None)
+        return [{k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}
+                for row in frame.to_dict(orient="records")]
+
+    def price_per_m2(self, group_by: Sequence[str] = ("commune", "bedrooms"), currency: str = "CLP",
+                     commune: str = None, bedrooms: int = None) -> List[Dict]:
+        """Mediana (y percentiles 25/75) del precio por m² por grupo, con la cantidad de tipologías."""
+        unknown = [c for c in group_by if c not in GROUP_COLUMNS]
+        if not group_by or unknown:
+            raise ValueError(f"No se puede agrupar por {list(group_by)}; opciones: {list(GROUP_COLUMNS)}")
+        column = "price_m2_uf" if currency.upper() == "UF" else "price_m2_clp"
+        frame = self._filter(commune, bedrooms).dropna(subset=[column])
+        if frame.empty:
+            return []
+        grouped = frame.groupby(list(group_by), dropna=False)[column]
+        stats = pd.DataFrame({"count": grouped.count(), "median": grouped.median(),
+                              "p25": grouped.quantile(0.25), "p75": grouped.quantile(0.75)})
+        stats = stats.round(4 if column == "price_m2_uf" else 2).reset_index().sort_values(["count", *group_by], ascending=[False] + [True] * len(group_by))
+        return self._records(stats)
+
+    def price_distribution(self, currency: str = "CLP", commune: str = None, bedrooms: int = None,
+                           bins: int = 10) -> Optional[Dict]:
+        """Histograma y percentiles del precio (punto medio de cada tipología) para el filtro dado."""
+        column = "price_uf" if currency.upper() == "UF" else "price_clp"
+        values = self._filter(commune, bedrooms)[column].dropna().to_numpy()
+        if not len(values):
+            return None
+        counts, edges = np.histogram(values, bins=bins)
+        quantiles = np.percentile(values, [10, 25, 50, 75, 90])
+        return {
+            "currency": "UF" if column == "price_uf" else "CLP",
+            "count": int(len(values)),
+            "min": round(float(values.min()), 2),
+            "max": round(float(values.max()), 2),
+            "mean": round(float(values.mean()), 2),
+            "percentiles": {f"p{p}": round(float(q), 2) for p, q in zip((10, 25, 50, 75, 90), quantiles)},
+            "histogram": [{"from": round(float(lo), 2), "to": round(float(hi), 2), "count": int(c)}
+                          for lo, hi, c in zip(edges[:-1], edges[1:], counts)],
+        }
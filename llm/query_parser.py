@@ -0,0 +1,171 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+from scraper.parsing import parse_number, parse_typology, commune_of, strip_accents
+
+# Valor de la UF en pesos para comparar precios en CLP y UF (ajustable por entorno)
+UF_CLP = float(os.getenv("UF_CLP", "39500"))
+
+# Comunas del Gran Santiago; se suman las que aparezcan en el snapshot indexado
+COMMUNES = [
+    "Santiago", "Providencia", "Las Condes", "Ñuñoa", "Vitacura", "Lo Barnechea", "La Reina", "Macul",
+    "Peñalolén", "La Florida", "San Miguel", "San Joaquín", "La Cisterna", "Estación Central",
+    "Independencia", "Recoleta", "Quinta Normal", "Conchalí", "Huechuraba", "Quilicura", "Renca",
+    "Cerrillos", "Maipú", "Pudahuel", "Lo Prado", "Cerro Navia", "San Bernardo", "Puente Alto",
+    "La Granja", "La Pintana", "El Bosque", "Pedro Aguirre Cerda", "Lo Espejo", "San Ramón",
+]
+
+WORD_NUMBERS = {"un": 1, "una": 1, "uno": 1, "one": 1, "dos": 2, "two": 2, "tres": 3, "three": 3,
+                "cuatro": 4, "four": 4}
+COUNT = r"(\d+|" + "|".join(WORD_NUMBERS) + r")"
+BEDROOMS_RE = re.compile(COUNT + r"[\s-]*(?:dormitorios?|dorms?|habitacion(?:es)?|piezas?|bedrooms?|beds?|br)\b")
+BATHROOMS_RE = re.compile(COUNT + r"[\s-]*(?:banos?|bathrooms?|baths?)\b")
+SHORT_TYPOLOGY_RE = re.compile(r"\b(\d)\s*d\s*(\d)\s*b\b")  # notación '2d1b' / '2D 2B'
+STUDIO_RE = re.compile(r"\b(?:estudio|studio|monoambiente)\b")
+
+# El punto es separador de miles ('$450.000'), salvo antes de 'millones' ('1.2 millones')
+AMOUNT = (r"(?:(uf)\s*|\$\s*)?(\d{1,3}(?:[.\s]\d{3})+|\d+\.\d{1,2}(?=\s*(?:millones|millon|mm)\b)|\d+(?:,\d+)?)\s*"
+          r"(mil|k|millones|millon|mm)?\b\s*(uf|clp|pesos)?\b")
+MAX_WORDS = r"(?:bajo|menos de|por menos de|hasta|maximo|max|no mas de|inferior a|under|below|less than|up to)"
+MIN_WORDS = r"(?:sobre|mas de|desde|minimo|superior a|over|above|more than|at least|from)"
+BETWEEN_RE = re.compile(r"(?:entre|between)\s+" + AMOUNT + r"\s+(?:y|and|-)\s+" + AMOUNT)
+MAX_RE = re.compile(MAX_WORDS + r"\s+(?:de\s+|a\s+)?" + AMOUNT)
+MIN_RE = re.compile(MIN_WORDS + r"\s+(?:de\s+|a\s+)?" + AMOUNT)
+BARE_PRICE_RE = re.compile(r"(?:\$\s*\d|\buf\s*\d|\d\s*uf\b)")
+
+MULTIPLIERS = {"mil": 1e3, "k": 1e3, "millones": 1e6, "millon": 1e6, "mm": 1e6}
+
+def _normalize(text: str) -> str:
+    return " ".join(strip_accents(text).lower().split())
+
+def _count(token: str) -> int:
+    return WORD_NUMBERS[token] if token in WORD_NUMBERS else int(token)
+
+def _amount(groups, currency: str = None, mult: str = None) -> Optional[Dict]:
+    """(uf, número, multiplicador, moneda) capturados por AMOUNT -> {'value', 'currency'}.
+
+    `currency` y `mult` se usan si el monto no trae los suyos (el otro extremo de un rango).
+    """
+    prefix_uf, raw, own_mult, suffix = groups
+    value = parse_number(raw.replace(" ", "."))
+    if value is None:
+        return None
+    value *= MULTIPLIERS.get(own_mult or mult or "", 1)
+    currency = currency or ("UF" if prefix_uf or suffix == "uf" else "CLP")
+    # Un monto en pesos sin multiplicador y menor a 10.000 no es un arriendo (p. ej. '2' de '2 baños')
+    if currency == "CLP" and value < 10000:
+        return None
+    return {"value": value, "currency": currency}
+
+# --- Metadata numérica que guarda el indexador (mismos nombres de campo que usan los filtros) ---
+def numeric_metadata(typologies: List[Dict], location: str = "", uf_clp: float = UF_CLP) -> Dict:
+    """Rangos de dormitorios, baños, m² y precio (en CLP y UF) sobre las tipologías, más la comuna.
+
+    Chroma no acepta None en la metadata, así que los campos sin dato se omiten.
+    """
+    parsed = [parse_typology(t) for t in typologies]
+    prices_clp = [value * uf_clp if p["currency"] == "UF" else value
+                  for p in parsed for value in (p["price_min"], p["price_max"]) if value is not None]
+    ranges = {
+        "bedrooms": [p["bedrooms"] for p in parsed],
+        "bathrooms": [p["bathrooms"] for p in parsed],
+        "area": [v for p in parsed for v in (p["area_min"], p["area_max"])],
+        "price_clp": prices_clp,
+        "price_uf": [round(v / uf_clp, 2) for v in prices_clp],
+    }
+    meta = {}
+    for field, values in ranges.items():
+        values = [v for v in values if v is not None]
+        if values:
+            meta[f"{field}_min"] = min(values)
+            meta[f"{field}_max"] = max(values)
+    commune = commune_of(location)
+    if commune:
+        meta["commune"] = commune
+        meta["commune_key"] = _normalize(commune)
+    return meta
+
+class QueryParser:
+    """Parser por reglas que extrae restricciones de la pregunta y las traduce a filtros `where` de Chroma.
+
+    Reconoce dormitorios ('2 dormitorios', 'two-bedroom', 'estudio', '2d1b'), baños, precio máximo/mínimo
+    o rango en CLP o UF ('bajo $500.000', 'hasta 500 mil', 'bajo 1.2 millones', 'entre 15 y 20 UF') y la comuna.
+    """
+    def __init__(self, communes: Iterable[str] = ()):
+        keys = {_normalize(c) for c in list(COMMUNES) + list(communes) if c}
+        # Las comunas más largas primero para que 'san miguel' no se confunda con otra que empiece igual
+        self.commune_re = re.compile(r"\b(" + "|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True)) + r")\b")
+
+    def parse(self, query: str) -> Dict:
+        text = _normalize(query)
+        constraints: Dict = {}
+
+        m = SHORT_TYPOLOGY_RE.search(text)
+        if m:
+            constraints["bedrooms"], constraints["bathrooms"] = int(m.group(1)), int(m.group(2))
+        m = BEDROOMS_RE.search(text)
+        if m:
+            constraints["bedrooms"] = _count(m.group(1))
+        elif STUDIO_RE.search(text):
+            constraints["bedrooms"] = 0
+        m = BATHROOMS_RE.search(text)
+        if m:
+            constraints["bathrooms"] = _count(m.group(1))
+
+        m = BETWEEN_RE.search(text)
+        if m:
+            # 'entre 15 y 20 UF', 'entre 400 y 500 mil': la moneda y el multiplicador escritos en uno de los
+            # montos aplican a ambos, salvo que el rango quede al revés ('entre 400000 y 1 millón')
+            groups = (m.groups()[:4], m.groups()[4:])
+            currency = "UF" if any(g[0] or g[3] == "uf" for g in groups) else None
+            mult = next((g[2] for g in groups if g[2]), None)
+            low, high = (_amount(g, currency, mult) for g in groups)
+            if mult and low and high and low["value"] > high["value"]:
+                low, high = (_amount(g, currency) for g in groups)
+            if low and high:
+                constraints["price_min"], constraints["price_max"] = low["value"], high["value"]
+                constraints["currency"] = low["currency"]
+        else:
+            for key, regex in (("price_max", MAX_RE), ("price_min", MIN_RE)):
+                m = regex.search(text)
+                amount = _amount(m.groups()) if m else None
+                if amount:
+                    constraints[key] = amount["value"]
+                    constraints["currency"] = amount["currency"]
+            if "price_max" not in constraints and "price_min" not in constraints and BARE_PRICE_RE.search(text):
+                # Un monto suelto ('departamento de $450.000') se toma como presupuesto máximo
+                for m in re.finditer(AMOUNT, text):
+                    amount = _amount(m.groups())
+                    if amount and (m.group(1) or "$" in m.group(0) or m.group(4)):
+                        constraints["price_max"] = amount["value"]
+                        constraints["currency"] = amount["currency"]
+                        break
+
+        m = self.commune_re.search(text)
+        if m:
+            constraints["commune_key"] = m.group(1)
+        return constraints
+
+    @staticmethod
+    def to_where(constraints: Dict) -> Optional[Dict]:
+        """Restricciones -> filtro `where` de Chroma sobre la metadata de `numeric_metadata`.
+
+        Cada documento guarda rangos (mín/máx), así que "2 dormitorios" pide que el rango del documento
+        incluya 2 y "bajo $500.000" que su precio mínimo esté bajo ese monto.
+        """
+        clauses = []
+        for key in ("bedrooms", "bathrooms"):
+            if key in constraints:
+                clauses.append({f"{key}_min": {"$lte": constraints[key]}})
+                clauses.append({f"{key}_max": {"$gte": constraints[key]}})
+        field = "price_uf" if constraints.get("currency") == "UF" else "price_clp"
+        if "price_max" in constraints:
+            clauses.append({f"{field}_min": {"$lte": constraints["price_max"]}})
+        if "price_min" in constraints:
+            clauses.append({f"{field}_max": {"$gte": constraints["price_min"]}})
+        if "commune_key" in constraints:
+            clauses.append({"commune_key": {"$eq": constraints["commune_key"]}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -1,17 +1,32 @@
 import json
 import os
+import time
 import logging
+import hashlib
 import re
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
 from glob import glob
 from datetime import datetime
 
-from sentence_transformers import SentenceTransformer
 from langchain.chat_models import ChatOpenAI
 from langdetect import detect
 
-from vectorStorage.chromadb import ChromaDBStore
+from vectorStorage.backends import create_vector_store
+from llm.embedding_cache import CachedEmbedder
+from llm.embeddings import create_embedding_backend
+from llm.answer_cache import AnswerCache, normalize_query
+from llm.batching import QueryBatcher
+from llm.query_parser import numeric_metadata
+from llm.context import build_context, count_tokens
+from llm.index_generation import IndexGeneration
+from llm.remote import ServiceClient, RemoteEmbedder, RemoteVectorStore
+from scraper.history import typology_keys
+from monitoring.metrics import REGISTRY
 
 from dotenv import load_dotenv
 
@@ -31,145 +46,887 @@ class OpenAILLM(ChatOpenAI):
             **kwargs
         )
 
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")
+
+# Versión del formato de documento/metadata; cambiarla fuerza a re-indexar todo en el próximo sync
+# (2: metadata numérica por dormitorios, baños, m², precio y comuna; 3: un chunk por tipología)
+DOC_SCHEMA_VERSION = "3"
+
+# Chunks que se piden a ChromaDB por cada edificio solicitado (varios chunks pueden ser del mismo edificio)
+CHUNKS_PER_BUILDING = 4
+
+# "hybrid": fusiona ChromaDB con BM25 en memoria (RRF); "vector": solo ChromaDB
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Colección del índice; cada snapshot que llega con la API corriendo se indexa en `<colección>_v<N>` y se
+# activa al terminar. `active_index.json` (en db_path) recuerda cuál está activa entre reinicios.
+COLLECTION_NAME = "property_listings"
+ACTIVE_INDEX_FILE = "active_index.json"
+# Chunks por lote al construir una generación en segundo plano: lotes chicos para no acaparar el modelo
+INDEX_BUILD_BATCH = int(os.getenv("INDEX_BUILD_BATCH", "32"))
+# Segundos que se espera a las consultas en curso sobre la generación reemplazada antes de borrarla
+INDEX_DRAIN_TIMEOUT = float(os.getenv("INDEX_DRAIN_TIMEOUT", "300"))
+# Un snapshot con menos propiedades que esto, o que pierde más de esa fracción de las activas, no se activa:
+# suele ser un scrape bloqueado o a medias, y reemplazarlo dejaría a /ask respondiendo vacío
+INDEX_MIN_RECORDS = int(os.getenv("INDEX_MIN_RECORDS", "1"))
+INDEX_MAX_SHRINK = float(os.getenv("INDEX_MAX_SHRINK", "0.5"))
+
+# Servicio local (api/sidecar.py) que carga el modelo y el índice una sola vez para todos los workers de la API;
+# vacío = cada proceso carga los suyos
+RAG_SERVICE_SOCKET = os.getenv("RAG_SERVICE_SOCKET", "")
+
+# Lotes (/ask/batch): llamadas simultáneas al LLM y consultas que se recuperan juntas antes de empezar a generar
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "8"))
+ASK_BATCH_WINDOW = int(os.getenv("ASK_BATCH_WINDOW", "256"))
+
+# --- Métricas (se exponen en /metrics de la API) ---
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_seconds", "Duración de cada etapa de una consulta (language, embedding, retrieval, prompt, llm, llm_first_token)", ["stage"])
+REQUEST_SECONDS = REGISTRY.histogram(
+    "rag_request_seconds", "Duración total de una consulta por modo (sync, async, stream, batch) y resultado", ["mode", "result"])
+INDEX_SECONDS = REGISTRY.histogram(
+    "rag_index_seconds", "Duración de load_properties / sync_properties / refresh_index", ["operation"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+INDEXED_CHUNKS = REGISTRY.counter("rag_indexed_chunks_total", "Chunks embebidos y escritos en ChromaDB", ["operation"])
+INDEX_SWAPS = REGISTRY.counter("rag_index_swaps_total", "Generaciones del índice activadas sin reiniciar la API")
+
+class SnapshotRejected(ValueError):
+    """Snapshot que no pasa la validación (vacío o mucho más chico que el activo); se sigue sirviendo el anterior."""
+
+def latest_snapshot(data_dir: str = "data") -> str:
+    """El JSON más reciente de `data_dir` según el timestamp del nombre ("" si no hay ninguno)."""
+    json_files = glob(f"{data_dir}/assetplan_properties_*.json")
+    if not json_files:
+        return ""
+    def extract_dt(f: str):
+        m = re.search(r'(\d{8}_\d{6})', f)
+        return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S") if m else datetime.min
+    return max(json_files, key=extract_dt)
+
 class RAGAgent:
-    def __init__(self, db_path: str = "./chroma_db", json_file: str = None):
+    def __init__(self, db_path: str = "./chroma_db", json_file: str = None, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 service_socket: str = RAG_SERVICE_SOCKET):
         self.db_path = db_path
-        self.vector_store = ChromaDBStore(collection_name="property_listings", db_path=db_path)
-        self.embedder = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
-        self.json_file = json_file or self._get_latest_json_file()
-        self.properties = self._load_json_properties()
+        # Modo cliente: embeddings y recuperación los resuelve el servicio; aquí quedan el LLM, los caches y /market
+        self.service = ServiceClient(service_socket) if service_socket else None
+        if self.service is not None:
+            self.embedder = RemoteEmbedder(self.service)
+        else:
+            backend = create_embedding_backend()
+            self.embedder = CachedEmbedder(backend, backend.name, cache_dir)
+        self.answer_cache = AnswerCache(
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.97"))
+        )
+        # Trabajo de CPU (embeddings, ChromaDB, langdetect) del camino async; acotado para no saturar la máquina
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_CPU_WORKERS", "4")), thread_name_prefix="rag-cpu")
+        self._llm = None
+        self._llm_lock = threading.Lock()
+        self._batcher = None
+        self.token_stats = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        # Generación activa del índice (snapshot, colección, BM25, parser, mercado); se reemplaza con `refresh_index`
+        self._index_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._rejected: Optional[Tuple[Tuple[str, float], str]] = None  # ((snapshot, mtime), motivo) del último rechazo
+        self._following = threading.Event()
+        if self.service is not None:
+            self.generation_number = 0
+            self.index = self._remote_generation(self.service.info())
+            return
+        active = self._read_active_index()
+        self.generation_number = active.get("generation", 0)
+        self.index = self._new_generation(json_file or self._get_latest_json_file(), active.get("collection", COLLECTION_NAME))
 
     def _get_latest_json_file(self) -> str:
         """Encuentra el JSON más reciente en data/ con timestamp en el nombre."""
-        json_files = glob("data/assetplan_properties_*.json")
-        if not json_files:
+        latest = latest_snapshot()
+        if not latest:
             raise FileNotFoundError("No se encontró ningún archivo JSON en la carpeta 'data/'")
-        def extract_dt(f: str):
-            m = re.search(r'(\d{8}_\d{6})', f)
-            return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S") if m else datetime.min
-        latest = max(json_files, key=extract_dt)
         logger.info(f"Usando el archivo más reciente: {latest}")
         return latest
 
-    def _load_json_properties(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _load_json_properties(json_file: str) -> List[Dict[str, Any]]:
         """Carga el contenido del JSON en memoria."""
-        if not os.path.exists(self.json_file):
-            logger.error(f"JSON no encontrado: {self.json_file}")
+        if not os.path.exists(json_file):
+            logger.error(f"JSON no encontrado: {json_file}")
             return []
-        with open(self.json_file, 'r', encoding='utf-8') as f:
+        with open(json_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        logger.info(f"{len(data)} propiedades cargadas desde {self.json_file}")
+        logger.info(f"{len(data)} propiedades cargadas desde {json_file}")
         return data
 
-    def _create_document(self, prop: Dict[str, Any]) -> str:
+    # --- Generación activa del índice ---
+    def _new_generation(self, json_file: str, collection: str, vector_store=None, lexical=None) -> IndexGeneration:
+        return IndexGeneration(json_file, self._load_json_properties(json_file), collection,
+                               vector_store or create_vector_store(collection, self.db_path), lexical,
+                               hybrid=RETRIEVAL_MODE == "hybrid")
+
+    def _remote_generation(self, info: Dict[str, Any]) -> IndexGeneration:
+        """Generación del modo cliente: el snapshot que sirve el servicio (para /market) sin índice local."""
+        generation = self._new_generation(info["json_file"], info["collection"], RemoteVectorStore(self.service))
+        generation.version = info["version"]
+        return generation
+
+    def _read_active_index(self) -> Dict[str, Any]:
+        path = os.path.join(self.db_path, ACTIVE_INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_active_index(self):
+        os.makedirs(self.db_path, exist_ok=True)
+        path = os.path.join(self.db_path, ACTIVE_INDEX_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({"collection": self.index.collection, "generation": self.generation_number,
+                       "json_file": self.index.json_file, "version": self.index.version}, f)
+        os.replace(f"{path}.tmp", path)
+
+    @contextmanager
+    def _lease(self) -> Iterator[IndexGeneration]:
+        """La generación activa, reservada hasta que la consulta termina (no se borra mientras tanto)."""
+        with self._index_lock:
+            index = self.index
+            index.acquire()
+        try:
+            yield index
+        finally:
+            index.release()
+
+    @property
+    def vector_store(self):
+        return self.index.vector_store
+
+    @property
+    def lexical(self):
+        return self.index.lexical
+
+    @property
+    def retriever(self):
+        return self.index.retriever
+
+    @property
+    def properties(self) -> List[Dict[str, Any]]:
+        return self.index.properties
+
+    @property
+    def query_parser(self):
+        return self.index.query_parser
+
+    @property
+    def market(self):
+        return self.index.market
+
+    @property
+    def json_file(self) -> str:
+        return self.index.json_file
+
+    @property
+    def index_version(self) -> str:
+        return self.index.version
+
+    @staticmethod
+    def _create_document(prop: Dict[str, Any]) -> str:
         """Convierte un diccionario de propiedad en un string para embedding."""
         parts = [
             f"Title: {prop.get('title','')}",
             f"Location: {prop.get('location','')}"
         ]
         for typ in prop.get('typologies', []):
-            segment = (
-                f"{typ.get('bedrooms','')} | {typ.get('bathrooms','')} | "
-                f"{typ.get('size_range','')} | {typ.get('price_range','')} | "
-                f"Disponibles: {typ.get('available','')}"
-            )
-            promos = typ.get('promotions', [])
-            if promos:
-                segment += " | Promociones: " + ", ".join(promos)
-            parts.append(segment)
+            parts.append(RAGAgent._typology_segment(typ))
         if prop.get('url'):
             parts.append(f"Link: {prop['url']}")
         return "\n".join(parts)
 
+    @staticmethod
+    def _typology_segment(typ: Dict[str, Any]) -> str:
+        segment = (
+            f"{typ.get('bedrooms','')} | {typ.get('bathrooms','')} | "
+            f"{typ.get('size_range','')} | {typ.get('price_range','')} | "
+            f"Disponibles: {typ.get('available','')}"
+        )
+        promos = typ.get('promotions', [])
+        if promos:
+            segment += " | Promociones: " + ", ".join(promos)
+        return segment
+
+    @classmethod
+    def _create_chunks(cls, prop: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Un chunk por tipología: el encabezado del edificio más esa tipología, con id `<edificio>#<clave de tipología>`."""
+        header = f"Title: {prop.get('title','')}\nLocation: {prop.get('location','')}"
+        typologies = prop.get('typologies', [])
+        if not typologies:
+            return [{"id": f"{prop.get('id')}#", "document": header, "segment": "Sin tipologías publicadas", "typologies": []}]
+        return [
+            {"id": f"{prop.get('id')}#{key}", "document": f"{header}\n{segment}", "segment": segment, "typologies": [typ]}
+            for key, typ in zip(typology_keys(typologies), typologies)
+            for segment in [cls._typology_segment(typ)]
+        ]
+
+    def _document_hash(self, doc: str) -> str:
+        return hashlib.sha1(f"{DOC_SCHEMA_VERSION}\n{doc}".encode("utf-8")).hexdigest()
+
+    def _build_records(self, properties: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Documento y metadata por id de chunk (una tipología) para todas las propiedades del snapshot."""
+        records = {}
+        for prop in properties:
+            for chunk in self._create_chunks(prop):
+                records[chunk["id"]] = {
+                    "document": chunk["document"],
+                    "metadata": {
+                        "id": chunk["id"],
+                        "parent_id": str(prop.get("id")),
+                        "title": prop.get("title"),
+                        "location": prop.get("location"),
+                        "url": prop.get("url"),
+                        "segment": chunk["segment"],
+                        "doc_hash": self._document_hash(chunk["document"]),
+                        **numeric_metadata(chunk["typologies"], prop.get("location", ""))
+                    }
+                }
+        return records
+
+    def _index_records(self, ids: List[str], records: Dict[str, Dict[str, Any]], operation: str = "load",
+                       index: IndexGeneration = None):
+        index = index or self.index
+        INDEXED_CHUNKS.inc(len(ids), operation=operation)
+        docs = [records[i]["document"] for i in ids]
+        metas = [records[i]["metadata"] for i in ids]
+        embeddings = self.embedder.encode_documents(docs).tolist()
+        index.vector_store.upsert(docs, embeddings, metas, ids)
+        index.lexical.upsert(ids, docs, metas)
+
     def load_properties(self):
         """Indexa todas las propiedades en ChromaDB."""
-        docs, metas, ids = [], [], []
-        for prop in self.properties:
-            doc = self._create_document(prop)
-            docs.append(doc)
-            metas.append({
-                "id": prop.get("id"),
-                "title": prop.get("title"),
-                "location": prop.get("location"),
-                "url": prop.get("url")
+        with INDEX_SECONDS.time(operation="load"):
+            records = self._build_records(self.properties)
+            if records:
+                self._index_records(list(records), records)
+                self.index.vector_store.flush()
+                logger.info(f"{len(records)} propiedades indexadas")
+            self.index.version = self._version_of(records)
+
+    @staticmethod
+    def _version_of(records: Dict[str, Dict[str, Any]]) -> str:
+        """Versión del índice: hash de los (id, hash de documento) indexados. Cambia con cada re-scrape que modifica algo."""
+        digest = hashlib.sha1()
+        for doc_id in sorted(records):
+            digest.update(f"{doc_id}:{records[doc_id]['metadata']['doc_hash']}\n".encode("utf-8"))
+        return digest.hexdigest()[:12]
+
+    def _sync(self, index: IndexGeneration, records: Dict[str, Dict[str, Any]], operation: str,
+              batch_size: int = 0) -> Dict[str, Any]:
+        """Deja la colección de `index` igual a `records`: embebe lo nuevo o modificado (en lotes de `batch_size`)
+        y elimina lo que ya no está."""
+        indexed = index.vector_store.get_hashes()
+        changed = [i for i, r in records.items() if indexed.get(i) != r["metadata"]["doc_hash"]]
+        removed = [i for i in indexed if i not in records]
+        batch_size = batch_size or max(1, len(changed))
+        try:
+            for offset in range(0, len(changed), batch_size):
+                self._index_records(changed[offset:offset + batch_size], records, operation=operation, index=index)
+            index.vector_store.delete(removed)
+        finally:
+            # Una sola escritura a disco por sync (también si se cortó: el próximo completa lo que falta)
+            index.vector_store.flush()
+        index.lexical.delete(removed)
+        if len(index.lexical) < len(records):
+            # El índice léxico vive en memoria: al arrancar se llena con lo que ChromaDB ya tenía
+            missing = [i for i in records if i not in index.lexical]
+            index.lexical.upsert(missing, [records[i]["document"] for i in missing], [records[i]["metadata"] for i in missing])
+        index.version = self._version_of(records)
+        return {
+            "added": sum(1 for i in changed if i not in indexed),
+            "updated": sum(1 for i in changed if i in indexed),
+            "deleted": len(removed),
+            "unchanged": len(records) - len(changed)
+        }
+
+    def sync_properties(self) -> Dict[str, Any]:
+        """Sincroniza ChromaDB con el snapshot: solo embebe lo nuevo o modificado y elimina lo que ya no está.
+
+        Modifica la colección activa en el lugar: es para el arranque, antes de recibir tráfico. Con la API
+        sirviendo consultas se usa `refresh_index`.
+        """
+        start = time.perf_counter()
+        report = self._sync(self.index, self._build_records(self.properties), "sync")
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        INDEX_SECONDS.observe(time.perf_counter() - start, operation="sync")
+        logger.info(f"Sync ChromaDB: {report}")
+        return report
+
+    def build_index(self, json_file: str) -> Tuple[IndexGeneration, Dict[str, Any]]:
+        """Indexa `json_file` en una generación nueva sin tocar la activa, que sigue respondiendo mientras tanto.
+
+        La colección nueva es `<colección>_v<N+1>`: los chunks que no cambiaron salen del cache de embeddings y,
+        si una construcción anterior quedó a medias en esa colección, solo se completa lo que falta. Si el
+        contenido es el mismo que el activo se reutilizan la colección y el BM25 y solo cambia el snapshot.
+        Un snapshot vacío o mucho más chico que el activo se rechaza con SnapshotRejected (ver `INDEX_MIN_RECORDS`).
+        """
+        properties = self._load_json_properties(json_file)
+        current = self.index
+        self._check_snapshot(json_file, properties, current)
+        records = self._build_records(properties)
+        if self._version_of(records) == current.version:
+            generation = self._new_generation(json_file, current.collection, current.vector_store, current.lexical)
+            generation.version = current.version
+            return generation, {"added": 0, "updated": 0, "deleted": 0, "unchanged": len(records)}
+        generation = self._new_generation(json_file, f"{COLLECTION_NAME}_v{self.generation_number + 1}")
+        return generation, self._sync(generation, records, "refresh", batch_size=INDEX_BUILD_BATCH)
+
+    @staticmethod
+    def _check_snapshot(json_file: str, properties: List[Dict[str, Any]], current: IndexGeneration):
+        """Rechaza (SnapshotRejected) un snapshot vacío o que achica demasiado el índice activo."""
+        if len(properties) < INDEX_MIN_RECORDS:
+            raise SnapshotRejected(f"{json_file} tiene {len(properties)} propiedades (mínimo {INDEX_MIN_RECORDS}); "
+                             f"se sigue sirviendo {current.collection}")
+        if len(properties) < len(current.properties) * (1 - INDEX_MAX_SHRINK):
+            raise SnapshotRejected(f"{json_file} tiene {len(properties)} propiedades contra {len(current.properties)} del "
+                             f"índice activo (máximo {INDEX_MAX_SHRINK:.0%} menos); se sigue sirviendo {current.collection}")
+
+    def swap_index(self, generation: IndexGeneration) -> IndexGeneration:
+        """Activa `generation` de forma atómica: las consultas nuevas la usan y las en curso terminan con la anterior."""
+        with self._index_lock:
+            previous, self.index = self.index, generation
+            if generation.collection != previous.collection:
+                self.generation_number += 1
+        if self.service is None:
+            self._write_active_index()
+        INDEX_SWAPS.inc()
+        logger.info(f"Índice activo: {generation.collection} ({generation.version}), antes {previous.collection} ({previous.version})")
+        return previous
+
+    def retire_index(self, previous: IndexGeneration, timeout: float = INDEX_DRAIN_TIMEOUT) -> bool:
+        """Espera a que terminen las consultas sobre `previous` y borra su colección. False si hubo que cortar por `timeout`."""
+        if previous.collection == self.index.collection:
+            return True
+        drained = previous.wait_idle(timeout)
+        if not drained:
+            logger.warning(f"{previous.in_flight} consultas siguen usando {previous.collection} tras {timeout}s; se borra igual")
+        previous.vector_store.drop()
+        return drained
+
+    def refresh_if_newer(self) -> Optional[Dict[str, Any]]:
+        """Re-indexa si en data/ hay un snapshot más nuevo que el activo (None si no hay nada que hacer).
+
+        En modo cliente no indexa: adopta la versión que esté sirviendo el servicio.
+        """
+        if self.service is not None:
+            self._following.clear()
+            info = self.service.info()
+            if info["version"] == self.index.version:
+                return None
+            previous = self.swap_index(self._remote_generation(info))
+            return {"snapshot": os.path.basename(info["json_file"]), "collection": info["collection"],
+                    "version": info["version"], "previous_version": previous.version}
+        latest = latest_snapshot()
+        if not latest or os.path.abspath(latest) == os.path.abspath(self.json_file):
+            return None
+        # Un snapshot ya rechazado no se vuelve a cargar hasta que cambie en disco
+        identity = (os.path.abspath(latest), self._mtime(latest))
+        if self._rejected is not None and self._rejected[0] == identity:
+            raise SnapshotRejected(self._rejected[1])
+        logger.info(f"Nuevo snapshot {latest}; re-indexando en segundo plano")
+        try:
+            return self.refresh_index(latest)
+        except SnapshotRejected as e:
+            self._rejected = (identity, str(e))
+            raise
+
+    @staticmethod
+    def _mtime(path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+
+    def refresh_index(self, json_file: str) -> Dict[str, Any]:
+        """Construye, activa y limpia: pasa a servir `json_file` sin cortar las consultas en curso."""
+        with self._refresh_lock:
+            start = time.perf_counter()
+            generation, report = self.build_index(json_file)
+            previous = self.swap_index(generation)
+            report["drained"] = self.retire_index(previous)
+            report.update({
+                "snapshot": os.path.basename(json_file),
+                "collection": generation.collection,
+                "version": generation.version,
+                "previous_version": previous.version,
+                "seconds": round(time.perf_counter() - start, 3)
             })
-            ids.append(str(prop.get("id")))
-        if docs:
-            embeddings = self.embedder.encode(docs).tolist()
-            self.vector_store.add_documents(docs, embeddings, metas, ids)
-            logger.info(f"{len(docs)} propiedades indexadas")
+            INDEX_SECONDS.observe(time.perf_counter() - start, operation="refresh")
+            logger.info(f"Refresh del índice: {report}")
+            return report
 
-    def search_and_generate(self, query: str, n: int = 5) -> Dict:
-        # 1) Detectar idioma de la consulta
+    @property
+    def llm(self) -> OpenAILLM:
+        """Cliente LLM compartido entre peticiones (reutiliza las conexiones HTTP en vez de crear uno por consulta)."""
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = OpenAILLM()
+        return self._llm
+
+    def _get_batcher(self) -> QueryBatcher:
+        # El batcher vive en el event loop que lo usa; si cambia el loop (p. ej. en tests) se recrea
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher.loop is not loop:
+            self._batcher = QueryBatcher(
+                self.embedder.encode_queries, self.executor,
+                window=float(os.getenv("QUERY_BATCH_WINDOW_MS", "5")) / 1000,
+                max_batch=int(os.getenv("QUERY_BATCH_SIZE", "32"))
+            )
+            self._batcher.loop = loop
+        return self._batcher
+
+    def _search(self, query: str, query_emb: List[float], n: int, index: IndexGeneration = None) -> List[Dict]:
+        """Top-n edificios: busca chunks pre-filtrados por las restricciones de la consulta y los agrupa por edificio.
+
+        Si ningún chunk cumple el filtro se busca sin él, para no responder vacío por un parseo demasiado estricto.
+        """
+        if self.service is not None:
+            return self._remote_search([query], [query_emb], n)[0][0]
+        index = index or self.index
+        where = index.query_parser.to_where(index.query_parser.parse(query))
+        results = None
+        if where:
+            results = self._query_chunks(index, query, query_emb, n * CHUNKS_PER_BUILDING, where)
+            if not results[3]:
+                logger.info(f"Ningún documento cumple {where}; se busca sin filtros")
+                results = None
+        if results is None:
+            results = self._query_chunks(index, query, query_emb, n * CHUNKS_PER_BUILDING)
+        return self._group_hits(*results)[:n]
+
+    @staticmethod
+    def _query_chunks(index: IndexGeneration, query: str, query_emb: List[float], k: int, where: Dict = None):
+        with STAGE_SECONDS.time(stage="retrieval"):
+            if index.retriever is not None and len(index.lexical):
+                return index.retriever.query(query, query_emb, n_results=k, where=where)
+            return index.vector_store.query(query_emb, n_results=k, where=where)
+
+    def _search_many(self, queries: List[str], query_embs: List[List[float]], n: int,
+                     index: IndexGeneration = None) -> List[List[Dict]]:
+        """`_search` para muchas consultas: una llamada a ChromaDB por cada filtro distinto (más una sin filtro
+        para las que no tienen restricciones o cuyo filtro no encontró nada), en vez de una por consulta."""
+        if self.service is not None:
+            return self._remote_search(queries, query_embs, n)[0]
+        index = index or self.index
+        k = n * CHUNKS_PER_BUILDING
+        results: List[Any] = [None] * len(queries)
+        groups: Dict[str, List[int]] = {}
+        wheres: Dict[str, Dict] = {}
+        for i, query in enumerate(queries):
+            where = index.query_parser.to_where(index.query_parser.parse(query))
+            key = json.dumps(where, sort_keys=True) if where else ""
+            groups.setdefault(key, []).append(i)
+            wheres[key] = where
+        unfiltered = groups.pop("", [])
+        for key, indices in groups.items():
+            for i, result in zip(indices, self._query_chunks_many(index, queries, query_embs, indices, k, wheres[key])):
+                if result[3]:
+                    results[i] = result
+                else:
+                    unfiltered.append(i)
+        for i, result in zip(unfiltered, self._query_chunks_many(index, queries, query_embs, unfiltered, k)):
+            results[i] = result
+        return [self._group_hits(*result)[:n] for result in results]
+
+    def _retrieve(self, index: IndexGeneration, query: str, query_emb: List[float], n: int) -> Tuple[List[Dict], str]:
+        """`_search` más la versión del índice que respondió, que es con la que se cachea y reporta la respuesta.
+
+        En modo cliente es la del servicio, que puede ir adelante de `index` mientras esta lo alcanza.
+        """
+        if self.service is not None:
+            hits, versions = self._remote_search([query], [query_emb], n)
+            return hits[0], versions[0]
+        return self._search(query, query_emb, n, index), index.version
+
+    def _retrieve_many(self, index: IndexGeneration, queries: List[str], query_embs: List[List[float]],
+                       n: int) -> Tuple[List[List[Dict]], List[str]]:
+        if self.service is not None:
+            return self._remote_search(queries, query_embs, n)
+        return self._search_many(queries, query_embs, n, index), [index.version] * len(queries)
+
+    def _remote_search(self, queries: List[str], query_embs: List[List[float]], n: int) -> Tuple[List[List[Dict]], List[str]]:
+        with STAGE_SECONDS.time(stage="remote_retrieval"):
+            hits, versions = self.service.search(queries, query_embs, n)
+        if any(v != self.index.version for v in versions) and not self._following.is_set():
+            # El servicio activó otro snapshot: se adopta en segundo plano, sin demorar esta consulta
+            self._following.set()
+            threading.Thread(target=self.refresh_if_newer, name="follow-service", daemon=True).start()
+        return hits, versions
+
+    @staticmethod
+    def _query_chunks_many(index: IndexGeneration, queries: List[str], query_embs: List[List[float]],
+                           indices: List[int], k: int, where: Dict = None):
+        if not indices:
+            return []
+        texts, embs = [queries[i] for i in indices], [query_embs[i] for i in indices]
+        with STAGE_SECONDS.time(stage="batch_retrieval"):
+            if index.retriever is not None and len(index.lexical):
+                return index.retriever.query_many(texts, embs, n_results=k, where=where)
+            return index.vector_store.query_many(embs, n_results=k, where=where)
+
+    @staticmethod
+    def _group_hits(docs: List[str], metas: List[Dict], distances: List[float], ids: List[str]) -> List[Dict]:
+        """Chunks -> edificios, en orden de su mejor chunk; cada edificio guarda las tipologías que calzaron.
+
+        Los chunks que solo encontró BM25 no traen distancia; el edificio toma la del primer chunk que sí la tenga
+        o, si no hay ninguna, 1.0 (similitud neutra) para el cálculo de confianza.
+        """
+        buildings: Dict[str, Dict] = {}
+        for meta, distance in zip(metas, distances):
+            parent = meta.get("parent_id") or str(meta.get("id"))
+            hit = buildings.get(parent)
+            if hit is None:
+                hit = buildings[parent] = {"id": parent, "title": meta.get("title"), "location": meta.get("location"),
+                                           "url": meta.get("url"), "distance": distance, "segments": []}
+            elif hit["distance"] is None:
+                hit["distance"] = distance
+            if meta.get("segment"):
+                hit["segments"].append(meta["segment"])
+        for hit in buildings.values():
+            if hit["distance"] is None:
+                hit["distance"] = 1.0
+        return list(buildings.values())
+
+    @staticmethod
+    def _detect_language(query: str) -> str:
         try:
-            lang = detect(query)
+            with STAGE_SECONDS.time(stage="language"):
+                lang = detect(query)
         except:
             lang = "es"  # Fallback a español si la detección falla
         if lang not in ["es", "en"]:
             lang = "es"  # Solo soportamos español e inglés
+        return lang
 
-        # 2) Embed la query
-        query_emb = self.embedder.encode(query).tolist()
-
-        # 3) Recupera top-n documentos con distancias
-        docs, metas, distances, ids = self.vector_store.query(query_emb, n_results=n)
+    @staticmethod
+    def _empty_response(index_version: str = "") -> Dict:
+        return {
+            "answer": "No se encontraron propiedades relevantes para la consulta.",
+            "sources": "chromadb",
+            "confidence": "low",
+            "urls": [],
+            "source_ids": [],
+            "prompt_tokens": 0,
+            "index_version": index_version
+        }
 
-        # 4) Verificar que los documentos provengan de ChromaDB
-        if not docs or not ids:
-            logger.warning("No se recuperaron documentos de ChromaDB para la consulta")
-            return {
-                "answer": "No se encontraron propiedades relevantes para la consulta.",
-                "sources": "chromadb",
-                "confidence": "low",
-                "urls": [],
-                "source_ids": []
-            }
-
-        # 5) Calcular confianza
+    @staticmethod
+    def _confidence(distances: List[float]) -> str:
         avg_distance = sum(distances) / len(distances)
         confidence_score = 1 - (avg_distance / 2)  # Normalizar a [0, 1]
         if confidence_score > 0.8:
-            confidence = "high"
+            return "high"
         elif confidence_score > 0.5:
-            confidence = "medium"
-        else:
-            confidence = "low"
-
-        # 6) Construye el contexto
-        context = ""
-        urls = []
-        for i, (doc, meta) in enumerate(zip(docs, metas), start=1):
-            context += (
-                f"[{i}] {meta.get('title')} - {meta.get('location')}\n"
-                f"{doc}\nURL: {meta.get('url')}\n\n"
-            )
-            urls.append(meta.get('url'))
+            return "medium"
+        return "low"
+
+    @classmethod
+    def _make_response(cls, answer: str, hits: List[Dict], prompt_tokens: int, index_version: str = "") -> Dict:
+        return {
+            "answer": answer,
+            "sources": "chromadb",
+            "confidence": cls._confidence([hit["distance"] for hit in hits]),
+            "urls": [hit["url"] for hit in hits],
+            "source_ids": [hit["id"] for hit in hits],
+            "prompt_tokens": prompt_tokens,
+            "index_version": index_version
+        }
+
+    def _prepare_prompt(self, query: str, lang: str, hits: List[Dict]) -> Tuple[str, List[Dict], int]:
+        """Prompt con el contexto recortado al presupuesto de tokens; devuelve también los edificios incluidos y sus tokens."""
+        with STAGE_SECONDS.time(stage="prompt"):
+            context, included = build_context(hits)
+            prompt = self._build_prompt(query, lang, context)
+            tokens = count_tokens(prompt)
+        self.token_stats["requests"] += 1
+        self.token_stats["prompt_tokens"] += tokens
+        logger.info(f"Prompt: {tokens} tokens, {len(included)} edificios")
+        return prompt, included, tokens
 
-        # 7) Construye el prompt según el idioma
+    def _record_completion(self, answer: str):
+        self.token_stats["completion_tokens"] += count_tokens(answer)
+
+    @staticmethod
+    def _build_prompt(query: str, lang: str, context: str) -> str:
         if lang == "en":
-            prompt = (
+            return (
                 "Answer the following question based solely on the properties listed below. "
                 "If there are at least 3 relevant properties, include at least 3. If there are fewer, respond with only those available. "
                 "For each property mentioned, include the original link (URL) at the end of the paragraph. "
                 f"Question: {query}\n\nAvailable properties:\n\n{context}"
             )
-        else:  # lang == "es"
-            prompt = (
-                "Responde a la siguiente pregunta basándote exclusivamente en las propiedades listadas más abajo. "
-                "Si hay al menos 3 propiedades relevantes, incluye al menos 3. Si hay menos, responde solo con las que haya disponibles. "
-                "Por cada propiedad que menciones, incluye el link (URL) original al final del párrafo. "
-                f"Pregunta: {query}\n\nPropiedades disponibles:\n\n{context}"
-            )
+        return (
+            "Responde a la siguiente pregunta basándote exclusivamente en las propiedades listadas más abajo. "
+            "Si hay al menos 3 propiedades relevantes, incluye al menos 3. Si hay menos, responde solo con las que haya disponibles. "
+            "Por cada propiedad que menciones, incluye el link (URL) original al final del párrafo. "
+            f"Pregunta: {query}\n\nPropiedades disponibles:\n\n{context}"
+        )
 
-        # 8) Llamada al LLM
-        llm = OpenAILLM()
-        response = llm.invoke(prompt)
+    def search_and_generate(self, query: str, n: int = 5) -> Dict:
+        # Toda la consulta usa la misma generación del índice, aunque otra se active a mitad de camino
+        with self._lease() as index:
+            return self._search_and_generate(index, query, n)
 
-        # 9) Devolver respuesta estructurada
-        return {
-            "answer": response.content,
-            "sources": "chromadb",
-            "confidence": confidence,
-            "urls": urls,
-            "source_ids": ids
-        }
+    def _search_and_generate(self, index: IndexGeneration, query: str, n: int) -> Dict:
+        start = time.perf_counter()
+        # 1) Cache exacto: misma consulta normalizada sobre la misma versión del índice
+        version = index.version
+        cached = self.answer_cache.get_exact(query, n, version)
+        if cached:
+            self._observe_request("sync", "exact_cache", start)
+            return cached
+
+        # 2) Detectar idioma de la consulta
+        lang = self._detect_language(query)
+
+        # 3) Embed la query
+        with STAGE_SECONDS.time(stage="embedding"):
+            query_emb = self.embedder.encode_query(query).tolist()
+
+        # 4) Recupera los top-n edificios (agrupando chunks), pre-filtrados por lo que pide la consulta
+        hits, version = self._retrieve(index, query, query_emb, n)
+        ids = [hit["id"] for hit in hits]
+
+        # 5) Verificar que los documentos provengan de ChromaDB
+        if not hits:
+            logger.warning("No se recuperaron documentos de ChromaDB para la consulta")
+            self._observe_request("sync", "empty", start)
+            return self._empty_response(version)
+
+        # 6) Cache semántico: consulta casi idéntica que recuperó exactamente las mismas propiedades
+        cached = self.answer_cache.get_semantic(query_emb, ids, version)
+        if cached:
+            self.answer_cache.put(query, n, query_emb, ids, cached, version)
+            self._observe_request("sync", "semantic_cache", start)
+            return cached
+
+        def generate() -> Dict:
+            # 7) Construye el prompt según el idioma (dentro del presupuesto de tokens) y llama al LLM
+            prompt, included, tokens = self._prepare_prompt(query, lang, hits)
+            with STAGE_SECONDS.time(stage="llm"):
+                response = self.llm.invoke(prompt)
+            self._record_completion(response.content)
+            # 8) Devolver respuesta estructurada
+            return self._make_response(response.content, included, tokens, version)
+
+        # Peticiones idénticas simultáneas comparten una sola llamada al LLM
+        result = self.answer_cache.get_or_compute((version, normalize_query(query), tuple(ids)), generate)
+        self.answer_cache.put(query, n, query_emb, ids, result, version)
+        self._observe_request("sync", "llm", start)
+        return result
+
+    @staticmethod
+    def _observe_request(mode: str, result: str, start: float):
+        REQUEST_SECONDS.observe(time.perf_counter() - start, mode=mode, result=result)
+
+    async def _aretrieve(self, index: IndexGeneration, query: str, n: int):
+        """Idioma, embedding, top-n de ChromaDB y versión del índice que respondió, sin bloquear el event loop."""
+        loop = asyncio.get_running_loop()
+        lang_task = loop.run_in_executor(self.executor, self._detect_language, query)
+        with STAGE_SECONDS.time(stage="embedding"):
+            query_emb = (await self._get_batcher().encode(query)).tolist()
+        hits, version = await loop.run_in_executor(self.executor, self._retrieve, index, query, query_emb, n)
+        return await lang_task, query_emb, hits, version
+
+    async def asearch_and_generate(self, query: str, n: int = 5) -> Dict:
+        """Igual que `search_and_generate`, sin bloquear el event loop.
+
+        El trabajo de CPU corre en `self.executor`, las consultas simultáneas se embeben juntas
+        (`QueryBatcher`) y la llamada al LLM es async sobre el cliente compartido.
+        """
+        with self._lease() as index:
+            return await self._asearch_and_generate(index, query, n)
+
+    async def _asearch_and_generate(self, index: IndexGeneration, query: str, n: int) -> Dict:
+        start = time.perf_counter()
+        version = index.version
+        cached = self.answer_cache.get_exact(query, n, version)
+        if cached:
+            self._observe_request("async", "exact_cache", start)
+            return cached
+
+        lang, query_emb, hits, version = await self._aretrieve(index, query, n)
+        if not hits:
+            logger.warning("No se recuperaron documentos de ChromaDB para la consulta")
+            self._observe_request("async", "empty", start)
+            return self._empty_response(version)
+        ids = [hit["id"] for hit in hits]
+
+        cached = self.answer_cache.get_semantic(query_emb, ids, version)
+        if cached:
+            self.answer_cache.put(query, n, query_emb, ids, cached, version)
+            self._observe_request("async", "semantic_cache", start)
+            return cached
+
+        async def generate() -> Dict:
+            prompt, included, tokens = self._prepare_prompt(query, lang, hits)
+            with STAGE_SECONDS.time(stage="llm"):
+                response = await self.llm.ainvoke(prompt)
+            self._record_completion(response.content)
+            return self._make_response(response.content, included, tokens, version)
+
+        result = await self.answer_cache.aget_or_compute((version, normalize_query(query), tuple(ids)), generate)
+        self.answer_cache.put(query, n, query_emb, ids, result, version)
+        self._observe_request("async", "llm", start)
+        return result
+
+    async def astream_search_and_generate(self, query: str, n: int = 5) -> AsyncIterator[Dict]:
+        """Versión en streaming: emite eventos `sources`, luego un `token` por fragmento del LLM y al final `done`.
+
+        Las fuentes y la confianza salen apenas termina la recuperación, antes de que el LLM empiece a generar.
+        """
+        with self._lease() as index:
+            async for event in self._astream_search_and_generate(index, query, n):
+                yield event
+
+    async def _astream_search_and_generate(self, index: IndexGeneration, query: str, n: int) -> AsyncIterator[Dict]:
+        start = time.perf_counter()
+        version = index.version
+        cached = self.answer_cache.get_exact(query, n, version)
+        result_label = "exact_cache"
+        if not cached:
+            lang, query_emb, hits, version = await self._aretrieve(index, query, n)
+            ids = [hit["id"] for hit in hits]
+            if not hits:
+                logger.warning("No se recuperaron documentos de ChromaDB para la consulta")
+                cached, result_label = self._empty_response(version), "empty"
+            else:
+                cached, result_label = self.answer_cache.get_semantic(query_emb, ids, version), "semantic_cache"
+        if cached:
+            self._observe_request("stream", result_label, start)
+            yield {"event": "sources", "data": {k: v for k, v in cached.items() if k != "answer"}}
+            yield {"event": "token", "data": cached["answer"]}
+            yield {"event": "done", "data": cached}
+            return
+
+        prompt, included, tokens = self._prepare_prompt(query, lang, hits)
+        result = self._make_response("", included, tokens, version)
+        yield {"event": "sources", "data": {k: v for k, v in result.items() if k != "answer"}}
+        chunks = []
+        llm_start = time.perf_counter()
+        async for chunk in self.llm.astream(prompt):
+            if chunk.content:
+                if not chunks:
+                    STAGE_SECONDS.observe(time.perf_counter() - llm_start, stage="llm_first_token")
+                chunks.append(chunk.content)
+                yield {"event": "token", "data": chunk.content}
+        STAGE_SECONDS.observe(time.perf_counter() - llm_start, stage="llm")
+        result["answer"] = "".join(chunks)
+        self._record_completion(result["answer"])
+        self.answer_cache.put(query, n, query_emb, ids, result, version)
+        self._observe_request("stream", "llm", start)
+        yield {"event": "done", "data": result}
+
+    async def aiter_search_and_generate_many(self, queries: List[str], n: int = 5,
+                                             concurrency: int = ASK_BATCH_CONCURRENCY) -> AsyncIterator[Tuple[int, Dict]]:
+        """Responde muchas consultas y entrega `(índice, respuesta)` a medida que terminan.
+
+        Las consultas se procesan en ventanas de `ASK_BATCH_WINDOW`: cada ventana se embebe en un solo
+        `encode` y se recupera con una consulta multi-embedding a ChromaDB por filtro; las llamadas al LLM
+        corren en paralelo (hasta `concurrency`) mientras se recupera la ventana siguiente. El cache de
+        respuestas se usa igual que en /ask. Si una consulta falla, su respuesta es `{"error": ...}` y el
+        resto del lote sigue. Todo el lote usa la misma generación del índice.
+        """
+        with self._lease() as index:
+            async for item in self._aiter_search_and_generate_many(index, queries, n, concurrency):
+                yield item
+
+    async def _aiter_search_and_generate_many(self, index: IndexGeneration, queries: List[str], n: int,
+                                              concurrency: int) -> AsyncIterator[Tuple[int, Dict]]:
+        version = index.version
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        done: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
+
+        async def answer(i: int, query: str, lang: str, query_emb: List[float], hits: List[Dict], version: str,
+                         retrieval: float):
+            # Duración de la consulta: la recuperación de su ventana más su propio trabajo desde que sale de la
+            # cola del LLM (la espera detrás del resto del lote no es latencia de esta consulta)
+            start = time.perf_counter() - retrieval
+            try:
+                ids = [hit["id"] for hit in hits]
+                cached = self.answer_cache.get_semantic(query_emb, ids, version)
+                if cached:
+                    result, label = cached, "semantic_cache"
+                else:
+                    async def generate() -> Dict:
+                        nonlocal start
+                        async with semaphore:
+                            start = time.perf_counter() - retrieval
+                            prompt, included, tokens = self._prepare_prompt(query, lang, hits)
+                            with STAGE_SECONDS.time(stage="llm"):
+                                response = await self.llm.ainvoke(prompt)
+                        self._record_completion(response.content)
+                        return self._make_response(response.content, included, tokens, version)
+                    result = await self.answer_cache.aget_or_compute((version, normalize_query(query), tuple(ids)), generate)
+                    label = "llm"
+                self.answer_cache.put(query, n, query_emb, ids, result, version)
+                self._observe_request("batch", label, start)
+            except Exception as e:
+                logger.warning(f"Falló la consulta {i} del lote: {e}")
+                result = {"error": f"{type(e).__name__}: {e}"}
+            done.put_nowait((i, result))
+
+        async def produce():
+            for offset in range(0, len(queries), ASK_BATCH_WINDOW):
+                # Las consultas se miden desde que empieza su ventana, no desde el inicio del lote
+                start = time.perf_counter()
+                window = list(enumerate(queries[offset:offset + ASK_BATCH_WINDOW], offset))
+                pending = []
+                for i, query in window:
+                    cached = self.answer_cache.get_exact(query, n, version)
+                    if cached:
+                        self._observe_request("batch", "exact_cache", start)
+                        done.put_nowait((i, cached))
+                    else:
+                        pending.append((i, query))
+                if not pending:
+                    continue
+                texts = [query for _, query in pending]
+                langs = [loop.run_in_executor(self.executor, self._detect_language, q) for q in texts]
+                with STAGE_SECONDS.time(stage="batch_embedding"):
+                    embs = (await loop.run_in_executor(self.executor, self.embedder.encode_queries, texts)).tolist()
+                hits, versions = await loop.run_in_executor(self.executor, self._retrieve_many, index, texts, embs, n)
+                langs = await asyncio.gather(*langs)
+                retrieval = time.perf_counter() - start
+                for (i, query), lang, query_emb, query_hits, hits_version in zip(pending, langs, embs, hits, versions):
+                    if not query_hits:
+                        self._observe_request("batch", "empty", start)
+                        done.put_nowait((i, self._empty_response(hits_version)))
+                    else:
+                        tasks.append(asyncio.create_task(answer(i, query, lang, query_emb, query_hits, hits_version, retrieval)))
+
+        producer = asyncio.create_task(produce())
+        try:
+            for _ in range(len(queries)):
+                getter = asyncio.ensure_future(done.get())
+                await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    producer.result()  # propaga el error de la recuperación
+                    yield await done.get()
+                else:
+                    yield getter.result()
+        finally:
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def asearch_and_generate_many(self, queries: List[str], n: int = 5,
+                                        concurrency: int = ASK_BATCH_CONCURRENCY) -> List[Dict]:
+        """Respuestas de todas las consultas en el mismo orden de entrada."""
+        results: List[Dict] = [None] * len(queries)
+        async for i, result in self.aiter_search_and_generate_many(queries, n, concurrency):
+            results[i] = result
+        return results
+
+    def search_and_generate_many(self, queries: List[str], n: int = 5,
+                                 concurrency: int = ASK_BATCH_CONCURRENCY) -> List[Dict]:
+        """Versión síncrona para scripts y jobs batch (no usar dentro de un event loop)."""
+        return asyncio.run(self.asearch_and_generate_many(queries, n, concurrency))
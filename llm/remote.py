@@ -0,0 +1,134 @@
+import json
+import base64
+import socket
+import struct
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Protocolo con el servicio de recuperación (api/sidecar.py) ---
+# Cada mensaje es un JSON precedido por su largo (4 bytes, big-endian); los vectores viajan como float32 en base64.
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+class ServiceError(RuntimeError):
+    """El servicio respondió con un error (la petición llegó, pero falló allá)."""
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+def decode_body(body: bytes) -> Dict[str, Any]:
+    return json.loads(body.decode("utf-8"))
+
+def encode_array(array: np.ndarray) -> Dict[str, Any]:
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def decode_array(payload: Dict[str, Any]) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32).reshape(payload["shape"])
+
+class ServiceClient:
+    """Cliente bloqueante del servicio por Unix socket; thread-safe con una conexión por hilo.
+
+    Si la conexión se corta (p. ej. el servicio se reinició) se reconecta y reintenta una vez.
+    """
+    def __init__(self, path: str, timeout: float = 30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ids = 0
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    @staticmethod
+    def _read(sock: socket.socket, size: int) -> bytes:
+        chunks, remaining = [], size
+        while remaining:
+            chunk = sock.recv(min(remaining, 1 << 20))
+            if not chunk:
+                raise ConnectionError("El servicio cerró la conexión")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def call(self, op: str, **payload) -> Dict[str, Any]:
+        self._ids += 1
+        message = encode_message({"id": self._ids, "op": op, **payload})
+        for attempt in range(2):
+            try:
+                sock = self._socket()
+                sock.sendall(message)
+                (size,) = HEADER.unpack(self._read(sock, HEADER.size))
+                response = decode_body(self._read(sock, size))
+                break
+            except (ConnectionError, OSError) as e:
+                self._close()
+                if attempt:
+                    raise
+                logger.warning(f"Conexión con el servicio {self.path} perdida ({e}); reintentando")
+        if "error" in response:
+            raise ServiceError(response["error"])
+        return response
+
+    def info(self) -> Dict[str, Any]:
+        return self.call("info")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return decode_array(self.call("encode", texts=texts)["vectors"])
+
+    def search(self, queries: List[str], embeddings: Optional[List[List[float]]], n: int) -> Tuple[List[List[Dict]], List[str]]:
+        """Top-n edificios de cada consulta (como `RAGAgent._search`) y la versión del índice que respondió cada una."""
+        payload = {"queries": queries, "n": n}
+        if embeddings is not None:
+            payload["embeddings"] = encode_array(np.asarray(embeddings, dtype=np.float32))
+        response = self.call("search", **payload)
+        return response["hits"], response["versions"]
+
+class RemoteEmbedder:
+    """Embeddings de consultas calculados por el servicio (que agrupa las de todos los workers en un lote)."""
+    def __init__(self, client: ServiceClient):
+        self.client = client
+        self.stats: Dict[str, int] = {}  # los aciertos del cache los cuenta el servicio
+
+    def encode_query(self, text: str) -> np.ndarray:
+        return self.client.encode([text])[0]
+
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        return self.client.encode(texts)
+
+    def encode_documents(self, texts: List[str]) -> np.ndarray:
+        raise RuntimeError("En modo cliente el índice lo construye y actualiza el servicio")
+
+class RemoteVectorStore:
+    """Lado cliente de la colección que vive en el servicio: solo informa su tamaño (las búsquedas van por `search`)."""
+    name = "service"
+
+    def __init__(self, client: ServiceClient):
+        self.client = client
+
+    def count(self):
+        return self.client.info()["count"]
+
+    def flush(self):
+        pass  # el servicio persiste su propio índice
+
+    def drop(self):
+        pass  # la colección la borra el servicio al reemplazarla
@@ -0,0 +1,101 @@
+from typing import List, Dict
+
+# --- Tabla declarativa de selectores ---
+# Cada campo admite:
+#   selector: selector CSS o lista de selectores alternativos (se usa el primero con valor)
+#   self:     lee el propio elemento raíz del grupo en vez de buscar un selector
+#   attr:     atributo a leer en vez del texto visible
+#   join:     concatena con espacios el texto de los hijos que calzan con este selector
+#   contains: solo considera elementos cuyo texto contiene este string
+#   nth:      toma el n-ésimo elemento que calza (0 = primero)
+#   strip:    substrings a eliminar del valor
+#   all:      devuelve la lista de valores no vacíos en vez del primero
+# Los grupos (`groups`) repiten la extracción para cada elemento que calza con `root`.
+CARD_TABLE = {
+    "groups": {
+        "cards": {
+            "root": "article.building-card",
+            "fields": {
+                "title": {"selector": "a.text-neutral-800.text-lg"},
+                "location": {"selector": "span.text-neutral-500.text-sm"},
+                "href": {"selector": "a.text-neutral-800.text-lg", "attr": "href"},
+                "summary": {"self": True},
+            },
+        },
+    },
+}
+
+DETAIL_TABLE = {
+    "fields": {
+        "title": {"selector": ["a.block.overflow-hidden.text-lg.font-bold", "nav.breadcrumbs li:last-child a"]},
+        "location": {"selector": "span.text-neutral-500"},
+        "images": {"selector": "img.gallery__img", "attr": "src", "all": True},
+    },
+    "groups": {
+        "typologies": {
+            "root": "div.flex.w-full.lg\\:w-\\[174px\\] + div.flex.flex-col",
+            "fields": {
+                "bedrooms": {"selector": "div.inline-flex.items-center", "nth": 0, "join": "p"},
+                "bathrooms": {"selector": "div.inline-flex.items-center", "nth": 1, "join": "p"},
+                "size_range": {"selector": "p", "contains": "m² útiles"},
+                "price_range": {"selector": "div.mt-2 p.text-lg.font-semibold"},
+                "available": {"selector": "a", "contains": "Ver", "strip": ["Ver", "disponibles"]},
+                "promotions": {"selector": "div.badge_promos span", "all": True},
+            },
+        },
+    },
+}
+
+# --- Motor de extracción (se ejecuta completo dentro del navegador) ---
+EXTRACT_JS = """
+(table) => {
+    const text = (el) => (el ? (el.innerText || el.textContent || "").trim() : "");
+    const value = (el, f) => {
+        let v = f.attr ? (el.getAttribute(f.attr) || "")
+              : f.join ? Array.from(el.querySelectorAll(f.join)).map(text).join(" ")
+              : text(el);
+        for (const s of f.strip || []) v = v.split(s).join("");
+        return v.trim();
+    };
+    const pick = (scope, f) => {
+        if (f.self) return f.all ? [value(scope, f)] : value(scope, f);
+        const selectors = Array.isArray(f.selector) ? f.selector : [f.selector];
+        for (const sel of selectors) {
+            let els = Array.from(scope.querySelectorAll(sel));
+            if (f.contains) els = els.filter((el) => text(el).includes(f.contains));
+            if (f.nth !== undefined) els = els[f.nth] ? [els[f.nth]] : [];
+            if (f.all) {
+                const values = els.map((el) => value(el, f)).filter((v) => v);
+                if (values.length) return values;
+            } else if (els.length) {
+                const v = value(els[0], f);
+                if (v) return v;
+            }
+        }
+        return f.all ? [] : "";
+    };
+    const extract = (scope, spec) => {
+        const out = {};
+        for (const [name, f] of Object.entries(spec.fields || {})) out[name] = pick(scope, f);
+        for (const [name, group] of Object.entries(spec.groups || {})) {
+            out[name] = Array.from(scope.querySelectorAll(group.root)).map((el) => extract(el, group));
+        }
+        return out;
+    };
+    return extract(document, table);
+}
+"""
+
+def extract_cards(page) -> List[Dict]:
+    """Extrae todas las tarjetas del listado en un solo `page.evaluate`."""
+    return page.evaluate(EXTRACT_JS, CARD_TABLE)["cards"]
+
+def extract_detail(page) -> Dict:
+    """Extrae título, ubicación, galería y tipologías de una ficha en un solo `page.evaluate`."""
+    return page.evaluate(EXTRACT_JS, DETAIL_TABLE)
+
+async def aextract_cards(page) -> List[Dict]:
+    return (await page.evaluate(EXTRACT_JS, CARD_TABLE))["cards"]
+
+async def aextract_detail(page) -> Dict:
+    return await page.evaluate(EXTRACT_JS, DETAIL_TABLE)
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+import argparse
+from glob import glob
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+
+from scraper.parsing import parse_range
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB = "data/price_history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL UNIQUE,
+    taken_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id TEXT PRIMARY KEY,
+    title TEXT,
+    location TEXT,
+    url TEXT
+);
+CREATE TABLE IF NOT EXISTS prices (
+    listing_id TEXT NOT NULL,
+    typology_key TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL,
+    price_range TEXT,
+    price_min REAL,
+    price_max REAL,
+    PRIMARY KEY (listing_id, typology_key, snapshot_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS prices_snapshot ON prices (snapshot_id);
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    listing_id TEXT NOT NULL,
+    typology_key TEXT NOT NULL,
+    old_snapshot_id INTEGER NOT NULL,
+    new_snapshot_id INTEGER NOT NULL,
+    old_price TEXT,
+    new_price TEXT,
+    delta_pct REAL,
+    detected_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_listing ON changes (listing_id, detected_at);
+CREATE INDEX IF NOT EXISTS changes_detected ON changes (detected_at);
+CREATE INDEX IF NOT EXISTS changes_snapshot ON changes (new_snapshot_id);
+"""
+
+# Compara cada tipología del snapshot nuevo con su última observación anterior (no solo con el
+# snapshot previo), emparejando por clave de tipología en vez de por posición.
+CHANGES_SQL = """
+INSERT INTO changes (listing_id, typology_key, old_snapshot_id, new_snapshot_id, old_price, new_price, delta_pct, detected_at)
+SELECT n.listing_id, n.typology_key, o.snapshot_id, n.snapshot_id, o.price_range, n.price_range,
+       CASE WHEN o.price_min > 0 AND n.price_min IS NOT NULL
+            THEN ROUND((n.price_min - o.price_min) * 100.0 / o.price_min, 2) END,
+       :taken_at
+FROM prices n
+JOIN prices o ON o.listing_id = n.listing_id AND o.typology_key = n.typology_key
+WHERE n.snapshot_id = :snapshot_id
+  AND o.snapshot_id = (SELECT MAX(p.snapshot_id) FROM prices p
+                       WHERE p.listing_id = n.listing_id AND p.typology_key = n.typology_key
+                         AND p.snapshot_id < :snapshot_id)
+  AND o.price_range IS NOT n.price_range
+"""
+
+CHANGE_COLUMNS = """
+SELECT c.listing_id, l.title, l.location, l.url, c.typology_key, c.old_price, c.new_price, c.delta_pct, c.detected_at
+FROM changes c JOIN listings l ON l.listing_id = c.listing_id
+"""
+
+def typology_key(typ: Dict) -> str:
+    """Clave estable de una tipología: dormitorios, baños y superficie normalizados."""
+    parts = [typ.get('bedrooms', ''), typ.get('bathrooms', ''), typ.get('size_range', '')]
+    return "|".join(" ".join(str(p).lower().split()) for p in parts)
+
+def typology_keys(typologies: List[Dict]) -> List[str]:
+    """Claves de todas las tipologías de un edificio; las repetidas se desambiguan con un sufijo #n."""
+    seen: Dict[str, int] = {}
+    keys = []
+    for typ in typologies:
+        key = typology_key(typ)
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+def snapshot_time(source: str) -> str:
+    m = re.search(r'(\d{8}_\d{6})', source)
+    dt = datetime.strptime(m.group(1), "%Y%m%d_%H%M%S") if m else datetime.now()
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+class PriceHistoryStore:
+    """Historial de precios indexado por listing y tipología, en SQLite.
+
+    Cada snapshot del scraper se ingiere con inserciones masivas y las variaciones de precio se
+    calculan con una sola consulta sobre conjuntos, de modo que preguntas como "cambios del listing X"
+    o "cambios de los últimos 7 días" se responden con índices en vez de releer archivos.
+    """
+    def __init__(self, db_path: str = HISTORY_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def ingest(self, source: str, listings: List[Dict], taken_at: str = None) -> int:
+        """Registra un snapshot y devuelve cuántos cambios de precio generó (0 si ya estaba ingerido)."""
+        taken_at = taken_at or snapshot_time(source)
+        with self.conn:
+            cur = self.conn.execute("INSERT OR IGNORE INTO snapshots (source, taken_at) VALUES (?, ?)",
+                                    (os.path.basename(source), taken_at))
+            if not cur.rowcount:
+                logger.info(f"Snapshot {source} already ingested")
+                return 0
+            snapshot_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO listings (listing_id, title, location, url) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(listing_id) DO UPDATE SET title = excluded.title, location = excluded.location, url = excluded.url",
+                [(l['id'], l.get('title'), l.get('location'), l.get('url')) for l in listings]
+            )
+            rows = []
+            for l in listings:
+                typologies = l.get('typologies', [])
+                for key, typ in zip(typology_keys(typologies), typologies):
+                    low, high = parse_range(typ.get('price_range', ''))
+                    rows.append((l['id'], key, snapshot_id, typ.get('price_range'), low, high))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO prices (listing_id, typology_key, snapshot_id, price_range, price_min, price_max) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            changed = self.conn.execute(CHANGES_SQL, {'snapshot_id': snapshot_id, 'taken_at': taken_at}).rowcount
+        logger.info(f"Ingested {len(listings)} listings ({len(rows)} typologies) from {source}: {changed} price changes")
+        return changed
+
+    def ingest_file(self, json_file: str) -> int:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            return self.ingest(json_file, json.load(f))
+
+    def latest_snapshot(self) -> Optional[Dict]:
+        row = self.conn.execute("SELECT id, source, taken_at FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    def changes(self, listing_id: str = None, since: str = None, snapshot_id: int = None,
+                limit: int = None) -> List[Dict]:
+        """Cambios de precio filtrados por listing, fecha mínima (`YYYY-MM-DD HH:MM:SS`) y/o snapshot."""
+        clauses, params = [], []
+        if listing_id:
+            clauses.append("c.listing_id = ?")
+            params.append(listing_id)
+        if since:
+            clauses.append("c.detected_at >= ?")
+            params.append(since)
+        if snapshot_id is not None:
+            clauses.append("c.new_snapshot_id = ?")
+            params.append(snapshot_id)
+        sql = CHANGE_COLUMNS + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY c.detected_at DESC, c.id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [self._change_dict(row) for row in self.conn.execute(sql, params)]
+
+    def changes_for_listing(self, listing_id: str) -> List[Dict]:
+        return self.changes(listing_id=listing_id)
+
+    def changes_since(self, days: float) -> List[Dict]:
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        return self.changes(since=since)
+
+    def latest_changes(self) -> List[Dict]:
+        """Cambios detectados al ingerir el snapshot más reciente (lo que antes era el último changes_*.json)."""
+        latest = self.latest_snapshot()
+        return self.changes(snapshot_id=latest['id']) if latest else []
+
+    @staticmethod
+    def _change_dict(row: sqlite3.Row) -> Dict:
+        # Mismas claves que los antiguos changes_*.json, más la tipología y la variación porcentual
+        return {
+            'id': row['listing_id'],
+            'title': row['title'],
+            'location': row['location'],
+            'url': row['url'],
+            'typology_key': row['typology_key'],
+            'old_price': row['old_price'],
+            'new_price': row['new_price'],
+            'delta_pct': row['delta_pct'],
+            'timestamp': row['detected_at'],
+        }
+
+    def close(self):
+        self.conn.close()
+
+# --- CLI: carga inicial del historial desde los snapshots existentes ---
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Price history store")
+    parser.add_argument('--backfill', default="data", help='Ingest every assetplan_properties_*.json in this folder, oldest first')
+    args = parser.parse_args()
+    store = PriceHistoryStore()
+    for json_file in sorted(glob(f"{args.backfill}/assetplan_properties_*.json"), key=snapshot_time):
+        store.ingest_file(json_file)
+    print(f"History: {store.latest_snapshot()}")
@@ -0,0 +1,62 @@
+import re
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+# --- Parseo de los textos del sitio a números ---
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+def parse_number(text: str) -> Optional[float]:
+    """'$1.050.000' -> 1050000.0, 'UF 12,5' -> 12.5. Los puntos son separador de miles (formato chileno)."""
+    m = NUMBER_RE.search(text or "")
+    if not m:
+        return None
+    raw = m.group(0)
+    if "," in raw:
+        raw = raw.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", raw):
+        raw = raw.replace(".", "")
+    return float(raw)
+
+def parse_range(text: str) -> Tuple[Optional[float], Optional[float]]:
+    """'$450.000 - $520.000' -> (450000.0, 520000.0); un solo valor se repite como mínimo y máximo."""
+    values = [parse_number(part) for part in re.split(r"\s+-\s+|\s+a\s+", text or "")]
+    values = [v for v in values if v is not None]
+    if not values:
+        return None, None
+    return min(values), max(values)
+
+def price_currency(text: str) -> str:
+    return "UF" if "UF" in (text or "").upper() else "CLP"
+
+def parse_price(text: str) -> Dict:
+    low, high = parse_range(text)
+    return {'currency': price_currency(text), 'min': low, 'max': high}
+
+def strip_accents(text: str) -> str:
+    """'Ñuñoa' -> 'Nunoa'. Para comparar comunas y palabras sin depender de tildes."""
+    return "".join(c for c in unicodedata.normalize("NFD", text or "") if unicodedata.category(c) != "Mn")
+
+def parse_count(text: str) -> Optional[int]:
+    """'2 Dormitorios' -> 2, '1 Baño' -> 1, 'Estudio' -> 0."""
+    if re.search(r"estudio|studio|monoambiente", strip_accents(text or "").lower()):
+        return 0
+    value = parse_number(text)
+    return None if value is None else int(value)
+
+def commune_of(location: str) -> str:
+    """'Ñuñoa, Región Metropolitana' -> 'Ñuñoa'."""
+    return (location or "").split(",")[0].strip()
+
+def parse_typology(typ: Dict) -> Dict:
+    """Campos numéricos de una tipología: dormitorios, baños, superficie (m²) y precio con su moneda."""
+    area_min, area_max = parse_range(typ.get('size_range', ''))
+    price = parse_price(typ.get('price_range', ''))
+    return {
+        'bedrooms': parse_count(typ.get('bedrooms', '')),
+        'bathrooms': parse_count(typ.get('bathrooms', '')),
+        'area_min': area_min,
+        'area_max': area_max,
+        'price_min': price['min'],
+        'price_max': price['max'],
+        'currency': price['currency'],
+    }
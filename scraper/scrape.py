@@ -2,19 +2,93 @@ import os
 import re
 import json
 import time
+import hashlib
+import asyncio
 import logging
 import argparse
+import multiprocessing
+import multiprocessing.connection
 from glob import glob
+from queue import Empty
 from datetime import datetime
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
 from uuid import uuid5, NAMESPACE_URL
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 from playwright.sync_api import sync_playwright, Browser
+from playwright.async_api import async_playwright, Browser as AsyncBrowser, Page as AsyncPage
+from scraper.extract import extract_cards, extract_detail, aextract_cards, aextract_detail
+from scraper.snapshot import SnapshotWriter, atomic_write_json, CHECKPOINT_FILE
+from scraper.work_queue import WorkQueue, QUEUE_DB
+from scraper.history import PriceHistoryStore
+from monitoring.metrics import REGISTRY
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# --- Sitio objetivo ---
+BASE_URL = "https://www.assetplan.cl"
+LIST_PATH = "/arriendo/departamento"
+BLOCKED_RESOURCES = ["stylesheet", "font"]
+
+# --- Métricas por página (la CLI las deja en un archivo que expone /metrics de la API) ---
+SCRAPER_METRICS_FILE = os.getenv("SCRAPER_METRICS_FILE", "data/scraper_metrics.prom")
+PAGE_SECONDS = REGISTRY.histogram("scraper_page_seconds", "Carga y extracción de cada página", ["kind", "phase"],
+                                  buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 45, 90))
+PAGE_RETRIES = REGISTRY.counter("scraper_retries_total", "Reintentos de carga de página", ["kind"])
+PAGE_FAILURES = REGISTRY.counter("scraper_page_failures_total", "Páginas que no cargaron tras todos los intentos", ["kind"])
+PAGE_METRICS = (PAGE_SECONDS, PAGE_RETRIES, PAGE_FAILURES)
+LOAD_ATTEMPTS = 2
+LOAD_ERRORS = {"list": "List page load failed", "detail": "Detail load failed"}
+
+def load_page(page, url: str, kind: str, timeout: int, wait_until: str) -> bool:
+    """`page.goto` con reintento; registra la duración, los reintentos y si la página no cargó."""
+    with PAGE_SECONDS.time(kind=kind, phase="load"):
+        for attempt in range(LOAD_ATTEMPTS):
+            if attempt:
+                PAGE_RETRIES.inc(kind=kind)
+            try:
+                page.goto(url, timeout=timeout, wait_until=wait_until)
+                return True
+            except Exception as e:
+                logger.warning(f"{LOAD_ERRORS[kind]} (attempt {attempt+1}): {e}")
+    PAGE_FAILURES.inc(kind=kind)
+    return False
+
+def merge_page_metrics(metrics, workers: int) -> int:
+    """Suma a las métricas de este proceso las que enviaron los `workers` de `scrape_sharded` por la cola `metrics`.
+
+    Un worker que murió sin enviarlas no bloquea: se espera a lo más un segundo por cada envío faltante.
+    """
+    merged = 0
+    for _ in range(workers):
+        try:
+            values = metrics.get(timeout=1)
+        except Empty:
+            break
+        for metric in PAGE_METRICS:
+            metric.merge(values.get(metric.name, {}))
+        merged += 1
+    return merged
+
+async def aload_page(page: AsyncPage, url: str, kind: str, timeout: int, wait_until: str,
+                     limiter: "HostRateLimiter") -> bool:
+    """Versión async de `load_page`; la espera del rate limit no cuenta como tiempo de carga."""
+    for attempt in range(LOAD_ATTEMPTS):
+        if attempt:
+            PAGE_RETRIES.inc(kind=kind)
+        try:
+            await limiter.wait(url)
+            with PAGE_SECONDS.time(kind=kind, phase="load"):
+                await page.goto(url, timeout=timeout, wait_until=wait_until)
+            return True
+        except Exception as e:
+            logger.warning(f"{LOAD_ERRORS[kind]} (attempt {attempt+1}): {e}")
+    PAGE_FAILURES.inc(kind=kind)
+    return False
+
 # --- Pydantic Model ---
 class PropertyListing(BaseModel):
     id: str
@@ -23,49 +97,17 @@ class PropertyListing(BaseModel):
     url: str
     images: List[str]
     typologies: List[Dict]
+    fingerprint: str = ""
     timestamp: str = time.strftime("%Y-%m-%d %H:%M:%S")
 
-# --- Obtener elementos de la página ---
-def get_text(element, selector: str) -> str:
-    el = element.query_selector(selector)
-    return el.inner_text().strip() if el else ""
-
-def get_attr(element, selector: str, attr: str) -> str:
-    el = element.query_selector(selector)
-    return el.get_attribute(attr) or "" if el else ""
-
 # --- Detalles de la extracción ---
 def extract_building_detail(browser: Browser, url: str) -> Dict:
     page = browser.new_page()
-    for attempt in range(2):
-        try:
-            page.goto(url, timeout=45000, wait_until="domcontentloaded")
-            break
-        except Exception as e:
-            logger.warning(f"Detail load failed (attempt {attempt+1}): {e}")
-    title = get_text(page, 'a.block.overflow-hidden.text-lg.font-bold') or get_text(page, 'nav.breadcrumbs li:last-child a')
-    location = get_text(page, 'span.text-neutral-500')
-    images = [img.get_attribute('src') for img in page.query_selector_all('img.gallery__img') if img.get_attribute('src')]
-    typologies = []
-    blocks = page.query_selector_all('div.flex.w-full.lg\\:w-\\[174px\\] + div.flex.flex-col')
-    for block in blocks:
-        cells = block.query_selector_all('div.inline-flex.items-center')
-        bd = " ".join(p.inner_text().strip() for p in cells[0].query_selector_all('p')) if len(cells) > 0 else ""
-        ba = " ".join(p.inner_text().strip() for p in cells[1].query_selector_all('p')) if len(cells) > 1 else ""
-        size_range = get_text(block, 'p:has-text("m² útiles")')
-        price_range = get_text(block, 'div.mt-2 p.text-lg.font-semibold')
-        available = get_text(block, 'a:has-text("Ver")').replace('Ver', '').replace('disponibles', '').strip()
-        promos = [span.inner_text().strip() for span in block.query_selector_all('div.badge_promos span')]
-        typologies.append({
-            'bedrooms': bd,
-            'bathrooms': ba,
-            'size_range': size_range,
-            'price_range': price_range,
-            'available': available,
-            'promotions': promos
-        })
+    load_page(page, url, "detail", timeout=45000, wait_until="domcontentloaded")
+    with PAGE_SECONDS.time(kind="detail", phase="extract"):
+        detail = extract_detail(page)
     page.close()
-    return {'title': title, 'location': location, 'images': images, 'typologies': typologies}
+    return detail
 
 # --- Actualizacion incremental ---
 def get_latest_json_file(data_dir: str = "data") -> str:
@@ -77,94 +119,313 @@ def get_latest_json_file(data_dir: str = "data") -> str:
         return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S") if m else datetime.min
     return max(json_files, key=extract_dt)
 
-def detect_changes(new_listings: List[PropertyListing], old_json: str) -> List[Dict]:
-    if not old_json or not os.path.exists(old_json):
-        logger.info("No previous JSON found, skipping change detection")
-        return []
-    with open(old_json, 'r', encoding='utf-8') as f:
-        old = json.load(f)
-    old_dict = {p['id']: p for p in old}
-    changes = []
-    for new in new_listings:
-        old_p = old_dict.get(new.id)
-        if old_p:
-            for i, new_typ in enumerate(new.typologies):
-                if i < len(old_p['typologies']) and new_typ['price_range'] != old_p['typologies'][i]['price_range']:
-                    changes.append({
-                        'id': new.id,
-                        'title': new.title,
-                        'location': new.location,
-                        'url': new.url,
-                        'typology_index': i,
-                        'old_price': old_p['typologies'][i]['price_range'],
-                        'new_price': new_typ['price_range'],
-                        'timestamp': new.timestamp
-                    })
-    if changes:
-        logger.info(f"Detected {len(changes)} price changes")
-    return changes
-
-def save_changes(changes: List[Dict], filename_base: str = "data/changes") -> str:
-    if not changes:
-        return ""
-    ts = time.strftime("%Y%m%d_%H%M%S")
-    filename = f"{filename_base}_{ts}.json"
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(changes, f, ensure_ascii=False, indent=2)
-    logger.info(f"Saved {len(changes)} changes to {filename}")
-    return filename
+# --- Re-scrape incremental ---
+def card_fingerprint(card: Dict) -> str:
+    """Huella barata de la tarjeta del listado: hash del texto visible (título, ubicación, precio desde)."""
+    text = " ".join(card.get('summary', '').split())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def load_previous_listings(json_file: str) -> Dict[str, Dict]:
+    """Indexa por id los listings del snapshot anterior que traen huella de tarjeta."""
+    if not json_file or not os.path.exists(json_file):
+        return {}
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    previous = {p['id']: p for p in data if p.get('fingerprint')}
+    logger.info(f"Incremental mode: {len(previous)} listings with fingerprint in {json_file}")
+    return previous
+
+def resolve_card(card: Dict, base_url: str) -> Dict:
+    href = card['href']
+    card['url'] = href if href.startswith('http') else f"{base_url}{href}"
+    card['id'] = str(uuid5(NAMESPACE_URL, card['url']))
+    card['fingerprint'] = card_fingerprint(card)
+    return card
+
+def reuse_listing(card: Dict, previous: Dict[str, Dict]) -> Optional[PropertyListing]:
+    """Devuelve el listing anterior si la tarjeta no cambió; None si hay que visitar el detalle."""
+    prev = previous.get(card['id']) if previous else None
+    if not prev or prev['fingerprint'] != card['fingerprint']:
+        return None
+    return PropertyListing(**{k: v for k, v in prev.items() if k != 'timestamp'})
+
+def build_listing(card: Dict, detail: Dict) -> PropertyListing:
+    return PropertyListing(
+        id=card['id'],
+        title=detail['title'] or card['title'],
+        location=detail['location'] or card['location'],
+        url=card['url'],
+        images=detail['images'],
+        typologies=detail['typologies'],
+        fingerprint=card['fingerprint']
+    )
 
 # --- Logica del scraper---
-def scrape_assetplan(min_props: int = 50, max_pages: int = 50) -> List[PropertyListing]:
-    results: List[PropertyListing] = []
+def scrape_assetplan(min_props: int = 50, max_pages: int = 50, base_url: str = BASE_URL,
+                     previous: Dict[str, Dict] = None, writer: SnapshotWriter = None,
+                     collected: List[PropertyListing] = None) -> List[PropertyListing]:
+    """Recorre el listado y visita cada ficha de detalle hasta juntar `min_props` propiedades.
+
+    Con `writer`, cada listing se persiste apenas se obtiene y el recorrido parte desde la página
+    del checkpoint, saltando las tarjetas ya escritas; `collected` son los listings de esa corrida previa.
+    """
+    results: List[PropertyListing] = list(collected or [])
+    reused = 0
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         page = browser.new_page()
-        page.route("**/*", lambda route, req: route.abort() if req.resource_type in ["stylesheet","font"] else route.continue_())
-        page_num = 1
+        page.route("**/*", lambda route, req: route.abort() if req.resource_type in BLOCKED_RESOURCES else route.continue_())
+        page_num = writer.page if writer else 1
         while len(results) < min_props and page_num <= max_pages:
-            list_url = f"https://www.assetplan.cl/arriendo/departamento?page={page_num}"
+            list_url = f"{base_url}{LIST_PATH}?page={page_num}"
             logger.info(f"Loading list page {page_num}")
-            for attempt in range(2):
-                try:
-                    page.goto(list_url, timeout=30000, wait_until="networkidle")
-                    break
-                except Exception as e:
-                    logger.warning(f"List page load failed (attempt {attempt+1}): {e}")
-            cards = page.query_selector_all('article.building-card')
+            load_page(page, list_url, "list", timeout=30000, wait_until="networkidle")
+            with PAGE_SECONDS.time(kind="list", phase="extract"):
+                cards = extract_cards(page)
             logger.info(f"Found {len(cards)} cards")
             for idx, card in enumerate(cards, 1):
                 logger.info(f"Processing card {idx}")
-                card_title = get_text(card, 'a.text-neutral-800.text-lg')
-                card_location = get_text(card, 'span.text-neutral-500.text-sm')
-                href = get_attr(card, 'a.text-neutral-800.text-lg', 'href')
-                detail_url = href if href.startswith('http') else f"https://www.assetplan.cl{href}"
-                detail = extract_building_detail(browser, detail_url)
-                listing = PropertyListing(
-                    id=str(uuid5(NAMESPACE_URL, detail_url)),
-                    title=detail['title'] or card_title,
-                    location=detail['location'] or card_location,
-                    url=detail_url,
-                    images=detail['images'],
-                    typologies=detail['typologies']
-                )
+                card = resolve_card(card, base_url)
+                if writer and card['id'] in writer.ids:
+                    continue
+                listing = reuse_listing(card, previous)
+                if listing:
+                    reused += 1
+                else:
+                    listing = build_listing(card, extract_building_detail(browser, card['url']))
                 results.append(listing)
+                if writer:
+                    writer.append(listing.model_dump(), page_num)
                 logger.info(f"Collected {len(results)} listings")
                 if len(results) >= min_props:
                     break
             page_num += 1
+            if writer and len(results) < min_props:
+                writer.checkpoint(page_num)
         page.close()
         browser.close()
+    if previous:
+        logger.info(f"Reused {reused} unchanged listings, fetched {len(results) - reused} detail pages")
     return results
 
+# --- Modo asíncrono: pool de páginas y rate limit por host ---
+class HostRateLimiter:
+    """Espacia las peticiones a un mismo host para no superar `rate` peticiones por segundo."""
+    def __init__(self, rate: float = 0.0):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, 0.0))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class PagePool:
+    """Pool reutilizable de páginas repartidas en varios contextos del navegador."""
+    def __init__(self, browser: AsyncBrowser, size: int, contexts: int = 2):
+        self.browser = browser
+        self.size = max(1, size)
+        self.n_contexts = max(1, min(contexts, self.size))
+        self._contexts = []
+        self._idle: asyncio.Queue = asyncio.Queue()
+
+    async def _new_page(self, context) -> AsyncPage:
+        page = await context.new_page()
+        await page.route("**/*", lambda route, req: route.abort() if req.resource_type in BLOCKED_RESOURCES else route.continue_())
+        return page
+
+    async def start(self) -> "PagePool":
+        self._contexts = [await self.browser.new_context() for _ in range(self.n_contexts)]
+        for i in range(self.size):
+            self._idle.put_nowait(await self._new_page(self._contexts[i % self.n_contexts]))
+        return self
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self._idle.get()
+        try:
+            yield page
+        finally:
+            # Una página cerrada (crash, timeout del navegador) se reemplaza para no encoger el pool
+            if page.is_closed():
+                page = await self._new_page(page.context)
+            self._idle.put_nowait(page)
+
+    async def close(self):
+        for context in self._contexts:
+            await context.close()
+
+async def extract_building_detail_async(page: AsyncPage, url: str, limiter: HostRateLimiter) -> Dict:
+    await aload_page(page, url, "detail", timeout=45000, wait_until="domcontentloaded", limiter=limiter)
+    with PAGE_SECONDS.time(kind="detail", phase="extract"):
+        return await aextract_detail(page)
+
+async def _scrape_listing_async(pool: PagePool, limiter: HostRateLimiter, card: Dict,
+                                previous: Dict[str, Dict] = None) -> PropertyListing:
+    listing = reuse_listing(card, previous)
+    if listing:
+        return listing
+    async with pool.page() as page:
+        detail = await extract_building_detail_async(page, card['url'], limiter)
+    listing = build_listing(card, detail)
+    logger.info(f"Collected {listing.url}")
+    return listing
+
+async def scrape_assetplan_async(min_props: int = 50, max_pages: int = 50, concurrency: int = 8,
+                                 rate: float = 0.0, base_url: str = BASE_URL,
+                                 previous: Dict[str, Dict] = None, writer: SnapshotWriter = None,
+                                 collected: List[PropertyListing] = None) -> List[PropertyListing]:
+    """Igual que `scrape_assetplan`, pero abre hasta `concurrency` fichas de detalle en paralelo.
+
+    Las páginas de listado se recorren en orden y cada tarjeta se despacha al pool apenas se lee;
+    `rate` limita las peticiones por segundo a cada host (0 = sin límite). El resultado conserva
+    el orden de las tarjetas, independiente del orden en que terminen las descargas.
+
+    Con `writer`, los listings se persisten a medida que terminan y el checkpoint apunta a la
+    página de listado más antigua que aún tiene fichas pendientes.
+    """
+    collected = list(collected or [])
+    tasks: List[asyncio.Task] = []
+    pending: Dict[int, int] = {}
+    limiter = HostRateLimiter(rate)
+    page_num = writer.page if writer else 1
+
+    async def scrape_card(card: Dict, card_page: int) -> PropertyListing:
+        listing = await _scrape_listing_async(pool, limiter, card, previous)
+        pending[card_page] -= 1
+        if writer:
+            writer.append(listing.model_dump(), min([n for n, c in pending.items() if c], default=page_num))
+        return listing
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        pool = await PagePool(browser, size=concurrency).start()
+        list_page = await browser.new_page()
+        await list_page.route("**/*", lambda route, req: route.abort() if req.resource_type in BLOCKED_RESOURCES else route.continue_())
+        try:
+            while len(collected) + len(tasks) < min_props and page_num <= max_pages:
+                list_url = f"{base_url}{LIST_PATH}?page={page_num}"
+                logger.info(f"Loading list page {page_num}")
+                await aload_page(list_page, list_url, "list", timeout=30000, wait_until="networkidle", limiter=limiter)
+                with PAGE_SECONDS.time(kind="list", phase="extract"):
+                    cards = await aextract_cards(list_page)
+                logger.info(f"Found {len(cards)} cards")
+                cards = [resolve_card(card, base_url) for card in cards]
+                if writer:
+                    cards = [card for card in cards if card['id'] not in writer.ids]
+                for card in cards[:min_props - len(collected) - len(tasks)]:
+                    pending[page_num] = pending.get(page_num, 0) + 1
+                    tasks.append(asyncio.create_task(scrape_card(card, page_num)))
+                page_num += 1
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await list_page.close()
+            await pool.close()
+            await browser.close()
+    logger.info(f"Collected {len(results)} listings")
+    return collected + list(results)
+
+# --- Modo distribuido: coordinador + workers sobre una cola SQLite ---
+def _crawl_worker(worker_id: str, db_path: str, base_url: str, previous: Dict[str, Dict] = None, metrics=None):
+    """Proceso worker con su propio Chromium: toma tareas de la cola hasta que no quede trabajo.
+
+    Las páginas se cargan con `load_page` (reintento y métricas); una página que no carga falla la tarea
+    para que la cola la reintente con backoff. Al terminar envía sus métricas de página por `metrics`.
+    """
+    queue = WorkQueue(db_path)
+    processed = 0
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = None
+        while True:
+            task = queue.claim(worker_id)
+            if not task:
+                if queue.is_drained():
+                    break
+                time.sleep(0.5)
+                continue
+            try:
+                if not browser.is_connected():
+                    browser = p.chromium.launch(headless=True)
+                    page = None
+                if page is None or page.is_closed():
+                    page = browser.new_page()
+                    page.route("**/*", lambda route, req: route.abort() if req.resource_type in BLOCKED_RESOURCES else route.continue_())
+                if task['kind'] == 'list':
+                    if not load_page(page, task['payload']['url'], "list", timeout=30000, wait_until="networkidle"):
+                        raise RuntimeError(LOAD_ERRORS['list'])
+                    with PAGE_SECONDS.time(kind="list", phase="extract"):
+                        cards = [resolve_card(card, base_url) for card in extract_cards(page)]
+                    queue.enqueue_many('detail', [(card['url'], card) for card in cards])
+                    logger.info(f"[{worker_id}] List page {task['payload']['page']}: {len(cards)} cards")
+                else:
+                    card = task['payload']
+                    listing = reuse_listing(card, previous)
+                    if not listing:
+                        if not load_page(page, card['url'], "detail", timeout=45000, wait_until="domcontentloaded"):
+                            raise RuntimeError(LOAD_ERRORS['detail'])
+                        with PAGE_SECONDS.time(kind="detail", phase="extract"):
+                            detail = extract_detail(page)
+                        listing = build_listing(card, detail)
+                    queue.put_result(listing.id, task['id'], listing.model_dump())
+                queue.complete(task['id'])
+                processed += 1
+            except Exception as e:
+                queue.fail(task['id'], str(e))
+        browser.close()
+    queue.close()
+    if metrics is not None:
+        metrics.put({metric.name: metric.values for metric in PAGE_METRICS})
+    logger.info(f"[{worker_id}] Finished after {processed} tasks")
+
+def scrape_sharded(max_pages: int = 50, workers: int = 4, base_url: str = BASE_URL, db_path: str = QUEUE_DB,
+                   previous: Dict[str, Dict] = None, resume: bool = False,
+                   stale_timeout: float = 120.0) -> List[PropertyListing]:
+    """Recorre las `max_pages` páginas del listado con `workers` procesos en paralelo.
+
+    El coordinador encola las páginas de listado en una cola SQLite durable; cada worker toma
+    tareas, encola las fichas de detalle que descubre, reintenta los fallos con backoff y escribe
+    su resultado. La salida se une en un solo snapshot deduplicado por id de listing. Con `resume`
+    se conserva la cola de una corrida anterior y solo se procesa lo pendiente.
+    """
+    queue = WorkQueue(db_path)
+    if not resume:
+        queue.reset()
+    queue.enqueue_many('list', [(f"list:{n}", {'url': f"{base_url}{LIST_PATH}?page={n}", 'page': n})
+                                for n in range(1, max_pages + 1)])
+    ctx = multiprocessing.get_context("spawn")
+    metrics = ctx.Queue()
+    procs = [ctx.Process(target=_crawl_worker, args=(f"worker-{i}", db_path, base_url, previous, metrics))
+             for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    while any(proc.is_alive() for proc in procs):
+        multiprocessing.connection.wait([proc.sentinel for proc in procs if proc.is_alive()], timeout=stale_timeout / 4)
+        requeued = queue.requeue_stale(stale_timeout)
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale tasks")
+        logger.info(f"Queue status: {queue.stats()}")
+    if not queue.is_drained():
+        logger.error(f"All workers exited with work left: {queue.stats()}")
+    for proc in procs:
+        proc.join()
+    merge_page_metrics(metrics, len(procs))
+    listings = [PropertyListing(**data) for data in queue.results()]
+    queue.close()
+    logger.info(f"Merged {len(listings)} unique listings from {workers} workers")
+    return listings
+
 # --- Guardado en JSON y creacion de carpeta data ---
 def save_to_json(listings: List[PropertyListing], filename_base: str = "data/assetplan_properties") -> str:
     ts = time.strftime("%Y%m%d_%H%M%S")
-    filename = f"{filename_base}_{ts}.json"
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump([l.model_dump() for l in listings], f, ensure_ascii=False, indent=2)
+    filename = atomic_write_json(f"{filename_base}_{ts}.json", [l.model_dump() for l in listings])
     logger.info(f"Saved {len(listings)} listings to {filename}")
     return filename
 
@@ -173,13 +434,46 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Assetplan scraper")
     parser.add_argument('--min', type=int, default=50, help='Minimum properties')
     parser.add_argument('--max', type=int, default=50, help='Max pages')
+    parser.add_argument('--concurrency', type=int, default=1, help='Detail pages fetched in parallel (>1 enables async mode)')
+    parser.add_argument('--rate', type=float, default=0.0, help='Max requests per second per host in async mode (0 = unlimited)')
+    parser.add_argument('--base-url', default=BASE_URL, help='Site root (e.g. a local fixture server)')
+    parser.add_argument('--incremental', action='store_true', help='Reuse listings whose list card did not change since the last snapshot')
+    parser.add_argument('--resume', action='store_true', help=f'Continue the interrupted run recorded in {CHECKPOINT_FILE} (or {QUEUE_DB} with --workers)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for a sharded crawl of all --max pages (>1 enables it)')
     args = parser.parse_args()
-    listings = scrape_assetplan(min_props=args.min, max_pages=args.max)
+    collected: List[PropertyListing] = []
+    if args.workers > 1:
+        writer = None
+    elif args.resume and os.path.exists(CHECKPOINT_FILE):
+        writer, done = SnapshotWriter.resume()
+        collected = [PropertyListing(**l) for l in done]
+        args = argparse.Namespace(**{**vars(args), **writer.params})
+    else:
+        if args.resume:
+            logger.warning(f"No checkpoint found at {CHECKPOINT_FILE}, starting a new run")
+        writer = SnapshotWriter(params={'min': args.min, 'max': args.max, 'concurrency': args.concurrency,
+                                        'rate': args.rate, 'base_url': args.base_url, 'incremental': args.incremental})
     old_json = get_latest_json_file()
-    changes = detect_changes(listings, old_json)
-    if changes:
-        save_changes(changes)
-    out_file = save_to_json(listings)
+    previous = load_previous_listings(old_json) if args.incremental else None
+    if args.workers > 1:
+        listings = scrape_sharded(max_pages=args.max, workers=args.workers, base_url=args.base_url,
+                                  previous=previous, resume=args.resume)
+    elif args.concurrency > 1:
+        listings = asyncio.run(scrape_assetplan_async(min_props=args.min, max_pages=args.max, concurrency=args.concurrency,
+                                                      rate=args.rate, base_url=args.base_url, previous=previous,
+                                                      writer=writer, collected=collected))
+    else:
+        listings = scrape_assetplan(min_props=args.min, max_pages=args.max, base_url=args.base_url, previous=previous,
+                                    writer=writer, collected=collected)
+    out_file = writer.finalize() if writer else save_to_json(listings)
+    history = PriceHistoryStore()
+    if old_json and not history.latest_snapshot():
+        history.ingest_file(old_json)  # primera corrida con historial: usa el snapshot anterior como base
+    changed = history.ingest(out_file, [l.model_dump() for l in listings])
+    history.close()
+    REGISTRY.gauge("scraper_last_run_timestamp_seconds", "Fin de la última corrida del scraper").set(time.time())
+    REGISTRY.gauge("scraper_last_run_listings", "Listings de la última corrida del scraper").set(len(listings))
+    REGISTRY.write_textfile(SCRAPER_METRICS_FILE)
     print(f"Done. File: {out_file}")
-    if changes:
-        print(f"Changes detected and saved to: data/changes_{time.strftime('%Y%m%d_%H%M%S')}.json")
\ No newline at end of file
+    if changed:
+        print(f"{changed} price changes recorded in {history.db_path}")
\ No newline at end of file
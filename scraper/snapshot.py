@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import logging
+from typing import List, Dict, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "data/scrape_checkpoint.json"
+
+# --- Escritura atómica ---
+def atomic_write_json(filename: str, data) -> str:
+    """Escribe a un archivo temporal en la misma carpeta y lo renombra: los lectores nunca ven un JSON a medias."""
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+    return filename
+
+# --- Snapshot en streaming con checkpoint ---
+class SnapshotWriter:
+    """Agrega cada listing a un JSONL append-only apenas se recolecta y guarda un checkpoint de avance.
+
+    Si el navegador se cae, `SnapshotWriter.resume()` recupera lo ya escrito y la página del listado
+    donde quedó el scraper. `finalize()` convierte el JSONL en el snapshot `*.json` definitivo con un
+    rename atómico, por lo que `RAGAgent` y `/changes` nunca leen un archivo incompleto.
+    """
+    def __init__(self, filename_base: str = "data/assetplan_properties", ts: str = None,
+                 checkpoint_file: str = CHECKPOINT_FILE, params: Dict = None):
+        self.filename_base = filename_base
+        self.ts = ts or time.strftime("%Y%m%d_%H%M%S")
+        self.jsonl_file = f"{filename_base}_{self.ts}.jsonl"
+        self.checkpoint_file = checkpoint_file
+        self.params = params or {}
+        self.ids: Set[str] = set()
+        self.page = 1
+        os.makedirs(os.path.dirname(self.jsonl_file) or ".", exist_ok=True)
+        self._fh = open(self.jsonl_file, 'a', encoding='utf-8')
+
+    @classmethod
+    def resume(cls, checkpoint_file: str = CHECKPOINT_FILE) -> Tuple["SnapshotWriter", List[Dict]]:
+        """Reabre el JSONL del checkpoint y devuelve el writer junto a los listings ya escritos."""
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        listings = cls._recover(checkpoint['jsonl_file'])
+        writer = cls(checkpoint['filename_base'], checkpoint['ts'], checkpoint_file, checkpoint.get('params'))
+        writer.ids = {l['id'] for l in listings}
+        writer.page = checkpoint['page']
+        logger.info(f"Resuming from list page {writer.page} with {len(listings)} listings in {writer.jsonl_file}")
+        return writer, listings
+
+    @staticmethod
+    def _recover(jsonl_file: str) -> List[Dict]:
+        """Lee las líneas completas y trunca una última línea a medio escribir, si la hay."""
+        listings, valid_bytes = [], 0
+        if not os.path.exists(jsonl_file):
+            return listings
+        with open(jsonl_file, 'rb') as f:
+            for raw in f:
+                try:
+                    listings.append(json.loads(raw))
+                except ValueError:
+                    logger.warning(f"Discarding truncated line in {jsonl_file}")
+                    break
+                valid_bytes += len(raw)
+        with open(jsonl_file, 'r+b') as f:
+            f.truncate(valid_bytes)
+        return listings
+
+    def append(self, listing: Dict, page: int):
+        """Persiste un listing (flush + fsync) y avanza el checkpoint a `page`."""
+        self._fh.write(json.dumps(listing, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.ids.add(listing['id'])
+        self.checkpoint(page)
+
+    def checkpoint(self, page: int):
+        self.page = page
+        atomic_write_json(self.checkpoint_file, {
+            'filename_base': self.filename_base,
+            'ts': self.ts,
+            'jsonl_file': self.jsonl_file,
+            'page': page,
+            'count': len(self.ids),
+            'params': self.params,
+        })
+
+    def finalize(self) -> str:
+        """Escribe el snapshot final línea a línea desde el JSONL y lo publica con un rename atómico."""
+        self._fh.close()
+        filename = f"{self.filename_base}_{self.ts}.json"
+        tmp = f"{filename}.tmp"
+        count = 0
+        with open(self.jsonl_file, 'r', encoding='utf-8') as src, open(tmp, 'w', encoding='utf-8') as dst:
+            dst.write("[")
+            for line in src:
+                line = line.strip()
+                if line:
+                    dst.write(",\n" if count else "\n")
+                    dst.write(line)
+                    count += 1
+            dst.write("\n]\n")
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, filename)
+        os.remove(self.jsonl_file)
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+        logger.info(f"Saved {count} listings to {filename}")
+        return filename
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = "data/crawl_queue.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    claimed_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, available_at);
+CREATE TABLE IF NOT EXISTS results (
+    listing_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Las fichas de detalle se atienden antes que nuevas páginas de listado para drenar el trabajo ya descubierto
+KIND_PRIORITY = "CASE kind WHEN 'detail' THEN 0 ELSE 1 END"
+
+class WorkQueue:
+    """Cola de trabajo durable en SQLite, compartida entre el coordinador y los procesos worker.
+
+    Cada tarea tiene una `key` única (p. ej. `list:3` o la URL de detalle), así que re-encolar es
+    idempotente y una corrida interrumpida se retoma con lo que quedó pendiente. Los resultados se
+    guardan por id de listing (`uuid5`), lo que deduplica fichas alcanzadas desde varios listados.
+    """
+    def __init__(self, db_path: str = QUEUE_DB, max_attempts: int = 4, backoff: float = 2.0):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def reset(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM results")
+
+    def enqueue(self, kind: str, key: str, payload: Dict):
+        self.enqueue_many(kind, [(key, payload)])
+
+    def enqueue_many(self, kind: str, items: List[tuple]):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (kind, key, payload) VALUES (?, ?, ?)",
+                [(kind, key, json.dumps(payload, ensure_ascii=False)) for key, payload in items]
+            )
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Toma atómicamente la próxima tarea disponible y la marca como `running`."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT id, kind, key, payload, attempts FROM tasks "
+                f"WHERE status = 'pending' AND available_at <= ? ORDER BY {KIND_PRIORITY}, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'running', claimed_by = ?, claimed_at = ? WHERE id = ?",
+                (worker_id, now, row[0])
+            )
+        return {'id': row[0], 'kind': row[1], 'key': row[2], 'payload': json.loads(row[3]), 'attempts': row[4]}
+
+    def complete(self, task_id: int):
+        self.conn.execute("UPDATE tasks SET status = 'done', error = NULL WHERE id = ?", (task_id,))
+
+    def fail(self, task_id: int, error: str):
+        """Reprograma la tarea con backoff exponencial o la marca `failed` al agotar los intentos."""
+        with self._transaction() as conn:
+            attempts = conn.execute("SELECT attempts FROM tasks WHERE id = ?", (task_id,)).fetchone()[0] + 1
+            if attempts >= self.max_attempts:
+                conn.execute("UPDATE tasks SET status = 'failed', attempts = ?, error = ? WHERE id = ?",
+                             (attempts, error, task_id))
+                logger.error(f"Task {task_id} failed after {attempts} attempts: {error}")
+            else:
+                delay = self.backoff * 2 ** (attempts - 1)
+                conn.execute("UPDATE tasks SET status = 'pending', attempts = ?, error = ?, available_at = ? WHERE id = ?",
+                             (attempts, error, time.time() + delay, task_id))
+                logger.warning(f"Task {task_id} retry {attempts} in {delay:.1f}s: {error}")
+
+    def requeue_stale(self, timeout: float) -> int:
+        """Devuelve a `pending` las tareas de workers que murieron sin completarlas."""
+        cur = self.conn.execute(
+            "UPDATE tasks SET status = 'pending', claimed_by = NULL WHERE status = 'running' AND claimed_at < ?",
+            (time.time() - timeout,)
+        )
+        return cur.rowcount
+
+    def put_result(self, listing_id: str, position: int, data: Dict):
+        self.conn.execute(
+            "INSERT INTO results (listing_id, position, data, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(listing_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (listing_id, position, json.dumps(data, ensure_ascii=False), time.time())
+        )
+
+    def results(self) -> List[Dict]:
+        return [json.loads(row[0]) for row in self.conn.execute("SELECT data FROM results ORDER BY position")]
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def is_drained(self) -> bool:
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'running')"
+        ).fetchone()[0] == 0
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,12 @@
+def make_typology(bedrooms: str = "2 Dormitorios", price: str = "$400.000", size: str = "45 m² útiles",
+                  bathrooms: str = "1 Baño") -> dict:
+    return {"bedrooms": bedrooms, "bathrooms": bathrooms, "size_range": size, "price_range": price,
+            "available": "2", "promotions": []}
+
+def make_property(i, location: str = "Santiago, Región Metropolitana", typologies: list = None, **fields) -> dict:
+    """Propiedad con la forma del snapshot (`id-<i>`, 'Edificio <i>'); por defecto con una tipología 2D1B."""
+    prop = {"id": f"id-{i}", "title": f"Edificio {i}", "location": location,
+            "url": f"https://www.assetplan.cl/arriendo/departamento/edificio-{i}", "images": [],
+            "typologies": [make_typology()] if typologies is None else typologies}
+    prop.update(fields)
+    return prop
@@ -0,0 +1,63 @@
+import os
+import re
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Directorio con el HTML guardado de assetplan.cl (listados y fichas de detalle)
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "assetplan")
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Sirve /arriendo/departamento?page=N como list_N.html y /arriendo/departamento/<slug> como detail_<slug>.html."""
+    fixtures_dir = FIXTURES_DIR
+    hits = None
+
+    def _fixture_file(self) -> str:
+        url = urlparse(self.path)
+        if url.path.rstrip("/") == "/arriendo/departamento":
+            page = parse_qs(url.query).get("page", ["1"])[0]
+            return os.path.join(self.fixtures_dir, f"list_{page}.html")
+        m = re.fullmatch(r"/arriendo/departamento/([\w-]+)", url.path)
+        if m:
+            return os.path.join(self.fixtures_dir, f"detail_{m.group(1)}.html")
+        return ""
+
+    def do_GET(self):
+        if self.hits is not None:
+            self.hits.append(urlparse(self.path).path)
+        filename = self._fixture_file()
+        if not filename or not os.path.exists(filename):
+            # Un listado vacío indica fin de la paginación, igual que el sitio real
+            if urlparse(self.path).path.startswith("/arriendo/departamento") and "page=" in self.path:
+                body = b"<!DOCTYPE html><html><body><main class=\"listing\"></main></body></html>"
+                status = 200
+            else:
+                body, status = b"Not found", 404
+        else:
+            with open(filename, "rb") as f:
+                body, status = f.read(), 200
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@contextmanager
+def serve_fixture_site(fixtures_dir: str = FIXTURES_DIR, hits: list = None):
+    """Levanta el sitio de fixtures en un puerto libre de localhost y entrega su URL base.
+
+    Si se pasa `hits`, cada ruta solicitada se agrega a esa lista.
+    """
+    handler = type("Handler", (FixtureHandler,), {"fixtures_dir": fixtures_dir, "hits": hits})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,77 @@
+import time
+import asyncio
+import threading
+from llm.answer_cache import AnswerCache
+
+ANSWER = {"answer": "Edificio Santa Isabel ...", "source_ids": ["a", "b"]}
+
+# Prueba el nivel exacto (consulta normalizada) y que cada versión del índice tenga sus propias entradas.
+def test_exact_hit_and_version_invalidation():
+    cache = AnswerCache()
+    cache.put("¿2 dormitorios en Santiago?", 5, [1.0, 0.0], ["a", "b"], ANSWER, version="v1")
+    assert cache.get_exact("2 Dormitorios  en santiago", 5, "v1") == ANSWER
+    assert cache.get_exact("2 dormitorios en santiago", 3, "v1") is None, "n distinto es otra consulta"
+    assert cache.get_exact("2 dormitorios en santiago", 5, "v2") is None, "Otra versión del índice no ve esas entradas"
+
+    # Mientras se drena el índice anterior, sus consultas y las del nuevo no se borran el cache entre sí
+    cache.put("providencia", 5, [0.0, 1.0], ["c"], ANSWER, version="v2")
+    cache.put("ñuñoa", 5, [0.5, 0.5], ["d"], ANSWER, version="v1")
+    assert cache.get_exact("2 dormitorios en santiago", 5, "v1") == cache.get_exact("providencia", 5, "v2") == ANSWER
+    assert cache.stats["invalidations"] == 0
+
+    cache.put("las condes", 5, [1.0, 1.0], ["e"], ANSWER, version="v3")
+    assert cache.get_exact("ñuñoa", 5, "v1") is None and cache.get_semantic([0.5, 0.5], ["d"], "v1") is None
+    assert cache.get_exact("providencia", 5, "v2") == ANSWER
+    cache.put("ñuñoa", 5, [0.5, 0.5], ["d"], ANSWER, version="v1")
+    assert cache.get_exact("ñuñoa", 5, "v1") is None, "Una versión descartada no vuelve a entrar"
+    assert cache.stats["invalidations"] == 1 and list(cache.versions) == ["v2", "v3"]
+
+# Prueba el nivel semántico: requiere embedding casi idéntico y el mismo conjunto recuperado.
+def test_semantic_hit_requires_same_sources():
+    cache = AnswerCache(similarity=0.95)
+    cache.put("departamentos de 2 dormitorios en santiago", 5, [1.0, 0.1], ["a", "b"], ANSWER, version="v1")
+    assert cache.get_semantic([1.0, 0.12], ["a", "b"], "v1") == ANSWER
+    assert cache.get_semantic([1.0, 0.12], ["a", "c"], "v1") is None
+    assert cache.get_semantic([0.1, 1.0], ["a", "b"], "v1") is None
+
+# Prueba el TTL y el desalojo LRU.
+def test_ttl_and_lru():
+    cache = AnswerCache(max_entries=2, ttl=0.05)
+    for q in ["uno", "dos", "tres"]:
+        cache.put(q, 5, [1.0], [q], ANSWER, version="v1")
+    assert cache.get_exact("uno", 5, "v1") is None
+    assert cache.get_exact("tres", 5, "v1") == ANSWER
+    time.sleep(0.06)
+    assert cache.get_exact("tres", 5, "v1") is None
+
+# Prueba que peticiones idénticas concurrentes compartan una sola llamada al LLM.
+def test_concurrent_requests_are_coalesced():
+    cache = AnswerCache()
+    calls = []
+    def slow_llm():
+        calls.append(1)
+        time.sleep(0.1)
+        return ANSWER
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(("v1", "q", ("a",)), slow_llm)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [ANSWER] * 5
+    assert cache.stats["coalesced"] == 4
+
+# Prueba que el camino async también agrupe peticiones idénticas simultáneas.
+def test_async_requests_are_coalesced():
+    cache = AnswerCache()
+    calls = []
+    async def slow_llm():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ANSWER
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_compute(("v1", "q", ("a",)), slow_llm) for _ in range(5)))
+    assert asyncio.run(main()) == [ANSWER] * 5
+    assert len(calls) == 1
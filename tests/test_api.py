@@ -70,3 +70,17 @@ def test_query_response_english():
     assert data["confidence"] in ["high", "medium", "low"], "Confidence debe ser 'high', 'medium' o 'low'"
     assert any("Santiago" in data["answer"] or url.endswith("santiago") for url in data["urls"]), "La respuesta debe mencionar propiedades en Santiago"
     assert any(s in data["answer"].lower() for s in ["2 bedroom", "2 dormitorios", "2-bedroom"]), "La respuesta debe mencionar 2 dormitorios"
+
+# Prueba que /ask/stream envíe primero las fuentes, luego los tokens y al final la respuesta completa.
+def test_query_stream_events():
+    payload = {"query": "Departamentos de 2 dormitorios en Santiago"}
+    events = []
+    with client.stream("POST", "/ask/stream", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                events.append(line[len("event: "):])
+    assert events[0] == "sources", "Las fuentes deben llegar antes que la respuesta"
+    assert events[-1] == "done", "El último evento debe ser 'done'"
+    assert "token" in events, "La respuesta debe llegar en tokens"
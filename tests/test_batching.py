@@ -0,0 +1,29 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from llm.batching import QueryBatcher
+
+# Prueba que consultas simultáneas se embeban en una sola llamada y cada una reciba su vector.
+def test_concurrent_queries_share_one_encode():
+    calls = []
+    def encode_many(texts):
+        calls.append(list(texts))
+        return np.array([[len(t)] for t in texts], dtype=np.float32)
+    async def main():
+        batcher = QueryBatcher(encode_many, ThreadPoolExecutor(max_workers=1), window=0.01)
+        return await asyncio.gather(*(batcher.encode("x" * i) for i in range(1, 6)))
+    vectors = asyncio.run(main())
+    assert len(calls) == 1
+    assert [int(v[0]) for v in vectors] == [1, 2, 3, 4, 5]
+
+# Prueba que un error del modelo llegue a todas las consultas del lote.
+def test_encode_error_propagates():
+    def encode_many(texts):
+        raise RuntimeError("modelo caído")
+    async def main():
+        batcher = QueryBatcher(encode_many, ThreadPoolExecutor(max_workers=1))
+        return await asyncio.gather(batcher.encode("a"), batcher.encode("b"), return_exceptions=True)
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
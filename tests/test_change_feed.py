@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+import api.main
+from api.change_feed import ChangeFeed
+from conftest import make_property, make_typology
+from scraper.history import PriceHistoryStore
+
+def _ingest(db_path, stamp, prices):
+    store = PriceHistoryStore(db_path)
+    store.ingest(f"assetplan_properties_{stamp}.json",
+                 [make_property(listing_id, location, [make_typology("1 Dormitorio", price, "40 m² útiles")])
+                  for listing_id, location, price in (("a", "Ñuñoa, Santiago", prices[0]),
+                                                      ("b", "Providencia, Santiago", prices[1]),
+                                                      ("c", "Santiago Centro", prices[2]))])
+    store.close()
+
+# Prueba que el índice filtre por comuna y variación, pagine con cursor y se recargue solo cuando cambia la base.
+def test_change_feed_filters_paginates_and_refreshes(tmp_path):
+    db_path = str(tmp_path / "history.sqlite")
+    _ingest(db_path, "20250101_100000", ["$400.000", "$500.000", "$600.000"])
+    _ingest(db_path, "20250108_100000", ["$440.000", "$505.000", "$540.000"])
+    feed = ChangeFeed(db_path)
+    assert feed.refresh() and not feed.refresh(), "Sin cambios en disco no se vuelve a leer la base"
+
+    assert feed.query(commune="nunoa")["total"] == 1
+    assert [c["id"] for c in feed.query(min_delta=5)["changes"]] == ["id-a", "id-c"]
+    assert feed.query(until="2025-01-07")["total"] == 0
+
+    first = feed.query(limit=2)
+    second = feed.query(limit=2, cursor=first["next_cursor"])
+    assert first["total"] == 3 and second["next_cursor"] is None
+    assert {c["id"] for c in first["changes"] + second["changes"]} == {"id-a", "id-b", "id-c"}
+
+    version = feed.version
+    _ingest(db_path, "20250115_100000", ["$450.000", "$505.000", "$540.000"])
+    assert feed.refresh() and feed.version != version
+    assert feed.query(latest_only=True)["changes"][0]["timestamp"] == "2025-01-15 10:00:00"
+    assert feed.query(listing_id="id-a")["total"] == 2
+
+# Prueba que /changes devuelva ETag y responda 304 cuando el cliente ya tiene esa versión.
+def test_changes_endpoint_conditional_get(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "history.sqlite")
+    _ingest(db_path, "20250101_100000", ["$400.000", "$500.000", "$600.000"])
+    _ingest(db_path, "20250108_100000", ["$440.000", "$505.000", "$540.000"])
+    monkeypatch.setattr(api.main, "change_feed", ChangeFeed(db_path))
+    client = TestClient(api.main.app)
+
+    response = client.get("/changes", params={"commune": "Providencia"})
+    assert response.status_code == 200 and response.json()["total"] == 1
+    etag = response.headers["etag"]
+    cached = client.get("/changes", params={"commune": "Providencia"}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert client.get("/changes", params={"cursor": "???"}).status_code == 400
+
+# Prueba que el ETag de ?days= no cambie con el paso del tiempo y que days=0 no se ignore.
+def test_changes_endpoint_days_etag(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "history.sqlite")
+    _ingest(db_path, "20250101_100000", ["$400.000", "$500.000", "$600.000"])
+    _ingest(db_path, "20250108_100000", ["$440.000", "$505.000", "$540.000"])
+    monkeypatch.setattr(api.main, "change_feed", ChangeFeed(db_path))
+    client = TestClient(api.main.app)
+
+    response = client.get("/changes", params={"days": 36500})
+    assert response.json()["total"] == 3
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(minutes=5)
+    monkeypatch.setattr(api.main, "datetime", Later)
+    cached = client.get("/changes", params={"days": 36500}, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert client.get("/changes", params={"days": 0}).json()["total"] == 0
+    assert client.get("/changes", params={"days": -1}).status_code == 422
+
+# Prueba que dos procesos (o un proceso reiniciado) sobre la misma base den la misma versión y el mismo ETag.
+def test_change_feed_version_is_shared_between_processes(tmp_path):
+    db_path = str(tmp_path / "history.sqlite")
+    _ingest(db_path, "20250101_100000", ["$400.000", "$500.000", "$600.000"])
+    _ingest(db_path, "20250108_100000", ["$440.000", "$505.000", "$540.000"])
+    first = ChangeFeed(db_path)
+    assert first.refresh()
+    _ingest(db_path, "20250115_100000", ["$450.000", "$505.000", "$540.000"])
+    assert first.refresh()
+    second = ChangeFeed(db_path)  # otro worker, o el mismo recién reiniciado: una sola recarga
+    assert second.refresh()
+    assert first.version == second.version != "empty"
+    assert first.etag({"days": 7}) == second.etag({"days": 7})
@@ -0,0 +1,23 @@
+from llm.context import build_context, count_tokens
+
+def _hit(i: int, segments: int) -> dict:
+    return {"id": f"id-{i}", "title": f"Edificio {i}", "location": "Santiago", "url": f"https://x/{i}", "distance": 0.1,
+            "segments": [f"{d} Dormitorios | 1 Baño | 45 m² | $400.000 | Disponibles: 2" for d in range(1, segments + 1)]}
+
+# Prueba que cada edificio aparezca una sola vez con sus tipologías y que el contexto respete el presupuesto.
+def test_context_dedups_and_fits_budget():
+    hits = [_hit(i, 3) for i in range(5)]
+    context, included = build_context(hits, budget=10_000)
+    assert len(included) == 5
+    assert context.count("Edificio 0") == 1 and context.count("https://x/0") == 1
+    assert context.count("\n- ") == 15
+
+    context, included = build_context(hits, budget=100)
+    assert count_tokens(context) <= 100
+    assert 1 <= len(included) < 5
+
+# Prueba que el primer edificio entre aunque el presupuesto sea mínimo.
+def test_context_always_includes_first_building():
+    context, included = build_context([_hit(0, 3), _hit(1, 3)], budget=1)
+    assert [h["id"] for h in included] == ["id-0"]
+    assert context.count("\n- ") == 1
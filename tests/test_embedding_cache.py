@@ -0,0 +1,61 @@
+import multiprocessing
+
+import numpy as np
+from llm.embedding_cache import CachedEmbedder, EmbeddingCache
+
+class FakeModel:
+    """Modelo determinista que cuenta cuántos textos embebe."""
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        self.encoded += len(texts)
+        vectors = np.array([[len(t), t.count("a"), 1.0] for t in texts], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+# Prueba que solo se embeban documentos nuevos y que el cache persista entre instancias (memory-map).
+def test_document_cache_persists(tmp_path):
+    model = FakeModel()
+    embedder = CachedEmbedder(model, "fake-model", str(tmp_path))
+    first = embedder.encode_documents(["casa", "departamento"])
+    assert model.encoded == 2
+
+    reopened = CachedEmbedder(model, "fake-model", str(tmp_path))
+    second = reopened.encode_documents(["departamento", "casa", "estudio"])
+    assert model.encoded == 3, "Solo 'estudio' debe embeberse"
+    assert np.array_equal(second[:2], first[::-1])
+    assert reopened.stats["doc_hits"] == 2 and reopened.stats["doc_misses"] == 1
+
+# Prueba el LRU de consultas: aciertos, desalojo y contadores.
+def test_query_lru(tmp_path):
+    model = FakeModel()
+    embedder = CachedEmbedder(model, "fake-model", str(tmp_path), query_cache_size=2)
+    embedder.encode("2 dormitorios")
+    embedder.encode("2 dormitorios")
+    embedder.encode("providencia")
+    embedder.encode("ñuñoa")
+    embedder.encode("2 dormitorios")
+    assert embedder.stats["query_hits"] == 1
+    assert embedder.stats["query_misses"] == 4
+    assert list(embedder.queries) != [] and len(embedder.queries) == 2
+
+def _put_from_process(cache_dir: str, worker: int):
+    cache = EmbeddingCache(cache_dir, "fake-model")
+    for batch in range(20):
+        keys = [f"{worker}-{batch}-{i}" for i in range(30)]
+        cache.put_many(keys, np.array([[worker, batch, i] for i in range(30)], dtype=np.float32))
+
+# Prueba que varios procesos escribiendo el mismo cache no se pisen filas ni archivos.
+def test_document_cache_shared_between_processes(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_put_from_process, args=(str(tmp_path), w)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    cache = EmbeddingCache(str(tmp_path), "fake-model")
+    assert len(cache) == 4 * 20 * 30
+    for key, row in cache.rows.items():
+        assert list(cache.vectors[row]) == [float(x) for x in key.split("-")], f"{key} apunta al vector de otra clave"
@@ -0,0 +1,27 @@
+from playwright.sync_api import sync_playwright
+from scraper.extract import extract_cards, extract_detail
+from tests.fixture_site import serve_fixture_site
+
+# Prueba que un solo page.evaluate extraiga las tarjetas del listado y la ficha completa de detalle.
+def test_single_evaluate_extraction():
+    with serve_fixture_site() as base_url, sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        page.goto(f"{base_url}/arriendo/departamento?page=1", wait_until="domcontentloaded")
+        cards = extract_cards(page)
+        page.goto(f"{base_url}/arriendo/departamento/edificio-santa-isabel", wait_until="domcontentloaded")
+        detail = extract_detail(page)
+        browser.close()
+    assert [c["title"] for c in cards] == ["Edificio Plaza Ñuñoa", "Edificio Santa Isabel", "Edificio Los Leones"]
+    assert cards[1]["href"] == "/arriendo/departamento/edificio-santa-isabel"
+    assert detail["title"] == "Edificio Santa Isabel"
+    assert detail["location"] == "Santiago, Región Metropolitana"
+    assert len(detail["images"]) == 2
+    assert detail["typologies"][1] == {
+        "bedrooms": "2 Dormitorios",
+        "bathrooms": "2 Baños",
+        "size_range": "50 - 58 m² útiles",
+        "price_range": "$460.000 - $495.000",
+        "available": "2",
+        "promotions": ["Sin garantía"],
+    }
@@ -0,0 +1,25 @@
+from conftest import make_property, make_typology
+from scraper.history import PriceHistoryStore
+
+def _listing(typologies):
+    return make_property(1, "Ñuñoa", typologies, title="Edificio Plaza Ñuñoa")
+
+def _typ(bedrooms, price):
+    return make_typology(bedrooms, price, "40 m² útiles")
+
+# Prueba que reordenar tipologías no genere cambios falsos y que las variaciones se consulten por listing y fecha.
+def test_history_matches_typologies_by_key(tmp_path):
+    store = PriceHistoryStore(str(tmp_path / "history.sqlite"))
+    store.ingest("assetplan_properties_20250101_100000.json",
+                 [_listing([_typ("1 Dormitorio", "$400.000"), _typ("2 Dormitorios", "$500.000")])])
+    changed = store.ingest("assetplan_properties_20250108_100000.json",
+                           [_listing([_typ("2 Dormitorios", "$550.000"), _typ("1 Dormitorio", "$400.000")])])
+    assert changed == 1, "Solo cambió el precio de la tipología de 2 dormitorios"
+    assert store.ingest("assetplan_properties_20250108_100000.json", []) == 0, "Re-ingerir un snapshot no hace nada"
+
+    change = store.changes_for_listing("id-1")[0]
+    assert change["typology_key"] == "2 dormitorios|1 baño|40 m² útiles"
+    assert (change["old_price"], change["new_price"], change["delta_pct"]) == ("$500.000", "$550.000", 10.0)
+    assert change["timestamp"] == "2025-01-08 10:00:00"
+    assert store.latest_changes() == [change]
+    assert store.changes(since="2025-01-09 00:00:00") == []
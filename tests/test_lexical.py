@@ -0,0 +1,47 @@
+from llm.lexical import BM25Index, HybridRetriever, tokenize
+
+DOCS = {
+    "a#1": ("Title: Edificio Plaza Ñuñoa\nLocation: Ñuñoa\n2 Dormitorios | 1 Baño | $520.000", {"commune_key": "nunoa", "bedrooms_min": 2}),
+    "b#1": ("Title: Edificio Santa Isabel\nLocation: Santiago\n1 Dormitorio | 1 Baño | $350.000", {"commune_key": "santiago", "bedrooms_min": 1}),
+    "c#1": ("Title: Edificio Los Leones\nLocation: Providencia\n3 Dormitorios | 2 Baños | $890.000", {"commune_key": "providencia", "bedrooms_min": 3}),
+}
+
+def _index() -> BM25Index:
+    index = BM25Index()
+    index.upsert(list(DOCS), [d for d, _ in DOCS.values()], [m for _, m in DOCS.values()])
+    return index
+
+# Prueba que la normalización ignore tildes, mayúsculas, stopwords y plurales.
+def test_tokenize_normalizes_spanish():
+    assert tokenize("Edificio Plaza Ñuñoa") == ["edificio", "plaza", "nunoa"]
+    assert tokenize("2 dormitorios en Los Leones") == tokenize("2 Dormitorio Leon")
+
+# Prueba que BM25 encuentre un edificio por nombre y respete los filtros where.
+def test_bm25_search_and_where():
+    index = _index()
+    assert index.search("edificio plaza nunoa", k=1)[0][0] == "a#1"
+    assert index.search("los leones", k=1)[0][0] == "c#1"
+    assert index.search("edificio", k=3, where={"commune_key": {"$eq": "santiago"}})[0][0] == "b#1"
+    assert all(d != "b#1" for d, _ in index.search("edificio", k=3, where={"bedrooms_min": {"$gte": 2}}))
+
+# Prueba las actualizaciones incrementales: reemplazar y borrar documentos.
+def test_bm25_incremental_updates():
+    index = _index()
+    index.upsert(["b#1"], ["Title: Edificio Parque Forestal\nLocation: Santiago"], [{"commune_key": "santiago"}])
+    assert index.search("santa isabel") == []
+    assert index.search("parque forestal", k=1)[0][0] == "b#1"
+    index.delete(["b#1", "no-existe"])
+    assert "b#1" not in index and len(index) == 2
+    assert index.search("parque forestal") == []
+
+class _FakeVectorStore:
+    def query(self, query_embedding, n_results=5, where=None):
+        return ["doc b", "doc c"], [{"id": "b#1"}, {"id": "c#1"}], [0.2, 0.3], ["b#1", "c#1"]
+
+# Prueba que RRF sume un hit que solo encontró BM25 y conserve la distancia de los hits vectoriales.
+def test_hybrid_rrf_fusion():
+    retriever = HybridRetriever(_FakeVectorStore(), _index())
+    docs, metas, distances, ids = retriever.query("edificio plaza nunoa", [0.0], n_results=3)
+    assert set(ids) == {"a#1", "b#1", "c#1"}
+    assert distances[ids.index("a#1")] is None
+    assert distances[ids.index("b#1")] == 0.2
@@ -0,0 +1,35 @@
+from conftest import make_property, make_typology
+from llm.market import MarketTable
+
+def _prop(prop_id, location, typologies):
+    return make_property(prop_id, location, [make_typology(bedrooms=b, price=price, size=size) for b, size, price in typologies])
+
+PROPERTIES = [
+    _prop("a", "Ñuñoa, Región Metropolitana", [("1 Dormitorio", "40 m²", "$400.000"),
+                                               ("2 Dormitorios", "50 - 60 m²", "$500.000 - $600.000")]),
+    _prop("b", "Ñuñoa", [("1 Dormitorio", "50 m²", "$450.000")]),
+    _prop("c", "Santiago", [("Estudio", "25 m²", "UF 10"), ("1 Dormitorio", "", "$300.000")]),
+]
+
+# Prueba que la tabla aplane tipologías, convierta UF a CLP y calcule la mediana de precio por m² por grupo.
+def test_market_price_per_m2_by_commune_and_bedrooms():
+    market = MarketTable.from_properties(PROPERTIES, uf_clp=40000)
+    assert len(market) == 5
+    studio = market.frame[market.frame["bedrooms"] == 0].iloc[0]
+    assert (studio["price_clp"], studio["price_m2_clp"]) == (400000, 16000)
+
+    groups = market.price_per_m2(["commune", "bedrooms"])
+    assert groups[0] == {"commune": "Ñuñoa", "bedrooms": 1, "count": 2, "median": 9500.0, "p25": 9250.0, "p75": 9750.0}
+    assert {"commune": "Santiago", "bedrooms": 1} not in [{k: g[k] for k in ("commune", "bedrooms")} for g in groups], \
+        "Sin superficie no hay precio por m²"
+    assert market.price_per_m2(["commune"], commune="nunoa", bedrooms=2)[0]["median"] == 10000.0
+
+# Prueba que la distribución de precios respete los filtros y devuelva histograma y percentiles.
+def test_market_price_distribution():
+    market = MarketTable.from_properties(PROPERTIES, uf_clp=40000)
+    dist = market.price_distribution(commune="Ñuñoa", bins=2)
+    assert dist["count"] == 3 and dist["min"] == 400000 and dist["max"] == 550000
+    assert sum(b["count"] for b in dist["histogram"]) == 3
+    assert dist["percentiles"]["p50"] == 450000
+    assert market.price_distribution(commune="Vitacura") is None
+    assert MarketTable.from_properties([]).price_distribution() is None
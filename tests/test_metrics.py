@@ -0,0 +1,66 @@
+import multiprocessing
+
+from monitoring.metrics import Registry, Counter
+from scraper.scrape import load_page, merge_page_metrics, PAGE_RETRIES, PAGE_SECONDS
+
+# Prueba que el registro exponga counters, histogramas acumulados y collectors en formato de Prometheus.
+def test_registry_renders_prometheus_text(tmp_path):
+    registry = Registry()
+    requests = registry.counter("demo_requests_total", "Peticiones", ["path"])
+    latency = registry.histogram("demo_seconds", "Latencia", ["stage"], buckets=(0.1, 1))
+    requests.inc(path="/ask")
+    requests.inc(2, path="/ask")
+    for value in (0.05, 0.5, 3):
+        latency.observe(value, stage="llm")
+
+    def collector():
+        size = Counter("demo_size_total", "Tamaño")
+        size.inc(7)
+        return [size]
+    registry.add_collector(collector)
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{path="/ask"} 3' in text
+    assert 'demo_seconds_bucket{stage="llm",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="llm",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="llm",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="llm"} 3' in text
+    assert "demo_size_total 7" in text
+    assert registry.counter("demo_requests_total", "Peticiones", ["path"]) is requests, "Registrar dos veces devuelve la misma métrica"
+
+    registry.write_textfile(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text(encoding="utf-8") == text
+
+class FlakyPage:
+    def __init__(self, failures):
+        self.failures = failures
+
+    def goto(self, url, timeout, wait_until):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("timeout")
+
+# Prueba que la carga de páginas del scraper cuente reintentos y registre su duración.
+def test_scraper_load_page_counts_retries():
+    retries, loads = PAGE_RETRIES.value(kind="detail"), PAGE_SECONDS.count(kind="detail", phase="load")
+    assert load_page(FlakyPage(1), "http://x/1", "detail", timeout=1000, wait_until="domcontentloaded")
+    assert not load_page(FlakyPage(2), "http://x/2", "detail", timeout=1000, wait_until="domcontentloaded")
+    assert PAGE_RETRIES.value(kind="detail") == retries + 2
+    assert PAGE_SECONDS.count(kind="detail", phase="load") == loads + 2
+
+def _worker_page_metrics(metrics):
+    load_page(FlakyPage(1), "http://x/3", "list", timeout=1000, wait_until="networkidle")
+    metrics.put({metric.name: metric.values for metric in (PAGE_SECONDS, PAGE_RETRIES)})
+
+# Prueba que las métricas de página de un worker del modo distribuido se sumen a las del coordinador.
+def test_worker_page_metrics_are_merged():
+    retries, loads = PAGE_RETRIES.value(kind="list"), PAGE_SECONDS.count(kind="list", phase="load")
+    ctx = multiprocessing.get_context("spawn")
+    metrics = ctx.Queue()
+    proc = ctx.Process(target=_worker_page_metrics, args=(metrics,))
+    proc.start()
+    proc.join()
+    assert merge_page_metrics(metrics, workers=2) == 1, "Un worker sin métricas no debe bloquear la unión"
+    assert PAGE_RETRIES.value(kind="list") == retries + 1
+    assert PAGE_SECONDS.count(kind="list", phase="load") == loads + 1
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+
+from vectorStorage.chromadb import ChromaDBStore
+from vectorStorage.numpy_store import NumpyVectorStore
+
+def _corpus(n=40, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(n)]
+    metas = [{"id": ids[i], "bedrooms_min": i % 3, "commune_key": "nunoa" if i % 2 else "santiago"} for i in range(n)]
+    return vectors, ids, [f"documento {i}" for i in range(n)], metas
+
+# Prueba que el índice NumPy devuelva el mismo top-k y las mismas distancias coseno que Chroma, con y sin filtro.
+def test_numpy_store_matches_chroma(tmp_path):
+    vectors, ids, docs, metas = _corpus()
+    chroma = ChromaDBStore("test", db_path=str(tmp_path / "chroma"))
+    store = NumpyVectorStore("test", db_path=str(tmp_path / "numpy"))
+    for s in (chroma, store):
+        s.upsert(docs, vectors.tolist(), metas, ids)
+    queries = np.random.default_rng(1).normal(size=(5, 16)).astype(np.float32)
+    where = {"$and": [{"commune_key": {"$eq": "nunoa"}}, {"bedrooms_min": {"$lte": 1}}]}
+    for query in queries:
+        for filt in (None, where):
+            expected = chroma.query(query.tolist(), n_results=5, where=filt)
+            got = store.query(query.tolist(), n_results=5, where=filt)
+            assert got[3] == expected[3]
+            assert np.allclose(got[2], expected[2], atol=1e-4)
+    batch = store.query_many(queries.tolist(), n_results=3, where=where)
+    assert [r[3] for r in batch] == [store.query(q.tolist(), n_results=3, where=where)[3] for q in queries]
+    assert store.query(queries[0].tolist(), where={"commune_key": {"$eq": "vitacura"}}) == ([], [], [], [])
+
+# Prueba que upsert, delete y la recarga desde disco mantengan ids, metadata y vectores consistentes.
+def test_numpy_store_persists_updates_and_deletes(tmp_path):
+    vectors, ids, docs, metas = _corpus(n=10)
+    store = NumpyVectorStore("test", db_path=str(tmp_path))
+    store.upsert(docs, vectors, metas, ids)
+    store.upsert(["nuevo"], [vectors[0] * -1], [{"id": "doc-3", "doc_hash": "h"}], ["doc-3"])
+    store.delete(["doc-5", "no-existe"])
+    assert not os.path.exists(store.vectors_file), "Las escrituras quedan en memoria hasta flush()"
+    assert store.count() == 9 and store.query(vectors[0], n_results=1)[3] == ["doc-0"]
+    store.flush()
+
+    reloaded = NumpyVectorStore("test", db_path=str(tmp_path))
+    assert reloaded.count() == 9 and "doc-5" not in reloaded.get_hashes()
+    assert reloaded.get_hashes()["doc-3"] == "h"
+    docs_found, _, distances, found = reloaded.query(vectors[0], n_results=9)
+    assert found[0] == "doc-0" and found[-1] == "doc-3" and docs_found[-1] == "nuevo"
+    assert abs(distances[-1] - 2.0) < 1e-5, "El vector opuesto está a distancia coseno 2"
+
+# Prueba que la versión cuantizada a int8 conserve casi todo el recall del top-10 exacto.
+def test_numpy_store_int8_recall(tmp_path):
+    vectors, ids, docs, metas = _corpus(n=500, dim=64)
+    exact = NumpyVectorStore("test", db_path=str(tmp_path), quantize=False)
+    quantized = NumpyVectorStore("test", db_path=str(tmp_path), quantize=True)
+    for s in (exact, quantized):
+        s.upsert(docs, vectors, metas, ids)
+    queries = np.random.default_rng(2).normal(size=(20, 64)).astype(np.float32)
+    recall = np.mean([len(set(a[3]) & set(b[3])) / 10 for a, b in
+                      zip(exact.query_many(queries, n_results=10), quantized.query_many(queries, n_results=10))])
+    assert recall >= 0.9
+    assert quantized.vectors.dtype == np.int8
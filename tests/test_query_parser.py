@@ -0,0 +1,42 @@
+from llm.query_parser import QueryParser, numeric_metadata
+
+PARSER = QueryParser()
+
+# Prueba que se extraigan dormitorios, precio máximo y comuna de una consulta en español y su equivalente en inglés.
+def test_parse_bedrooms_price_and_commune():
+    expected = {"bedrooms": 2, "price_max": 500000.0, "currency": "CLP", "commune_key": "santiago"}
+    assert PARSER.parse("¿Qué departamentos de 2 dormitorios hay en Santiago bajo $500.000?") == expected
+    assert PARSER.parse("What 2-bedroom apartments are available in Santiago under $500.000?") == expected
+    assert PARSER.parse("departamentos con promoción primer mes gratis") == {}
+
+# Prueba precios en UF, rangos, montos en 'mil' y comunas con tilde.
+def test_parse_price_variants():
+    assert PARSER.parse("estudio en Ñuñoa entre 15 y 20 UF") == {
+        "bedrooms": 0, "price_min": 15.0, "price_max": 20.0, "currency": "UF", "commune_key": "nunoa"}
+    assert PARSER.parse("2d2b en Las Condes desde 600 mil") == {
+        "bedrooms": 2, "bathrooms": 2, "price_min": 600000.0, "currency": "CLP", "commune_key": "las condes"}
+    assert PARSER.parse("Providencia bajo 3 000 UF")["price_max"] == 3000.0
+
+# Prueba que el multiplicador de un extremo del rango aplique al otro y los decimales antes de 'millones'.
+def test_parse_shared_multiplier_and_decimal_millions():
+    assert PARSER.parse("2 dormitorios entre 400 y 500 mil") == {
+        "bedrooms": 2, "price_min": 400000.0, "price_max": 500000.0, "currency": "CLP"}
+    assert PARSER.parse("entre 400000 y 1 millón") == {"price_min": 400000.0, "price_max": 1e6, "currency": "CLP"}
+    assert PARSER.parse("bajo 1.2 millones") == {"price_max": 1.2e6, "currency": "CLP"}
+    assert PARSER.parse("bajo $1.200.000") == {"price_max": 1.2e6, "currency": "CLP"}
+
+# Prueba que la metadata indexada y el filtro where usen los mismos campos.
+def test_numeric_metadata_and_where():
+    meta = numeric_metadata([
+        {"bedrooms": "2 Dormitorios", "bathrooms": "1 Baño", "size_range": "48 - 55 m² útiles", "price_range": "$520.000 - $580.000"},
+        {"bedrooms": "1 Dormitorio", "bathrooms": "1 Baño", "size_range": "32 - 36 m² útiles", "price_range": "$390.000 - $420.000"},
+    ], "Ñuñoa, Región Metropolitana", uf_clp=40000)
+    assert meta["bedrooms_min"] == 1 and meta["bedrooms_max"] == 2
+    assert (meta["area_min"], meta["area_max"]) == (32.0, 55.0)
+    assert (meta["price_clp_min"], meta["price_uf_max"]) == (390000.0, 14.5)
+    assert meta["commune_key"] == "nunoa"
+
+    where = QueryParser.to_where(PARSER.parse("2 dormitorios en Ñuñoa bajo $400.000"))
+    assert where == {"$and": [{"bedrooms_min": {"$lte": 2}}, {"bedrooms_max": {"$gte": 2}},
+                              {"price_clp_min": {"$lte": 400000.0}}, {"commune_key": {"$eq": "nunoa"}}]}
+    assert QueryParser.to_where({}) is None
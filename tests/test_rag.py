@@ -1,4 +1,12 @@
+import os
 import json
+import time
+import asyncio
+import threading
+import pytest
+from api.startup import IndexRefresher
+from conftest import make_property, make_typology
+from llm import rag_agent
 from llm.rag_agent import RAGAgent
 from scraper.scrape import scrape_assetplan
 
@@ -10,4 +18,149 @@ def test_vector_store_insertion(tmp_path):
         json.dump([l.model_dump() for l in listings], f)
     agent = RAGAgent(db_path=str(tmp_path), json_file=json_file)
     agent.load_properties()
-    assert agent.vector_store.count() > 0, "No se insertaron documentos en ChromaDB"
\ No newline at end of file
+    assert agent.vector_store.count() > 0, "No se insertaron documentos en ChromaDB"
+
+# Prueba que el sync incremental solo re-indexe lo que cambió y elimine lo que ya no está en el snapshot.
+def test_incremental_sync(tmp_path):
+    json_file = str(tmp_path / "props.json")
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump([make_property(i) for i in range(3)], f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=json_file)
+    assert agent.sync_properties()["added"] == 3
+    assert agent.sync_properties()["unchanged"] == 3, "Un segundo sync sin cambios no debe re-indexar"
+
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump([make_property(0), make_property(1, typologies=[make_typology(price="$450.000")]), make_property(3)], f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=json_file)
+    report = agent.sync_properties()
+    assert (report["added"], report["updated"], report["deleted"], report["unchanged"]) == (1, 1, 1, 1)
+    assert agent.vector_store.count() == 3
+
+# Prueba que cada tipología sea un chunk con el id del edificio y que los hits se agrupen de vuelta por edificio.
+def test_typology_chunks_group_by_building():
+    prop = make_property(0)
+    prop["typologies"].append({"bedrooms": "1 Dormitorio", "bathrooms": "1 Baño", "size_range": "30 m² útiles",
+                               "price_range": "$320.000", "available": "1", "promotions": []})
+    chunks = RAGAgent._create_chunks(prop)
+    assert [c["id"] for c in chunks] == ["id-0#2 dormitorios|1 baño|45 m² útiles", "id-0#1 dormitorio|1 baño|30 m² útiles"]
+    assert all(c["document"].startswith("Title: Edificio 0") for c in chunks)
+
+    metas = [{"parent_id": "id-0", "title": "Edificio 0", "location": "Santiago", "url": "u0", "segment": "a"},
+             {"parent_id": "id-1", "title": "Edificio 1", "location": "Santiago", "url": "u1", "segment": "b"},
+             {"parent_id": "id-0", "title": "Edificio 0", "location": "Santiago", "url": "u0", "segment": "c"}]
+    hits = RAGAgent._group_hits(["", "", ""], metas, [0.1, 0.2, 0.3], ["x", "y", "z"])
+    assert [(h["id"], h["segments"], h["distance"]) for h in hits] == [("id-0", ["a", "c"], 0.1), ("id-1", ["b"], 0.2)]
+
+# Prueba que la recuperación en lote devuelva lo mismo que consultar una por una, con y sin filtros.
+def test_search_many_matches_single_queries(tmp_path):
+    json_file = str(tmp_path / "props.json")
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump([make_property(i, typologies=[make_typology(price=f"${400 + 50 * i}.000")]) for i in range(4)], f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=json_file)
+    agent.sync_properties()
+    queries = ["departamento en Santiago", "2 dormitorios bajo $460.000", "Edificio 3", "estudio en Vitacura"]
+    embs = [agent.embedder.encode_query(q).tolist() for q in queries]
+    assert agent._search_many(queries, embs, 2) == [agent._search(q, e, 2) for q, e in zip(queries, embs)]
+
+# Prueba que un snapshot nuevo se indexe en otra colección, se active de forma atómica y que la anterior
+# se borre recién cuando terminan las consultas que la estaban usando.
+def test_refresh_index_hot_swap(tmp_path):
+    old_file, new_file = str(tmp_path / "props_1.json"), str(tmp_path / "props_2.json")
+    with open(old_file, 'w', encoding='utf-8') as f:
+        json.dump([make_property(i) for i in range(3)], f)
+    with open(new_file, 'w', encoding='utf-8') as f:
+        json.dump([make_property(0), make_property(1, typologies=[make_typology(price="$450.000")]), make_property(3)], f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=old_file)
+    agent.sync_properties()
+    old_version = agent.index_version
+
+    with agent._lease() as pinned:  # una consulta en curso sobre el snapshot anterior
+        generation, report = agent.build_index(new_file)
+        assert agent.index is pinned, "Construir la generación nueva no cambia la activa"
+        assert (report["added"], report["deleted"]) == (3, 0), "La colección nueva parte vacía"
+        previous = agent.swap_index(generation)
+        assert agent.json_file == new_file and agent.index_version not in ("", old_version)
+        retire = threading.Thread(target=agent.retire_index, args=(previous,))
+        retire.start()
+        retire.join(0.2)
+        assert retire.is_alive(), "No se borra la colección mientras hay consultas sobre ella"
+        assert pinned.vector_store.count() == 3
+    retire.join(5)
+    assert not retire.is_alive()
+    collections = [c.name for c in agent.vector_store.client.list_collections()]
+    assert collections == ["property_listings_v1"]
+
+    emb = agent.embedder.encode_query("Edificio 3").tolist()
+    assert "id-3" in [hit["id"] for hit in agent._search("Edificio 3", emb, 3)]
+    reopened = RAGAgent(db_path=str(tmp_path / "db"), json_file=new_file)
+    assert reopened.index.collection == "property_listings_v1", "Al reiniciar se abre la generación activa"
+    assert reopened.sync_properties()["unchanged"] == 3
+    report = agent.refresh_index(new_file)
+    assert report["added"] == 0 and agent.index.collection == "property_listings_v1", "Mismo contenido: no se re-indexa"
+
+# Prueba que un snapshot vacío o que pierde la mayoría de las propiedades no reemplace al índice activo.
+def test_refresh_index_rejects_empty_snapshot(tmp_path):
+    json_file, empty_file, shrunk_file = (str(tmp_path / name) for name in ("props_1.json", "props_2.json", "props_3.json"))
+    for path, props in ((json_file, [make_property(i) for i in range(4)]), (empty_file, []), (shrunk_file, [make_property(0)])):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(props, f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=json_file)
+    agent.sync_properties()
+    version = agent.index_version
+
+    refresher = IndexRefresher(lambda: agent.refresh_index(empty_file), interval=0)
+    assert refresher.run_once() is None
+    assert "0 propiedades" in refresher.status()["error"]
+    for path in (shrunk_file, str(tmp_path / "missing.json")):
+        with pytest.raises(ValueError):
+            agent.refresh_index(path)
+    assert (agent.json_file, agent.index_version, agent.vector_store.count()) == (json_file, version, 4)
+    emb = agent.embedder.encode_query("Edificio 2").tolist()
+    assert agent._search("Edificio 2", emb, 2), "Se sigue respondiendo con el índice anterior"
+
+# Prueba que en /ask/batch cada consulta se mida por su propio trabajo y no desde que empezó el lote.
+def test_batch_request_seconds_per_query(tmp_path, monkeypatch):
+    json_file = str(tmp_path / "props.json")
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump([make_property(i) for i in range(4)], f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=json_file, service_socket="")
+    agent.sync_properties()
+    agent._detect_language("calentamiento")
+
+    class SlowLLM:
+        async def ainvoke(self, prompt):
+            await asyncio.sleep(0.1)
+            return type("Message", (), {"content": "ok"})()
+    agent._llm = SlowLLM()
+    samples = []
+    monkeypatch.setattr(rag_agent, "ASK_BATCH_WINDOW", 2)
+    monkeypatch.setattr(rag_agent.REQUEST_SECONDS, "observe", lambda value, **labels: samples.append(value))
+    results = agent.search_and_generate_many([f"Edificio {i} consulta {i}" for i in range(8)], 2, concurrency=1)
+    assert all("answer" in r for r in results) and len(samples) == 8
+    assert max(samples) < 0.5, "Las consultas del final del lote no deben sumar la espera de las anteriores"
+
+# Prueba que un snapshot rechazado no se vuelva a cargar en cada vuelta del refresher hasta que cambie en disco.
+def test_rejected_snapshot_is_skipped_until_it_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    old_file = "data/assetplan_properties_20250101_100000.json"
+    new_file = "data/assetplan_properties_20250108_100000.json"
+    for path, props in ((old_file, [make_property(i) for i in range(3)]), (new_file, [])):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(props, f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=old_file)
+    agent.sync_properties()
+    loads = []
+    load = agent._load_json_properties
+    monkeypatch.setattr(agent, "_load_json_properties", lambda path: loads.append(path) or load(path))
+
+    refresher = IndexRefresher(agent.refresh_if_newer, interval=0)
+    for _ in range(3):
+        assert refresher.run_once() is None
+    assert loads == [new_file] and "0 propiedades" in refresher.status()["error"]
+
+    with open(new_file, 'w', encoding='utf-8') as f:
+        json.dump([make_property(i) for i in range(4)], f)
+    os.utime(new_file, (time.time() + 5, time.time() + 5))
+    assert refresher.run_once()["snapshot"] == os.path.basename(new_file)
+    assert refresher.status()["error"] is None and agent.json_file == new_file
@@ -0,0 +1,36 @@
+import asyncio
+from scraper.scrape import scrape_assetplan, scrape_assetplan_async
+from tests.fixture_site import serve_fixture_site
+
+def _comparable(listings):
+    return {l.id: l.model_dump(exclude={"timestamp"}) for l in listings}
+
+# Prueba que el modo asíncrono produzca los mismos listings que el modo secuencial sobre el sitio de fixtures.
+def test_async_scraper_matches_sync():
+    with serve_fixture_site() as base_url:
+        sync_listings = scrape_assetplan(min_props=6, max_pages=3, base_url=base_url)
+        async_listings = asyncio.run(scrape_assetplan_async(min_props=6, max_pages=3, concurrency=4, rate=50, base_url=base_url))
+    assert len(async_listings) == 6, f"Se esperaban 6 propiedades, se obtuvieron {len(async_listings)}"
+    assert _comparable(async_listings) == _comparable(sync_listings), "El modo asíncrono debe producir los mismos listings"
+    assert all(l.typologies for l in async_listings), "Cada listing debe tener tipologías"
+
+# Prueba que el modo asíncrono respete el mínimo de propiedades aunque la página tenga más tarjetas.
+def test_async_scraper_stops_at_min_props():
+    with serve_fixture_site() as base_url:
+        listings = asyncio.run(scrape_assetplan_async(min_props=2, max_pages=3, concurrency=2, base_url=base_url))
+    assert [l.url for l in listings] == [f"{base_url}/arriendo/departamento/edificio-plaza-nunoa",
+                                         f"{base_url}/arriendo/departamento/edificio-santa-isabel"]
+
+# Prueba que el modo incremental solo visite las fichas cuya tarjeta cambió desde el snapshot anterior.
+def test_incremental_scrape_skips_unchanged_cards():
+    hits = []
+    with serve_fixture_site(hits=hits) as base_url:
+        first = scrape_assetplan(min_props=3, max_pages=1, base_url=base_url)
+        previous = {l.id: l.model_dump() for l in first}
+        changed = first[1]
+        previous[changed.id]["fingerprint"] = "huella-antigua"
+        hits.clear()
+        second = asyncio.run(scrape_assetplan_async(min_props=3, max_pages=1, concurrency=2, base_url=base_url, previous=previous))
+    detail_hits = [h for h in hits if h.startswith("/arriendo/departamento/")]
+    assert detail_hits == ["/arriendo/departamento/edificio-santa-isabel"], f"Solo debe visitarse la ficha modificada: {detail_hits}"
+    assert _comparable(second) == _comparable(first), "Los listings reutilizados deben conservar sus datos"
@@ -0,0 +1,66 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from api.sidecar import RetrievalService
+from conftest import make_property, make_typology
+from llm.rag_agent import RAGAgent
+
+def _property(i: int) -> dict:
+    # Comunas, dormitorios y precios distintos, para que las consultas usen filtros diferentes
+    return make_property(i, location="Santiago, Región Metropolitana" if i % 2 else "Ñuñoa, Región Metropolitana",
+                         typologies=[make_typology(bedrooms=f"{1 + i % 3} Dormitorios", price=f"${400 + 30 * i}.000")])
+
+# Prueba que un agente en modo cliente obtenga del servicio los mismos embeddings y edificios que el agente
+# en proceso, y que las consultas simultáneas de varios hilos se recuperen en lotes compartidos.
+def test_client_mode_matches_in_process_agent(tmp_path):
+    json_file = str(tmp_path / "props.json")
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump([_property(i) for i in range(6)], f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=json_file, service_socket="")
+    agent.sync_properties()
+    path = str(tmp_path / "rag.sock")
+    service = RetrievalService(agent, window=0.02)
+    threading.Thread(target=asyncio.run, args=(service.serve(path),), daemon=True).start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+
+    client = RAGAgent(service_socket=path)
+    assert client.index_version == agent.index_version and client.json_file == os.path.abspath(json_file)
+    assert client.market.price_distribution() == agent.market.price_distribution()
+    queries = ["departamento en Santiago", "2 dormitorios en Ñuñoa", "Edificio 3", "bajo $500.000"] * 4
+    embs = [client.embedder.encode_query(q).tolist() for q in queries]
+    assert np.allclose(embs, [agent.embedder.encode_query(q) for q in queries], atol=1e-6)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        remote = list(pool.map(lambda qe: client._search(qe[0], qe[1], 2), zip(queries, embs)))
+    assert remote == [agent._search(q, e, 2) for q, e in zip(queries, embs)]
+    assert service.searcher.batches < len(queries), "Las consultas simultáneas deben compartir lotes"
+
+# Prueba que, tras un cambio de snapshot en el servicio, la respuesta se cachee y reporte con la versión que
+# respondió la búsqueda y no con la generación local que el cliente todavía no reemplaza.
+def test_client_mode_uses_service_version(tmp_path):
+    old_file, new_file = str(tmp_path / "props_1.json"), str(tmp_path / "props_2.json")
+    for path, price in ((old_file, 0), (new_file, 1)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([dict(_property(i), title=f"Edificio {i + price}") for i in range(4)], f)
+    agent = RAGAgent(db_path=str(tmp_path / "db"), json_file=old_file, service_socket="")
+    agent.sync_properties()
+    path = str(tmp_path / "rag.sock")
+    threading.Thread(target=asyncio.run, args=(RetrievalService(agent).serve(path),), daemon=True).start()
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    client = RAGAgent(service_socket=path)
+    client._llm = type("LLM", (), {"invoke": lambda self, prompt: type("Message", (), {"content": "ok"})()})()
+    old_version = client.index_version
+
+    agent.refresh_index(new_file)
+    with client._lease() as index:
+        assert index.version == old_version
+        result = client._search_and_generate(index, "Edificio 2", 2)
+    assert result["index_version"] == agent.index_version != old_version
+    assert client.answer_cache.get_exact("Edificio 2", 2, agent.index_version) == result
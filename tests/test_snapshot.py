@@ -0,0 +1,32 @@
+import json
+import os
+from glob import glob
+from conftest import make_property
+from scraper.snapshot import SnapshotWriter
+
+def _listing(i: int) -> dict:
+    return make_property(i, typologies=[], fingerprint="", timestamp="2025-01-01 00:00:00")
+
+# Prueba que tras una caída se recuperen los listings completos, se descarte la línea truncada y se retome la página.
+def test_resume_after_crash(tmp_path):
+    base = str(tmp_path / "assetplan_properties")
+    checkpoint = str(tmp_path / "scrape_checkpoint.json")
+    writer = SnapshotWriter(base, ts="20250101_000000", checkpoint_file=checkpoint, params={"min": 5})
+    writer.append(_listing(1), page=1)
+    writer.append(_listing(2), page=2)
+    writer._fh.write('{"id": "id-3", "tit')  # el proceso muere a mitad de una línea
+    writer._fh.close()
+
+    resumed, done = SnapshotWriter.resume(checkpoint)
+    assert [l["id"] for l in done] == ["id-1", "id-2"]
+    assert resumed.page == 2
+    assert resumed.ids == {"id-1", "id-2"}
+    assert resumed.params == {"min": 5}
+
+    resumed.append(_listing(3), page=2)
+    out_file = resumed.finalize()
+    with open(out_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    assert [l["id"] for l in data] == ["id-1", "id-2", "id-3"]
+    assert glob(str(tmp_path / "assetplan_properties_*.json")) == [out_file], "Solo el snapshot final debe ser visible"
+    assert not os.path.exists(checkpoint), "El checkpoint se elimina al finalizar"
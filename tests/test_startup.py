@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+
+import httpx
+
+from api.startup import Warmup
+
+# Tiempo máximo aceptable entre lanzar el proceso y que /health responda (el modelo se carga después)
+LISTEN_BUDGET_SECONDS = float(os.getenv("LISTEN_BUDGET_SECONDS", "5"))
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# Prueba que uvicorn escuche y /health responda sin esperar la carga del modelo ni del índice.
+def test_import_to_listening_time():
+    port = _free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        listening = None
+        while time.perf_counter() - start < 60 and proc.poll() is None:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    listening = time.perf_counter() - start
+                    break
+            except httpx.TransportError:
+                time.sleep(0.05)
+        assert listening is not None, "La API no empezó a escuchar"
+        print(f"import-to-listening: {listening:.2f}s")
+        assert listening < LISTEN_BUDGET_SECONDS
+        ready = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=5)
+        assert ready.status_code in (200, 503)
+        assert "timings" in ready.json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+# Prueba que la carga registre el tiempo de cada fase y que un fallo se reintente solo, en segundo plano.
+def test_warmup_phases_and_retry():
+    attempts = []
+    def build(phase):
+        attempts.append(1)
+        with phase("imports"):
+            pass
+        if len(attempts) == 1:
+            raise RuntimeError("snapshot no encontrado")
+        with phase("model"):
+            time.sleep(0.01)
+        return "agente"
+    warmup = Warmup(build, retry_interval=0.3)
+    assert warmup.status()["status"] == "pending"
+    try:
+        warmup.start().result(timeout=5)
+    except RuntimeError:
+        pass
+    assert warmup.status()["status"] == "failed" and "snapshot" in warmup.status()["error"]
+    for _ in range(3):
+        assert warmup.start().exception() is not None, "Durante la espera start() no lanza otra carga"
+    assert len(attempts) == 1
+    deadline = time.time() + 5
+    while not warmup.ready and time.time() < deadline:
+        time.sleep(0.02)
+    assert warmup.start().result(timeout=5) == "agente"
+    assert len(attempts) == 2 and warmup.status()["attempts"] == 2 and warmup.status()["error"] is None
+    assert warmup.ready and set(warmup.timings) >= {"imports", "model", "total_since_import"}
+
+# Prueba que un fallo no se reintente con retry_interval=0.
+def test_warmup_without_retry():
+    def build(phase):
+        raise RuntimeError("sin snapshot")
+    warmup = Warmup(build, retry_interval=0)
+    try:
+        warmup.start().result(timeout=5)
+    except RuntimeError:
+        pass
+    time.sleep(0.05)
+    assert warmup.status()["attempts"] == 1 and warmup.start().exception() is not None
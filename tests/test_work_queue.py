@@ -0,0 +1,43 @@
+import time
+from scraper.work_queue import WorkQueue
+
+# Prueba que las tareas se reclamen una sola vez, con prioridad para las fichas de detalle.
+def test_claim_is_exclusive_and_prioritizes_details(tmp_path):
+    db = str(tmp_path / "queue.sqlite")
+    queue = WorkQueue(db)
+    queue.enqueue_many("list", [("list:1", {"page": 1}), ("list:2", {"page": 2})])
+    queue.enqueue("detail", "https://x/a", {"url": "https://x/a"})
+    queue.enqueue("detail", "https://x/a", {"url": "https://x/a"})  # re-encolar es idempotente
+    other = WorkQueue(db)
+    first, second = queue.claim("w1"), other.claim("w2")
+    assert first["kind"] == "detail"
+    assert second["key"] == "list:1"
+    assert queue.claim("w1")["key"] == "list:2"
+    assert other.claim("w2") is None
+    assert not queue.is_drained()
+
+# Prueba que un fallo se reintente con backoff y quede 'failed' al agotar los intentos.
+def test_fail_retries_with_backoff(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), max_attempts=2, backoff=0.2)
+    queue.enqueue("list", "list:1", {"page": 1})
+    task = queue.claim("w1")
+    queue.fail(task["id"], "timeout")
+    assert queue.claim("w1") is None, "La tarea no debe estar disponible antes del backoff"
+    time.sleep(0.25)
+    task = queue.claim("w1")
+    assert task["attempts"] == 1
+    queue.fail(task["id"], "timeout")
+    assert queue.stats() == {"failed": 1}
+    assert queue.is_drained()
+
+# Prueba que las tareas de un worker caído vuelvan a la cola y que los resultados se deduplican por id.
+def test_requeue_stale_and_dedup_results(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    queue.enqueue("detail", "https://x/a", {"url": "https://x/a"})
+    queue.claim("w1")
+    assert queue.requeue_stale(timeout=-1) == 1
+    assert queue.claim("w2")["key"] == "https://x/a"
+    queue.put_result("id-b", 2, {"id": "id-b", "title": "B"})
+    queue.put_result("id-a", 1, {"id": "id-a", "title": "A"})
+    queue.put_result("id-a", 3, {"id": "id-a", "title": "A2"})
+    assert queue.results() == [{"id": "id-a", "title": "A2"}, {"id": "id-b", "title": "B"}]
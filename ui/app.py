@@ -25,30 +25,73 @@ def query_api(endpoint, payload=None):
     except requests.RequestException as e:
         return {"error": f"Error al conectar con la API: {str(e)}"}
 
+# Consume /ask/stream (Server-Sent Events) y entrega cada evento como (tipo, datos)
+def stream_api(payload):
+    with requests.post(f"{API_URL}/ask/stream", json=payload, stream=True, timeout=(5, 300)) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event:
+                yield event, json.loads(line[len("data: "):])
+
 # Sección para hacer preguntas
 st.header("Hacer una pregunta")
 query = st.text_input("Ingresa tu consulta (ej. 'Departamentos de 2 dormitorios en Providencia bajo 3 000 UF')")
 if st.button("Enviar consulta"):
     if query:
-        with st.spinner("Procesando..."):
-            result = query_api("/ask", {"query": query})
-            if "error" in result:
-                st.error(result["error"])
-            else:
-                st.subheader("Respuesta")
-                st.write(result["answer"])
-                st.subheader("Fuentes")
-                for i, url in enumerate(result.get("urls", []), 1):
-                    st.markdown(f"[{i}] [Ver propiedad]({url})")
-                st.write(f"**Confianza**: {result.get('confidence', 'N/A')}")
+        try:
+            # Las fuentes llegan apenas termina la búsqueda; la respuesta se va escribiendo a medida que se genera
+            st.subheader("Respuesta")
+            answer_box = st.empty()
+            answer_box.markdown("_Buscando propiedades..._")
+            sources_box = st.container()
+            answer = ""
+            for event, data in stream_api({"query": query}):
+                if event == "sources":
+                    with sources_box:
+                        st.subheader("Fuentes")
+                        for i, url in enumerate(data.get("urls", []), 1):
+                            st.markdown(f"[{i}] [Ver propiedad]({url})")
+                        st.write(f"**Confianza**: {data.get('confidence', 'N/A')}")
+                    answer_box.markdown("_Generando respuesta..._")
+                elif event == "token":
+                    answer += data
+                    answer_box.markdown(answer + "▌")
+                elif event == "done":
+                    answer_box.markdown(data.get("answer", answer))
+        except requests.RequestException as e:
+            st.error(f"Error al conectar con la API: {str(e)}")
     else:
         st.warning("Por favor, ingresa una consulta.")
 
+# GET condicional de /changes: se reenvía el ETag de la última respuesta y, si la API contesta 304,
+# se reutiliza la copia guardada en la sesión en vez de volver a descargarla
+def fetch_changes(params):
+    key = json.dumps(params, sort_keys=True)
+    cached = st.session_state.setdefault("changes_cache", {}).get(key)
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+    try:
+        response = requests.get(f"{API_URL}/changes", params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached["data"]
+        response.raise_for_status()
+        data = response.json()
+        st.session_state["changes_cache"][key] = {"etag": response.headers.get("ETag"), "data": data}
+        return data
+    except requests.RequestException as e:
+        return {"error": f"Error al conectar con la API: {str(e)}"}
+
 # Sección para ver cambios de precios
 st.header("Cambios de precios")
+col_commune, col_delta = st.columns(2)
+commune = col_commune.text_input("Comuna (opcional)", "")
+min_delta = col_delta.number_input("Variación mínima (%)", min_value=0.0, value=0.0, step=1.0)
 if st.button("Ver últimos cambios"):
     with st.spinner("Cargando cambios..."):
-        result = query_api("/changes")
+        params = {"commune": commune.strip() or None, "min_delta": min_delta or None}
+        result = fetch_changes({k: v for k, v in params.items() if v is not None})
         if "error" in result:
             st.error(result["error"])
         else:
@@ -58,10 +101,11 @@ if st.button("Ver últimos cambios"):
             else:
                 st.subheader("Cambios detectados")
                 for change in changes:
+                    delta = f" ({change['delta_pct']:+.1f}%)" if change.get('delta_pct') is not None else ""
                     st.markdown(f"""
                     - **Propiedad**: {change['title']} ({change['location']})
                     - **URL**: [Ver propiedad]({change['url']})
-                    - **Cambio**: Precio anterior: {change['old_price']} → Nuevo precio: {change['new_price']}
+                    - **Cambio**: Precio anterior: {change['old_price']} → Nuevo precio: {change['new_price']}{delta}
                     - **Fecha**: {change['timestamp']}
                     """)
                 st.write(f"**Total**: {result.get('message', 'N/A')}")
@@ -0,0 +1,17 @@
+import os
+
+# "chroma" (default): ChromaDB persistente con HNSW; "numpy": matriz en memoria con búsqueda exacta
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+# Con el backend numpy, "int8" guarda los vectores cuantizados (4x menos memoria)
+VECTOR_QUANTIZE = os.getenv("VECTOR_QUANTIZE", "")
+
+def create_vector_store(collection_name: str, db_path: str, backend: str = None):
+    """Vector store según `VECTOR_BACKEND`; todos exponen upsert/delete/get_hashes/query/query_many/count/drop."""
+    backend = (backend or VECTOR_BACKEND).lower()
+    if backend == "numpy":
+        from vectorStorage.numpy_store import NumpyVectorStore
+        return NumpyVectorStore(collection_name=collection_name, db_path=db_path, quantize=VECTOR_QUANTIZE == "int8")
+    if backend in ("chroma", "chromadb"):
+        from vectorStorage.chromadb import ChromaDBStore
+        return ChromaDBStore(collection_name=collection_name, db_path=db_path)
+    raise ValueError(f"VECTOR_BACKEND desconocido: {backend!r} (opciones: chroma, numpy)")
@@ -3,6 +3,8 @@ from chromadb.config import Settings
 
 # Clase que maneja el almacenamiento y consulta de vectores en ChromaDB
 class ChromaDBStore:
+    name = "chromadb"
+
     def __init__(self, collection_name="assetplan_collection", db_path="./chroma_db"):
         # Inicializa un cliente persistente de ChromaDB en el path especificado
         self.client = chromadb.PersistentClient(path=db_path, settings=Settings())
@@ -23,20 +25,53 @@ class ChromaDBStore:
             ids=ids
         )
 
-    # Método para consultar documentos similares a un embedding dado
-    def query(self, query_embedding, n_results=5):
+    # Método para insertar o reemplazar documentos por id
+    def upsert(self, documents, embeddings, metadatas, ids):
+        self.collection.upsert(
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            ids=ids
+        )
+
+    # Método para eliminar documentos por id
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    # Chroma persiste cada escritura; existe por el contrato común con NumpyVectorStore
+    def flush(self):
+        pass
+
+    # Método que retorna {id: hash del documento} según la metadata guardada al indexar
+    def get_hashes(self, hash_key="doc_hash"):
+        results = self.collection.get(include=["metadatas"])
+        return {
+            doc_id: (meta or {}).get(hash_key, "")
+            for doc_id, meta in zip(results["ids"], results["metadatas"])
+        }
+
+    # Método para consultar documentos similares a un embedding dado (opcionalmente filtrados por metadata)
+    def query(self, query_embedding, n_results=5, where=None):
+        return self.query_many([query_embedding], n_results=n_results, where=where)[0]
+
+    # Método para consultar varios embeddings en una sola llamada (mismo filtro para todos);
+    # devuelve una tupla (documentos, metadatas, distancias, ids) por embedding, en el mismo orden
+    def query_many(self, query_embeddings, n_results=5, where=None):
+        if not len(query_embeddings):
+            return []
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=[list(e) for e in query_embeddings],
             n_results=n_results,
+            where=where,
             include=["documents", "metadatas", "distances"]
         )
-        return (
-            results["documents"][0],
-            results["metadatas"][0],
-            results["distances"][0],
-            results["ids"][0]
-        )
+        return list(zip(results["documents"], results["metadatas"], results["distances"], results["ids"]))
 
     # Método que retorna la cantidad total de documentos en la colección
     def count(self):
-        return self.collection.count()
\ No newline at end of file
+        return self.collection.count()
+
+    # Método que elimina la colección completa (generaciones del índice ya reemplazadas)
+    def drop(self):
+        self.client.delete_collection(self.collection.name)
\ No newline at end of file
@@ -0,0 +1,34 @@
+from typing import Any, Dict, Optional
+
+# Evaluador en memoria del subconjunto de filtros `where` de Chroma que genera QueryParser,
+# para aplicar las mismas restricciones en índices que no son Chroma
+OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$in": lambda value, target: value in target,
+}
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict]) -> bool:
+    """True si la metadata cumple el filtro (`$and`, `$or` y comparaciones por campo, como en Chroma)."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            if value is None and key not in metadata:
+                return False
+            if not all(OPERATORS[op](value, target) for op, target in condition.items()):
+                return False
+    return True
@@ -0,0 +1,205 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from vectorStorage.filters import matches_where
+
+logger = logging.getLogger(__name__)
+
+# Clase con el mismo contrato que ChromaDBStore, sobre una matriz densa en memoria (búsqueda exacta)
+class NumpyVectorStore:
+    """Índice vectorial en proceso: matriz contigua de vectores L2-normalizados y top-k exacto con `argpartition`.
+
+    Para unos miles de chunks de 384 dimensiones, el producto matriz-vector completo cuesta menos que
+    el overhead por consulta del cliente de Chroma y no tiene la pérdida de recall del HNSW. La matriz
+    se guarda como `.npy` (float32, o int8 con `quantize=True`: 4x menos memoria, coseno aproximado) y se
+    abre con memory-map al iniciar; documentos y metadata van en un JSON al lado. Las escrituras quedan en
+    memoria (la matriz crece al doble, sin copiarse en cada lote) y `flush()` reescribe ambos archivos de
+    forma atómica una sola vez, al terminar el sync.
+
+    Los filtros `where` se evalúan con `matches_where` y la máscara resultante se cachea por filtro
+    hasta la siguiente escritura. Las distancias son coseno (1 - similitud), como la colección de Chroma.
+    """
+    name = "numpy"
+
+    def __init__(self, collection_name="assetplan_collection", db_path="./chroma_db", quantize: bool = False):
+        self.quantize = quantize
+        suffix = ".int8" if quantize else ""
+        os.makedirs(db_path, exist_ok=True)
+        self.vectors_file = os.path.join(db_path, f"{collection_name}{suffix}.npy")
+        self.records_file = os.path.join(db_path, f"{collection_name}{suffix}.json")
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.rows: Dict[str, int] = {}
+        self.vectors: Optional[np.ndarray] = None
+        self._buffer: Optional[np.ndarray] = None  # matriz en memoria con filas libres al final; vectors es una vista
+        self._dirty = False
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.vectors_file) and os.path.exists(self.records_file)):
+            return
+        with open(self.records_file, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.ids, self.documents, self.metadatas = records["ids"], records["documents"], records["metadatas"]
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.vectors = np.load(self.vectors_file, mmap_mode="r")
+        logger.info(f"Índice NumPy: {len(self.ids)} vectores desde {self.vectors_file}")
+
+    def flush(self):
+        """Persiste las escrituras pendientes (upsert/delete) de una vez."""
+        with self._lock:
+            if self._dirty:
+                self._persist()
+                self._dirty = False
+
+    def _persist(self):
+        tmp = f"{self.vectors_file}.tmp.npy"
+        np.save(tmp, self.vectors if self.vectors is not None else np.zeros((0, 0), dtype=np.float32))
+        os.replace(tmp, self.vectors_file)
+        tmp = f"{self.records_file}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas}, f, ensure_ascii=False)
+        os.replace(tmp, self.records_file)
+
+    def _encode(self, embeddings) -> np.ndarray:
+        """Normaliza a norma 1 y, si corresponde, cuantiza a int8 (escala fija 127: los valores ya están en [-1, 1])."""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        if self.quantize:
+            return np.round(matrix * 127).astype(np.int8)
+        return matrix
+
+    # Método para agregar documentos al vector store
+    def add_documents(self, documents, embeddings, metadatas, ids):
+        duplicated = [i for i in ids if i in self.rows]
+        if duplicated:
+            raise ValueError(f"Ids ya indexados: {duplicated[:5]}")
+        self.upsert(documents, embeddings, metadatas, ids)
+
+    # Método para insertar o reemplazar documentos por id
+    def upsert(self, documents, embeddings, metadatas, ids):
+        if not len(ids):
+            return
+        encoded = self._encode(embeddings)
+        with self._lock:
+            buffer = self._reserve(sum(1 for i in set(ids) if i not in self.rows), encoded)
+            for doc, meta, doc_id, vector in zip(documents, metadatas, ids, encoded):
+                row = self.rows.get(doc_id)
+                if row is None:
+                    row = self.rows[doc_id] = len(self.ids)
+                    self.ids.append(doc_id)
+                    self.documents.append(doc)
+                    self.metadatas.append(meta)
+                else:
+                    self.documents[row] = doc
+                    self.metadatas[row] = meta
+                buffer[row] = vector
+            self.vectors = buffer[:len(self.ids)]
+            self._masks.clear()
+            self._dirty = True
+
+    def _reserve(self, extra: int, encoded: np.ndarray) -> np.ndarray:
+        """Matriz en memoria con lugar para `extra` filas nuevas: crece al doble (la primera escritura copia el memory-map)."""
+        needed = len(self.ids) + extra
+        if self._buffer is None or len(self._buffer) < needed or self._buffer.dtype != encoded.dtype:
+            capacity = max(needed, 2 * (len(self._buffer) if self._buffer is not None else 0), 1024)
+            grown = np.empty((capacity, encoded.shape[1]), dtype=encoded.dtype)
+            if self.vectors is not None and len(self.ids):
+                grown[:len(self.ids)] = self.vectors[:len(self.ids)]
+            self._buffer = grown
+        return self._buffer
+
+    # Método para eliminar documentos por id
+    def delete(self, ids):
+        with self._lock:
+            remove = {self.rows[i] for i in ids if i in self.rows}
+            if not remove:
+                return
+            keep = [row for row in range(len(self.ids)) if row not in remove]
+            self.vectors = self._buffer = np.array(self.vectors[keep])
+            self.ids = [self.ids[row] for row in keep]
+            self.documents = [self.documents[row] for row in keep]
+            self.metadatas = [self.metadatas[row] for row in keep]
+            self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+            self._masks.clear()
+            self._dirty = True
+
+    # Método que retorna {id: hash del documento} según la metadata guardada al indexar
+    def get_hashes(self, hash_key="doc_hash"):
+        return {doc_id: (meta or {}).get(hash_key, "") for doc_id, meta in zip(self.ids, self.metadatas)}
+
+    def _mask(self, where: Dict) -> np.ndarray:
+        key = json.dumps(where, sort_keys=True)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_where(meta, where) for meta in self.metadatas), dtype=bool, count=len(self.metadatas))
+            self._masks[key] = mask
+            while len(self._masks) > 256:
+                self._masks.popitem(last=False)
+        return mask
+
+    # Método para consultar documentos similares a un embedding dado (opcionalmente filtrados por metadata)
+    def query(self, query_embedding, n_results=5, where=None):
+        return self.query_many([query_embedding], n_results=n_results, where=where)[0]
+
+    # Método para consultar varios embeddings en una sola llamada (mismo filtro para todos)
+    def query_many(self, query_embeddings, n_results=5, where=None):
+        if not len(query_embeddings):
+            return []
+        empty = [([], [], [], []) for _ in query_embeddings]
+        with self._lock:
+            vectors, ids, documents, metadatas = self.vectors, self.ids, self.documents, self.metadatas
+            mask = self._mask(where) if where else None
+        if vectors is None or not len(ids):
+            return empty
+        candidates = np.flatnonzero(mask) if mask is not None else None
+        if candidates is not None:
+            if not len(candidates):
+                return empty
+            vectors = vectors[candidates]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        scores = queries @ vectors.T  # (consultas, documentos); con int8 numpy convierte a float32
+        if self.quantize:
+            scores /= 127
+        k = min(n_results, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else np.tile(np.arange(k), (len(queries), 1))
+        results = []
+        for q, row in enumerate(top):
+            order = row[np.argsort(-scores[q, row], kind="stable")]
+            rows = candidates[order] if candidates is not None else order
+            results.append((
+                [documents[r] for r in rows],
+                [metadatas[r] for r in rows],
+                [float(1 - scores[q, o]) for o in order],
+                [ids[r] for r in rows],
+            ))
+        return results
+
+    # Método que retorna la cantidad total de documentos en la colección
+    def count(self):
+        return len(self.ids)
+
+    # Método que elimina la colección completa (generaciones del índice ya reemplazadas)
+    def drop(self):
+        with self._lock:
+            self.ids, self.documents, self.metadatas, self.rows = [], [], [], {}
+            self.vectors = self._buffer = None
+            self._dirty = False
+            self._masks.clear()
+            for path in (self.vectors_file, self.records_file):
+                if os.path.exists(path):
+                    os.remove(path)